@@ -1,19 +1,116 @@
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, Response, stream_with_context, g
 from flask_cors import CORS
-from transformers import pipeline
-import csv
 from datetime import datetime
+import json
 import os
+import time
+from micro_batcher import MicroBatcher, QueueFullError
+from result_cache import ResultCache
+from pyshared.log_writer import get_writer
+from text_backends import load_backend
+from pyshared.metrics import REGISTRY, histogram, counter, render_snapshots, start_snapshot_thread
 
 app = Flask(__name__)
 CORS(app)
 
-# Load Hugging Face 27-emotion classification model
-emotion_pipeline = pipeline(
-    "text-classification",
-    model="bhadresh-savani/distilbert-base-uncased-emotion",
-    return_all_scores=True
-)
+# Load Hugging Face 27-emotion classification model.
+# EMOTION_BACKEND=onnx-int8 serves an int8-quantized ONNX export through onnxruntime
+# (EMOTION_ONNX_DIR, EMOTION_INTRA_OP_THREADS tune it); the default is the fp32 pipeline.
+# Under gunicorn (gunicorn.conf.py) this runs once in the master and workers share the weights.
+backend_name = os.environ.get("EMOTION_BACKEND", "transformers")
+backend_options = {}
+if backend_name == "onnx-int8":
+    backend_options = {
+        "model_dir": os.environ.get("EMOTION_ONNX_DIR", "onnx_model"),
+        "intra_op_threads": int(os.environ.get("EMOTION_INTRA_OP_THREADS", 0)) or None
+    }
+emotion_classifier = load_backend(backend_name, **backend_options)
+
+
+PIPELINE_SECONDS = histogram("emotion_pipeline_seconds", "One batched forward pass of the emotion classifier")
+PIPELINE_TEXTS = counter("emotion_pipeline_texts_total", "Texts scored by the emotion classifier")
+PIPELINE_CALLS = counter("emotion_pipeline_calls_total", "Forward passes of the emotion classifier")
+
+
+def run_pipeline(texts):
+    """Score a list of texts in one padded forward pass"""
+    with PIPELINE_SECONDS.time():
+        outputs = emotion_classifier(texts)
+    PIPELINE_CALLS.inc()
+    PIPELINE_TEXTS.inc(len(texts))
+    return outputs
+
+
+# The micro-batcher, result cache and journal writer own threads, an SQLite
+# connection and file handles, none of which survive fork(). Under the
+# pre-fork server (gunicorn.conf.py sets EMOTION_PREFORK=1) the parent only
+# loads the model and every worker builds these after it is forked.
+batcher = result_cache = journal_writer = None
+
+# Set by gunicorn.conf.py: each worker writes metric snapshots here and /metrics merges them
+METRICS_DIR = os.environ.get("EMOTION_METRICS_DIR")
+
+
+def init_worker_services():
+    """Build this process's micro-batcher, result cache and journal writer"""
+    global batcher, result_cache, journal_writer
+
+    # Concurrent /analyze requests share batched forward passes
+    batcher = MicroBatcher(
+        run_pipeline,
+        window_ms=float(os.environ.get("EMOTION_BATCH_WINDOW_MS", 10)),
+        max_batch_size=int(os.environ.get("EMOTION_MICRO_BATCH_SIZE", 16)),
+        max_queue_depth=int(os.environ.get("EMOTION_MAX_QUEUE_DEPTH", 1024))
+    )
+
+    # Resubmitted journal texts skip inference; set EMOTION_CACHE_PATH to keep the cache across restarts
+    result_cache = ResultCache(
+        max_entries=int(os.environ.get("EMOTION_CACHE_SIZE", 5000)),
+        ttl_seconds=float(os.environ.get("EMOTION_CACHE_TTL", 24 * 3600)),
+        persist_path=os.environ.get("EMOTION_CACHE_PATH"),
+        max_disk_entries=int(os.environ.get("EMOTION_CACHE_DISK_SIZE", 0)) or None
+    )
+
+    # Rows are group-committed from a background thread; EMOTION_LOG_DURABILITY=fsync syncs each batch
+    journal_writer = get_writer(
+        "journal_log.csv",
+        header=["timestamp", "entry", "emotion", "confidence"],
+        flush_rows=int(os.environ.get("EMOTION_LOG_FLUSH_ROWS", 100)),
+        flush_interval=float(os.environ.get("EMOTION_LOG_FLUSH_INTERVAL", 1.0)),
+        durability=os.environ.get("EMOTION_LOG_DURABILITY", "none")
+    )
+
+    if METRICS_DIR:
+        start_snapshot_thread(METRICS_DIR, float(os.environ.get("EMOTION_METRICS_INTERVAL", 5.0)))
+
+
+if os.environ.get("EMOTION_PREFORK") != "1":
+    init_worker_services()
+
+# Components that keep their own stats are exported as gauges at scrape time
+REGISTRY.add_collector(lambda: [
+    ("result_cache_hits", "Results served from memory", result_cache.hits),
+    ("result_cache_disk_hits", "Results served from the persisted cache", result_cache.disk_hits),
+    ("result_cache_misses", "Results that needed inference", result_cache.misses),
+    ("result_cache_disk_errors", "Persisted-cache reads and writes that failed", result_cache.disk_errors),
+    ("micro_batch_queue_depth", "Texts waiting for a batched forward pass", batcher.get_stats()["queue_depth"]),
+    ("micro_batch_avg_size", "Average texts per micro-batch", batcher.get_stats()["avg_batch_size"]),
+    ("journal_log_pending_rows", "Journal rows not yet flushed to disk", journal_writer.pending),
+    ("journal_log_write_failures", "Journal log batches that failed to write", journal_writer.failures)
+])
+
+@app.before_request
+def start_timer():
+    g.request_start = time.perf_counter()
+
+
+@app.after_request
+def record_request_latency(response):
+    if request.endpoint and "request_start" in g:
+        histogram("http_request_seconds", "Request handling time by endpoint",
+                  labels={"endpoint": request.endpoint}).observe(time.perf_counter() - g.request_start)
+    return response
+
 
 # Expanded Emotion-based smart suggestions
 def get_suggestions(emotion):
@@ -156,14 +253,88 @@ def get_suggestions(emotion):
         "checklist": ["Drink water 💧", "Take a mindful pause 🧘", "Write 3 things you're grateful for 🙏"]
     })
 def log_journal_entry(text, emotion, confidence):
-    log_file = "journal_log.csv"
-    file_exists = os.path.isfile(log_file)
+    log_journal_entries([(text, emotion, confidence)])
+
+
+JOURNAL_LOG_SECONDS = histogram("journal_log_seconds", "Queueing journal rows for the CSV log")
+
+
+def log_journal_entries(entries):
+    """Queue (text, emotion, confidence) rows for the journal log as one batch"""
+    timestamp = datetime.now().isoformat()
+    with JOURNAL_LOG_SECONDS.time():
+        journal_writer.write_rows(
+            [timestamp, text, emotion, confidence] for text, emotion, confidence in entries
+        )
+
+
+def top_emotion(scores):
+    """Label and rounded score of the highest-scoring emotion"""
+    best = max(scores, key=lambda x: x['score'])
+    return best['label'], round(best['score'], 2)
 
-    with open(log_file, mode='a', newline='', encoding='utf-8') as file:
-        writer = csv.writer(file)
-        if not file_exists:
-            writer.writerow(["timestamp", "entry", "emotion", "confidence"])
-        writer.writerow([datetime.now().isoformat(), text, emotion, confidence])
+
+BATCH_SIZE = int(os.environ.get("EMOTION_BATCH_SIZE", 32))
+MAX_BATCH_SIZE = int(os.environ.get("EMOTION_MAX_BATCH_SIZE", 64))
+MAX_BATCH_ENTRIES = int(os.environ.get("EMOTION_MAX_BATCH_ENTRIES", 10000))
+
+
+def analyze_texts(texts, batch_size=BATCH_SIZE):
+    """Yield (position, scores or exception) for each text, batch by batch.
+
+    Texts are sorted by length so each padded batch wastes little compute.
+    A failing batch is retried one text at a time to isolate the bad entry.
+    """
+    order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+
+    for start in range(0, len(order), batch_size):
+        chunk = order[start:start + batch_size]
+        chunk_texts = [texts[i] for i in chunk]
+        try:
+            outputs = run_pipeline(chunk_texts)
+            yield list(zip(chunk, outputs))
+        except Exception:
+            results = []
+            for i, text in zip(chunk, chunk_texts):
+                try:
+                    results.append((i, run_pipeline([text])[0]))
+                except Exception as e:
+                    results.append((i, e))
+            yield results
+
+
+def parse_batch_entries(entries):
+    """Split raw entries into valid texts and per-item errors"""
+    texts, positions, errors = [], [], {}
+    for index, entry in enumerate(entries):
+        text = entry.get('text', '') if isinstance(entry, dict) else entry
+        if not isinstance(text, str) or not text.strip():
+            errors[index] = "No text provided"
+            continue
+        positions.append(index)
+        texts.append(text)
+    return texts, positions, errors
+
+
+def process_batch(texts, positions, batch_size):
+    """Yield (results, log_rows) per inference batch, results keyed by input index"""
+    for chunk in analyze_texts(texts, batch_size):
+        results, rows = [], []
+        for i, scores in chunk:
+            index = positions[i]
+            if isinstance(scores, Exception):
+                results.append({"index": index, "error": str(scores)})
+                continue
+
+            emotion, confidence = top_emotion(scores)
+            rows.append((texts[i], emotion, confidence))
+            results.append({
+                "index": index,
+                "emotion": emotion.capitalize(),
+                "confidence": confidence,
+                "suggestion": get_suggestions(emotion)
+            })
+        yield results, rows
 
 
 # API Endpoint
@@ -175,11 +346,17 @@ def analyze():
     if not text:
         return jsonify({"error": "No text provided"}), 400
 
-    results = emotion_pipeline(text)[0]
-    top_emotion = max(results, key=lambda x: x['score'])
+    results = result_cache.get(text)
+    if results is None:
+        try:
+            results = batcher.submit(text)
+        except QueueFullError:
+            response = jsonify({"error": "Server busy, retry shortly"})
+            response.headers["Retry-After"] = "1"
+            return response, 503
+        result_cache.put(text, results)
 
-    emotion = top_emotion['label']
-    confidence = round(top_emotion['score'], 2)
+    emotion, confidence = top_emotion(results)
     suggestion = get_suggestions(emotion)
 
     # ✅ Log journal entry to CSV
@@ -192,5 +369,75 @@ def analyze():
     })
 
 
+@app.route('/analyze/batch', methods=['POST'])
+def analyze_batch():
+    """Analyze many journal entries at once.
+
+    Body: {"entries": ["text", {"text": "..."}, ...], "batch_size": 32}
+    batch_size is capped at EMOTION_MAX_BATCH_SIZE.
+    Returns results in input order. With ?stream=true the response is
+    NDJSON, one result per line in completion order, each carrying its
+    input "index".
+    """
+    data = request.get_json(silent=True) or {}
+    entries = data.get('entries')
+
+    if not isinstance(entries, list) or not entries:
+        return jsonify({"error": "No entries provided"}), 400
+    if len(entries) > MAX_BATCH_ENTRIES:
+        return jsonify({"error": f"At most {MAX_BATCH_ENTRIES} entries per request"}), 413
+
+    batch_size = data.get('batch_size', BATCH_SIZE)
+    if isinstance(batch_size, bool) or not isinstance(batch_size, int) or batch_size < 1:
+        return jsonify({"error": "batch_size must be a positive integer"}), 400
+    batch_size = min(batch_size, MAX_BATCH_SIZE)
+    texts, positions, errors = parse_batch_entries(entries)
+    error_results = [{"index": index, "error": message} for index, message in errors.items()]
+
+    if request.args.get('stream', '').lower() in ('1', 'true', 'yes'):
+        def generate():
+            for result in error_results:
+                yield json.dumps(result) + "\n"
+            for results, rows in process_batch(texts, positions, batch_size):
+                # ✅ One log write per inference batch while streaming
+                if rows:
+                    log_journal_entries(rows)
+                for result in results:
+                    yield json.dumps(result) + "\n"
+
+        return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+    results = error_results
+    log_rows = []
+    for chunk_results, rows in process_batch(texts, positions, batch_size):
+        results.extend(chunk_results)
+        log_rows.extend(rows)
+
+    # ✅ Log the whole batch to CSV in one write
+    if log_rows:
+        log_journal_entries(log_rows)
+
+    results.sort(key=lambda r: r["index"])
+    return jsonify({"results": results})
+
+
+@app.route('/stats', methods=['GET'])
+def stats():
+    return jsonify({
+        "backend": emotion_classifier.name,
+        "pid": os.getpid(),
+        "micro_batching": batcher.get_stats(),
+        "result_cache": result_cache.get_stats(),
+        "journal_log": journal_writer.get_stats()
+    })
+
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """Prometheus text-format metrics for this process, or every worker when METRICS_DIR is set"""
+    text = render_snapshots(METRICS_DIR) if METRICS_DIR else REGISTRY.render_prometheus()
+    return Response(text, mimetype='text/plain; version=0.0.4')
+
+
 if __name__ == '__main__':
     app.run(debug=True)
@@ -0,0 +1,64 @@
+"""Latency and throughput of the journal text classifier backends on CPU.
+
+Usage (from emotion-journal-backend/):
+    python benchmarks/bench_text_backends.py --backends transformers onnx-int8 --batch-sizes 1 8 32
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from text_backends import BACKENDS, load_backend
+from parity_text_backends import load_texts
+
+
+def run(backend, texts, batch_size, repeats, warmup=3):
+    batches = [texts[i:i + batch_size] for i in range(0, len(texts), batch_size)]
+    for batch in batches[:warmup]:
+        backend(batch)
+
+    latencies = []
+    start = time.perf_counter()
+    for _ in range(repeats):
+        for batch in batches:
+            t = time.perf_counter()
+            backend(batch)
+            latencies.append(time.perf_counter() - t)
+    elapsed = time.perf_counter() - start
+
+    latencies = np.array(latencies) * 1000
+    return {
+        "p50_ms": float(np.percentile(latencies, 50)),
+        "p95_ms": float(np.percentile(latencies, 95)),
+        "texts_per_s": len(texts) * repeats / elapsed
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--backends", nargs="+", default=list(BACKENDS), choices=BACKENDS)
+    parser.add_argument("--batch-sizes", nargs="+", type=int, default=[1, 8, 32])
+    parser.add_argument("--texts", help="text file or journal_log.csv")
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--onnx-dir", default="onnx_model")
+    parser.add_argument("--threads", type=int, help="onnxruntime intra-op threads")
+    args = parser.parse_args()
+
+    texts = load_texts(args.texts)
+    print(f"{'backend':<14}{'batch':>6}{'p50 ms':>10}{'p95 ms':>10}{'texts/s':>10}")
+    for name in args.backends:
+        options = {"model_dir": args.onnx_dir, "intra_op_threads": args.threads} if name == "onnx-int8" else {}
+        backend = load_backend(name, **options)
+        for batch_size in args.batch_sizes:
+            stats = run(backend, texts, batch_size, args.repeats)
+            print(f"{name:<14}{batch_size:>6}{stats['p50_ms']:>10.2f}{stats['p95_ms']:>10.2f}"
+                  f"{stats['texts_per_s']:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+"""HTTP load test for a running journal backend: throughput and tail latency.
+
+Closed loop (default): --concurrency clients each send a request as soon as
+the previous one returns. Open loop (--rate): requests are scheduled at a
+fixed rate and latency is measured from the scheduled send time, so a
+stalled server shows up in p99 instead of quietly lowering the load.
+
+Each text gets a unique suffix by default so the result cache does not
+answer for the model; pass --repeat-texts to measure cached traffic.
+Exits non-zero when --p99-budget-ms is set and exceeded, or any request fails.
+
+Usage (from emotion-journal-backend/, with the server already running):
+    gunicorn app:app &
+    python benchmarks/load_test.py --concurrency 32 --duration 30
+    python benchmarks/load_test.py --rate 200 --duration 30 --p99-budget-ms 250
+"""
+import argparse
+import http.client
+import itertools
+import json
+import os
+import sys
+import threading
+import time
+from urllib.parse import urlsplit
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from parity_text_backends import load_texts
+
+
+class Client:
+    """One keep-alive connection, reopened after errors.
+
+    A request that fails on a reused connection is retried once on a new
+    one, as urllib3 does: during a graceful restart the old worker closes
+    idle keep-alive connections without having read the request.
+    """
+
+    def __init__(self, url, timeout):
+        parts = urlsplit(url)
+        self.host, self.port = parts.hostname, parts.port or 80
+        self.timeout = timeout
+        self.conn = None
+
+    def post(self, path, payload):
+        reused = self.conn is not None
+        try:
+            return self._post(path, payload)
+        except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+            if not reused:
+                raise
+            return self._post(path, payload)
+
+    def _post(self, path, payload):
+        if self.conn is None:
+            self.conn = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+        try:
+            self.conn.request("POST", path, body=json.dumps(payload),
+                              headers={"Content-Type": "application/json"})
+            response = self.conn.getresponse()
+            response.read()
+            return response.status
+        except (OSError, http.client.HTTPException):
+            self.conn.close()
+            self.conn = None
+            raise
+
+
+def run(args, texts):
+    tickets = itertools.count()
+    lock = threading.Lock()
+    latencies, errors = [], []
+    start = time.perf_counter() + args.warmup
+    stop = start + args.duration
+
+    def client_loop():
+        client = Client(args.url, args.timeout)
+        while True:
+            ticket = next(tickets)
+            if args.rate:
+                scheduled = start - args.warmup + ticket / args.rate
+                delay = scheduled - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+            else:
+                scheduled = time.perf_counter()
+            if scheduled >= stop:
+                return
+
+            text = texts[ticket % len(texts)]
+            if not args.repeat_texts:
+                text = f"{text} ({ticket})"
+            try:
+                status = client.post(args.endpoint, {"text": text})
+                error = None if status == 200 else f"HTTP {status}"
+            except (OSError, http.client.HTTPException) as e:
+                error = type(e).__name__
+            done = time.perf_counter()
+
+            if scheduled < start:  # warm-up
+                continue
+            with lock:
+                latencies.append(done - scheduled)
+                if error:
+                    errors.append(error)
+
+    threads = [threading.Thread(target=client_loop, daemon=True) for _ in range(args.concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return np.array(latencies) * 1000, errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", default="http://127.0.0.1:5000")
+    parser.add_argument("--endpoint", default="/analyze")
+    parser.add_argument("--texts", help="One text per line, or a journal_log.csv")
+    parser.add_argument("--concurrency", type=int, default=16, help="Client threads (connections)")
+    parser.add_argument("--rate", type=float, default=0.0,
+                        help="Open-loop requests per second; 0 runs closed loop")
+    parser.add_argument("--duration", type=float, default=30.0, help="Measured seconds")
+    parser.add_argument("--warmup", type=float, default=3.0, help="Unmeasured seconds first")
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--repeat-texts", action="store_true",
+                        help="Send texts verbatim so repeats hit the result cache")
+    parser.add_argument("--p99-budget-ms", type=float)
+    args = parser.parse_args()
+
+    latencies, errors = run(args, load_texts(args.texts))
+    if not len(latencies):
+        sys.exit("no requests completed")
+
+    mode = f"open loop at {args.rate:g} req/s" if args.rate else "closed loop"
+    print(f"{mode}, {args.concurrency} connections, {args.duration:g}s against {args.url}{args.endpoint}")
+    print(f"requests: {len(latencies)}  errors: {len(errors)}  throughput: {len(latencies) / args.duration:.1f} req/s")
+    print("latency ms: " + "  ".join(
+        f"{name} {np.percentile(latencies, q):.1f}"
+        for name, q in (("p50", 50), ("p90", 90), ("p99", 99), ("max", 100))
+    ))
+
+    failures = []
+    if errors:
+        kinds = {kind: errors.count(kind) for kind in set(errors)}
+        failures.append(f"failed requests: {kinds}")
+    p99 = np.percentile(latencies, 99)
+    if args.p99_budget_ms is not None and p99 > args.p99_budget_ms:
+        failures.append(f"p99 {p99:.1f} ms is over the {args.p99_budget_ms:g} ms budget")
+    for failure in failures:
+        print(f"FAIL: {failure}", file=sys.stderr)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""Check that the int8 ONNX backend agrees with the fp32 transformers pipeline.
+
+Texts come from a file (one per line, or the "entry" column of a
+journal_log.csv); a small built-in sample is used otherwise. Exits non-zero
+when top-label agreement drops below --min-agreement.
+
+Usage (from emotion-journal-backend/):
+    python benchmarks/parity_text_backends.py --texts journal_log.csv --min-agreement 0.98
+"""
+import argparse
+import csv
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from text_backends import load_backend
+
+SAMPLE_TEXTS = [
+    "I finally finished the project and I feel amazing!",
+    "Nobody called me back today and the house feels empty.",
+    "Why does everyone keep interrupting me in meetings?",
+    "I have an exam tomorrow and I can't stop shaking.",
+    "Spent the evening with my partner, I adore them.",
+    "Wait, they actually gave me the job?!",
+    "Went for a walk, made dinner, read a little.",
+    "I lost my keys again and missed the bus.",
+    "Grateful for my friends who showed up for me this week.",
+    "The doctor's results come in on Monday and I'm terrified.",
+]
+
+
+def load_texts(path=None, limit=None):
+    if not path:
+        texts = SAMPLE_TEXTS
+    elif path.endswith(".csv"):
+        with open(path, newline="", encoding="utf-8") as f:
+            texts = [row["entry"] for row in csv.DictReader(f) if row.get("entry", "").strip()]
+    else:
+        with open(path, encoding="utf-8") as f:
+            texts = [line.strip() for line in f if line.strip()]
+    return texts[:limit] if limit else texts
+
+
+def score_matrix(outputs, labels):
+    return np.array([[{s["label"]: s["score"] for s in scores}[label] for label in labels]
+                     for scores in outputs])
+
+
+def compare(reference, candidate, texts, batch_size=32):
+    """Top-label agreement and score drift of `candidate` against `reference`"""
+    ref_out, cand_out = [], []
+    for start in range(0, len(texts), batch_size):
+        chunk = texts[start:start + batch_size]
+        ref_out.extend(reference(chunk))
+        cand_out.extend(candidate(chunk))
+
+    labels = [s["label"] for s in ref_out[0]]
+    ref_scores = score_matrix(ref_out, labels)
+    cand_scores = score_matrix(cand_out, labels)
+    agree = ref_scores.argmax(axis=1) == cand_scores.argmax(axis=1)
+    drift = np.abs(ref_scores - cand_scores)
+
+    return {
+        "texts": len(texts),
+        "top1_agreement": float(agree.mean()),
+        "max_score_diff": float(drift.max()),
+        "mean_score_diff": float(drift.mean()),
+        "disagreements": [
+            (texts[i], labels[ref_scores[i].argmax()], labels[cand_scores[i].argmax()])
+            for i in np.flatnonzero(~agree)
+        ]
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--texts", help="text file or journal_log.csv")
+    parser.add_argument("--limit", type=int)
+    parser.add_argument("--onnx-dir", default="onnx_model")
+    parser.add_argument("--min-agreement", type=float, default=0.98)
+    args = parser.parse_args()
+
+    texts = load_texts(args.texts, args.limit)
+    report = compare(load_backend("transformers"),
+                     load_backend("onnx-int8", model_dir=args.onnx_dir), texts)
+
+    print(f"texts            : {report['texts']}")
+    print(f"top-1 agreement  : {report['top1_agreement']:.2%}")
+    print(f"max score diff   : {report['max_score_diff']:.4f}")
+    print(f"mean score diff  : {report['mean_score_diff']:.4f}")
+    for text, expected, got in report["disagreements"][:20]:
+        print(f"  {expected:>10} -> {got:<10} {text[:70]}")
+
+    sys.exit(0 if report["top1_agreement"] >= args.min_agreement else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""Production server for the journal backend: pre-forked gunicorn workers.
+
+The master imports app.py once (preload_app), so the emotion model is
+loaded a single time. Forked workers share its weights copy-on-write
+instead of each holding a full copy. Each worker then builds its own
+micro-batcher, result cache and journal writer, and sizes its inference
+thread pool so that all workers together use the host's cores.
+
+Usage (from emotion-journal-backend/, after `pip install -r requirements.txt`):
+    gunicorn app:app
+    EMOTION_WORKERS=4 EMOTION_THREADS=16 gunicorn app:app
+
+Settings (environment variables):
+    EMOTION_BIND             address to listen on (default 0.0.0.0:5000)
+    EMOTION_WORKERS          worker processes (default: half the cores)
+    EMOTION_THREADS          request threads per worker; concurrent requests
+                             in one worker share micro-batches (default 8)
+    EMOTION_INTRA_OP_THREADS inference threads per worker (default: cores / workers)
+    EMOTION_WORKER_TIMEOUT   seconds before a stuck worker is killed (default 60)
+    EMOTION_GRACEFUL_TIMEOUT seconds a stopping worker gets to finish requests (default 30)
+    EMOTION_MAX_REQUESTS     recycle a worker after this many requests, 0 = never (default 0)
+    EMOTION_METRICS_DIR      where workers write metric snapshots (default: a directory
+                             under the system temp dir named after the master pid)
+    EMOTION_METRICS_INTERVAL seconds between a worker's snapshots (default 5)
+
+Metrics: every worker keeps its own counters and histograms. Each writes a
+snapshot to EMOTION_METRICS_DIR, and /metrics (whichever worker answers)
+sums them, so one scrape covers the server. Gauges such as queue depth stay
+per worker with a pid label. Other workers' values can lag by up to
+EMOTION_METRICS_INTERVAL. When a worker exits, the master folds its totals
+into retired.json so counters do not go backwards.
+
+Graceful restart:
+    kill -HUP <master pid>    replace workers one generation at a time; the
+                              preloaded model (and code) is kept, so this is fast
+    kill -USR2 <master pid>   start a new master with new code/model next to the
+                              old one, then `kill -QUIT <old master pid>` once it is up
+"""
+import gc
+import os
+import tempfile
+
+# Read by app.py: defer per-process services to post_fork
+os.environ["EMOTION_PREFORK"] = "1"
+# Tokenizers used in the master must not spin up their thread pool before fork
+os.environ.setdefault("TOKENIZERS_PARALLELISM", "false")
+
+# Inherited by workers, and by a new master started with USR2, which then shares it
+metrics_dir = os.environ.setdefault(
+    "EMOTION_METRICS_DIR", os.path.join(tempfile.gettempdir(), f"emotion-metrics-{os.getpid()}"))
+
+cores = os.cpu_count() or 2
+
+bind = os.environ.get("EMOTION_BIND", "0.0.0.0:5000")
+workers = int(os.environ.get("EMOTION_WORKERS", 0)) or max(1, cores // 2)
+threads = int(os.environ.get("EMOTION_THREADS", 8))
+worker_class = "gthread"
+preload_app = True
+
+timeout = int(os.environ.get("EMOTION_WORKER_TIMEOUT", 60))
+graceful_timeout = int(os.environ.get("EMOTION_GRACEFUL_TIMEOUT", 30))
+keepalive = 5
+max_requests = int(os.environ.get("EMOTION_MAX_REQUESTS", 0))
+max_requests_jitter = max_requests // 10
+
+intra_op_threads = int(os.environ.get("EMOTION_INTRA_OP_THREADS", 0)) or max(1, cores // workers)
+
+
+def on_starting(server):
+    from pyshared.metrics import retire_snapshot
+
+    os.makedirs(metrics_dir, exist_ok=True)
+    # Snapshots left by workers of an earlier master that was killed
+    for name in os.listdir(metrics_dir):
+        pid = name[:-len(".json")]
+        if pid.isdigit() and not _alive(int(pid)):
+            retire_snapshot(metrics_dir, pid)
+
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def pre_fork(server, worker):
+    # Move everything loaded so far out of the collector's reach; otherwise the
+    # first collection in a worker touches (and so copies) every shared page
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    from app import emotion_classifier, init_worker_services, run_pipeline
+
+    emotion_classifier.after_fork(intra_op_threads)
+    init_worker_services()
+    # The first forward pass builds thread pools and caches; pay for it before taking traffic
+    run_pipeline(["Warming up the journal emotion model."])
+    server.log.info("Worker %s ready (%s inference threads)", worker.pid, intra_op_threads)
+
+
+def worker_exit(server, worker):
+    from pyshared.log_writer import close_all
+    from pyshared.metrics import write_snapshot
+
+    close_all()
+    write_snapshot(metrics_dir)
+
+
+def child_exit(server, worker):
+    from pyshared.metrics import retire_snapshot
+
+    # Runs in the master, so workers that crashed or were killed are covered too
+    retire_snapshot(metrics_dir, worker.pid)
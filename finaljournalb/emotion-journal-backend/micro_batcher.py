@@ -0,0 +1,114 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+
+class QueueFullError(RuntimeError):
+    """The inference queue is at max_queue_depth; the caller should back off"""
+
+
+class MicroBatcher:
+    """Coalesce concurrent single-text inferences into one batched call.
+
+    Requests arriving within `window_ms` of the first queued one, up to
+    `max_batch_size`, are run together through `infer_batch(texts)`, which
+    must return one output per text in the same order.
+    """
+
+    def __init__(self, infer_batch, window_ms=10.0, max_batch_size=16, max_queue_depth=1024):
+        self.infer_batch = infer_batch
+        self.window_ms = window_ms
+        self.max_batch_size = max_batch_size
+        self.max_queue_depth = max_queue_depth
+
+        self._queue = queue.Queue(maxsize=max_queue_depth)
+        self._stats_lock = threading.Lock()
+        self.requests = 0
+        self.batches = 0
+        self.max_batch_seen = 0
+        self.peak_queue_depth = 0
+        self.total_wait = 0.0
+        self.total_inference = 0.0
+
+        self._worker = threading.Thread(target=self._run, name="micro-batcher", daemon=True)
+        self._worker.start()
+
+    def submit(self, text, timeout=None):
+        """Queue one text and block until its own result is ready.
+
+        Raises QueueFullError at once, without waiting, when
+        `max_queue_depth` texts are already queued; `timeout` bounds only
+        the wait for the result.
+        """
+        future = Future()
+        try:
+            self._queue.put_nowait((text, future, time.perf_counter()))
+        except queue.Full:
+            raise QueueFullError("Inference queue is full") from None
+
+        with self._stats_lock:
+            self.peak_queue_depth = max(self.peak_queue_depth, self._queue.qsize())
+        return future.result(timeout=timeout)
+
+    def _collect(self):
+        """Block for the first request, then gather more until the window closes"""
+        batch = [self._queue.get()]
+        deadline = time.perf_counter() + self.window_ms / 1000.0
+
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            texts = [text for text, _, _ in batch]
+
+            start = time.perf_counter()
+            try:
+                outputs = list(self.infer_batch(texts))
+                if len(outputs) != len(batch):
+                    raise RuntimeError(
+                        f"infer_batch returned {len(outputs)} outputs for {len(batch)} texts"
+                    )
+            except Exception as e:
+                for _, future, _ in batch:
+                    future.set_exception(e)
+                outputs = None
+            elapsed = time.perf_counter() - start
+
+            if outputs is not None:
+                for (_, future, _), output in zip(batch, outputs):
+                    future.set_result(output)
+
+            with self._stats_lock:
+                self.requests += len(batch)
+                self.batches += 1
+                self.max_batch_seen = max(self.max_batch_seen, len(batch))
+                self.total_wait += sum(start - queued_at for _, _, queued_at in batch)
+                self.total_inference += elapsed
+
+    def get_stats(self):
+        with self._stats_lock:
+            batches = self.batches or 1
+            requests = self.requests or 1
+            return {
+                "window_ms": self.window_ms,
+                "max_batch_size": self.max_batch_size,
+                "queue_depth": self._queue.qsize(),
+                "peak_queue_depth": self.peak_queue_depth,
+                "max_queue_depth": self.max_queue_depth,
+                "requests": self.requests,
+                "batches": self.batches,
+                "avg_batch_size": self.requests / batches,
+                "max_batch_seen": self.max_batch_seen,
+                "avg_wait_ms": self.total_wait / requests * 1000,
+                "avg_batch_inference_ms": self.total_inference / batches * 1000
+            }
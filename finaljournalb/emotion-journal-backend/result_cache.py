@@ -0,0 +1,165 @@
+import hashlib
+import json
+import logging
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_text(text):
+    """Case- and whitespace-insensitive form; the model is uncased anyway"""
+    return re.sub(r"\s+", " ", text).strip().lower()
+
+
+def text_key(text):
+    return hashlib.sha256(normalize_text(text).encode("utf-8")).hexdigest()
+
+
+class ResultCache:
+    """Bounded LRU/TTL cache of pipeline outputs keyed on normalized text.
+
+    When `persist_path` is set, entries are also written to a small SQLite
+    file so a restarted server can still serve them. The file is pruned of
+    expired rows and capped at `max_disk_entries` (default: max_entries)
+    at startup and every `prune_every` writes.
+
+    Pre-forked workers may share the file. A write waits at most
+    `busy_timeout` seconds for another worker's lock; a disk error is
+    logged and counted, and the request is served from memory or the model.
+    """
+
+    def __init__(self, max_entries=5000, ttl_seconds=24 * 3600, persist_path=None,
+                 max_disk_entries=None, prune_every=100, busy_timeout=1.0):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.persist_path = persist_path
+        self.max_disk_entries = max_disk_entries or max_entries
+        self.prune_every = prune_every
+        self._writes_since_prune = 0
+
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.disk_errors = 0
+
+        self._db = None
+        if persist_path:
+            self._db = sqlite3.connect(persist_path, timeout=busy_timeout, check_same_thread=False)
+            self._disk(self._open_disk)
+
+    def _expired(self, created):
+        return self.ttl_seconds is not None and time.time() - created > self.ttl_seconds
+
+    def _remember(self, key, value, created):
+        self._entries[key] = (value, created)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _open_disk(self):
+        # Readers in other workers don't block on a writer, or it on them
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS results "
+            "(key TEXT PRIMARY KEY, value TEXT NOT NULL, created REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS results_created ON results (created)")
+        self._prune_disk()
+
+    def _prune_disk(self):
+        """Drop expired rows, then the oldest beyond max_disk_entries"""
+        if self.ttl_seconds is not None:
+            self._db.execute("DELETE FROM results WHERE created < ?", (time.time() - self.ttl_seconds,))
+        self._db.execute(
+            "DELETE FROM results WHERE key IN "
+            "(SELECT key FROM results ORDER BY created DESC LIMIT -1 OFFSET ?)",
+            (self.max_disk_entries,)
+        )
+        self._db.commit()
+        self._writes_since_prune = 0
+
+    def _disk(self, operation, *args):
+        """Run a disk-tier operation; on an SQLite error log it and return None"""
+        try:
+            return operation(*args)
+        except sqlite3.Error:
+            self.disk_errors += 1
+            logger.exception("result cache disk tier failed (%s)", self.persist_path)
+            self._db.rollback()
+            return None
+
+    def _save_to_disk(self, key, value, created):
+        self._db.execute(
+            "INSERT OR REPLACE INTO results (key, value, created) VALUES (?, ?, ?)",
+            (key, json.dumps(value), created)
+        )
+        self._db.commit()
+        self._writes_since_prune += 1
+        if self._writes_since_prune >= self.prune_every:
+            self._prune_disk()
+
+    def _load_from_disk(self, key):
+        row = self._db.execute(
+            "SELECT value, created FROM results WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        if self._expired(row[1]):
+            self._db.execute("DELETE FROM results WHERE key = ?", (key,))
+            self._db.commit()
+            return None
+        return json.loads(row[0]), row[1]
+
+    def get(self, text):
+        """Cached output for this text, or None"""
+        key = text_key(text)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self._expired(entry[1]):
+                del self._entries[key]
+                entry = None
+
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+
+            if self._db is not None:
+                entry = self._disk(self._load_from_disk, key)
+                if entry is not None:
+                    self._remember(key, *entry)
+                    self.hits += 1
+                    self.disk_hits += 1
+                    return entry[0]
+
+            self.misses += 1
+            return None
+
+    def put(self, text, value):
+        key = text_key(text)
+        created = time.time()
+        with self._lock:
+            self._remember(key, value, created)
+            if self._db is not None:
+                self._disk(self._save_to_disk, key, value, created)
+
+    def get_stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "persistent": self._db is not None,
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "disk_errors": self.disk_errors,
+                "hit_rate": self.hits / lookups if lookups else 0.0
+            }
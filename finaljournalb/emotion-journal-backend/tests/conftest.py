@@ -0,0 +1,9 @@
+import os
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules are imported flat, as `python app.py` and gunicorn do from emotion-journal-backend/
+sys.path.insert(0, BACKEND_DIR)
+# pyshared is normally pip-installed from requirements.txt; the checkout works too
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(BACKEND_DIR)), "pyshared"))
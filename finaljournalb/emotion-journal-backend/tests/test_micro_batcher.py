@@ -0,0 +1,84 @@
+import threading
+import time
+
+import pytest
+
+from micro_batcher import MicroBatcher, QueueFullError
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.perf_counter() + timeout
+    while not condition():
+        assert time.perf_counter() < deadline, "condition not reached"
+        time.sleep(0.005)
+
+
+@pytest.fixture
+def full_batcher():
+    """A depth-1 batcher whose worker is stuck on one text and has one more queued"""
+    release = threading.Event()
+
+    def infer_batch(texts):
+        release.wait()
+        return [text.upper() for text in texts]
+
+    batcher = MicroBatcher(infer_batch, window_ms=0, max_batch_size=1, max_queue_depth=1)
+    results = []
+    callers = [threading.Thread(target=lambda t=t: results.append(batcher.submit(t))) for t in ("a", "b")]
+    callers[0].start()
+    wait_for(lambda: batcher.get_stats()["queue_depth"] == 0 and callers[0].is_alive())
+    callers[1].start()
+    wait_for(lambda: batcher.get_stats()["queue_depth"] == 1)
+    yield batcher
+    release.set()
+    for caller in callers:
+        caller.join(timeout=5)
+    assert sorted(results) == ["A", "B"]
+
+
+def test_results_come_back_in_order():
+    batcher = MicroBatcher(lambda texts: [len(text) for text in texts], window_ms=20)
+    results = {}
+    threads = [threading.Thread(target=lambda t=t: results.update({t: batcher.submit(t)}))
+               for t in ("a", "bb", "ccc")]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(timeout=5)
+    assert results == {"a": 1, "bb": 2, "ccc": 3}
+
+
+def test_full_queue_raises_instead_of_blocking(full_batcher):
+    start = time.perf_counter()
+    with pytest.raises(QueueFullError):
+        full_batcher.submit("c")
+    assert time.perf_counter() - start < 1.0
+
+
+def test_short_batch_fails_every_future():
+    batcher = MicroBatcher(lambda texts: texts[:-1], window_ms=50)
+    errors = []
+
+    def call(text):
+        try:
+            batcher.submit(text)
+        except RuntimeError as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=call, args=(t,)) for t in ("a", "b")]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(timeout=5)
+    assert len(errors) == 2
+
+
+def test_analyze_answers_503_when_the_queue_is_full(full_batcher, monkeypatch):
+    pytest.importorskip("flask")
+    pytest.importorskip("transformers")
+    import app
+
+    monkeypatch.setattr(app, "batcher", full_batcher)
+    response = app.app.test_client().post("/analyze", json={"text": "an uncached journal entry"})
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "1"
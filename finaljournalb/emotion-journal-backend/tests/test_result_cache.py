@@ -0,0 +1,47 @@
+import sqlite3
+
+from result_cache import ResultCache
+
+RESULT = [{"label": "joy", "score": 0.9}]
+
+
+def test_lookup_ignores_case_and_whitespace():
+    cache = ResultCache()
+    cache.put("A good  day", RESULT)
+    assert cache.get("a good day ") == RESULT
+    assert cache.get("a bad day") is None
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_persisted_results_survive_a_restart(tmp_path):
+    path = str(tmp_path / "cache.db")
+    ResultCache(persist_path=path).put("a good day", RESULT)
+    cache = ResultCache(persist_path=path)
+    assert cache.get("a good day") == RESULT
+    assert cache.disk_hits == 1
+
+
+def test_disk_is_pruned_to_max_disk_entries(tmp_path):
+    path = str(tmp_path / "cache.db")
+    cache = ResultCache(persist_path=path, max_disk_entries=5, prune_every=10)
+    for i in range(20):
+        cache.put(f"entry {i}", RESULT)
+    rows = sqlite3.connect(path).execute("SELECT COUNT(*) FROM results").fetchone()[0]
+    assert rows == 5
+
+
+def test_locked_disk_tier_does_not_fail_the_request(tmp_path):
+    path = str(tmp_path / "cache.db")
+    cache = ResultCache(persist_path=path, busy_timeout=0.05)
+    # Another worker holds the write lock
+    other = sqlite3.connect(path, isolation_level=None)
+    other.execute("BEGIN EXCLUSIVE")
+    try:
+        cache.put("a good day", RESULT)
+        assert cache.get("a good day") == RESULT
+        assert cache.get("a bad day") is None
+    finally:
+        other.execute("ROLLBACK")
+    assert cache.disk_errors >= 1
+    cache.put("another day", RESULT)
+    assert cache.get_stats()["persistent"]
@@ -0,0 +1,139 @@
+import os
+import time
+
+import numpy as np
+
+MODEL_NAME = "bhadresh-savani/distilbert-base-uncased-emotion"
+BACKENDS = ("transformers", "onnx-int8")
+
+
+class TransformersBackend:
+    """The stock fp32 PyTorch pipeline"""
+
+    name = "transformers"
+
+    def __init__(self, model_name=MODEL_NAME):
+        from transformers import pipeline
+
+        self.model_name = model_name
+        self.pipeline = pipeline("text-classification", model=model_name, return_all_scores=True)
+
+    def __call__(self, texts):
+        """All label scores for each text, in input order"""
+        return self.pipeline(texts, batch_size=len(texts), truncation=True)
+
+    def after_fork(self, intra_op_threads=None):
+        """Size torch's thread pool for one of several forked server workers"""
+        if intra_op_threads:
+            import torch
+
+            torch.set_num_threads(intra_op_threads)
+
+
+class OnnxInt8Backend:
+    """Dynamically int8-quantized ONNX export of the classifier run with onnxruntime.
+
+    The model is exported and quantized once into `model_dir` and reused
+    on later starts. `intra_op_threads` bounds the threads one forward pass
+    may use; leave it at the physical core count on a dedicated host, or
+    lower it when several workers share the machine.
+    """
+
+    name = "onnx-int8"
+
+    def __init__(self, model_name=MODEL_NAME, model_dir="onnx_model",
+                 intra_op_threads=None, inter_op_threads=1, max_length=512):
+        from transformers import AutoConfig, AutoTokenizer
+
+        self.model_name = model_name
+        self.model_dir = model_dir
+        self.max_length = max_length
+        self.tokenizer = AutoTokenizer.from_pretrained(model_name)
+        config = AutoConfig.from_pretrained(model_name)
+        self.labels = [config.id2label[i] for i in range(len(config.id2label))]
+
+        self.export_time = 0.0
+        quantized_path = os.path.join(model_dir, "model.int8.onnx")
+        if not os.path.exists(quantized_path):
+            start = time.perf_counter()
+            self.export(quantized_path)
+            self.export_time = time.perf_counter() - start
+
+        self.quantized_path = quantized_path
+        self.inter_op_threads = inter_op_threads
+        self.session = self.create_session(intra_op_threads)
+        self.input_names = {i.name for i in self.session.get_inputs()}
+
+    def create_session(self, intra_op_threads=None):
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+        options.intra_op_num_threads = intra_op_threads or 0
+        options.inter_op_num_threads = self.inter_op_threads
+        return ort.InferenceSession(
+            self.quantized_path, options, providers=["CPUExecutionProvider"]
+        )
+
+    def after_fork(self, intra_op_threads=None):
+        """Give a forked server worker its own session.
+
+        onnxruntime's thread pools do not survive fork(), so the session
+        built in the parent is replaced; the int8 model is small enough
+        that a copy per worker is cheap.
+        """
+        self.session = self.create_session(intra_op_threads)
+
+    def export(self, quantized_path):
+        """Export the fp32 model to ONNX, then quantize its weights to int8"""
+        import torch
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+        from transformers import AutoModelForSequenceClassification
+
+        os.makedirs(self.model_dir, exist_ok=True)
+        fp32_path = os.path.join(self.model_dir, "model.onnx")
+        model = AutoModelForSequenceClassification.from_pretrained(self.model_name).eval()
+        sample = self.tokenizer(["export sample"], return_tensors="pt")
+
+        with torch.no_grad():
+            torch.onnx.export(
+                model,
+                (sample["input_ids"], sample["attention_mask"]),
+                fp32_path,
+                input_names=["input_ids", "attention_mask"],
+                output_names=["logits"],
+                dynamic_axes={
+                    "input_ids": {0: "batch", 1: "sequence"},
+                    "attention_mask": {0: "batch", 1: "sequence"},
+                    "logits": {0: "batch"}
+                },
+                opset_version=17
+            )
+
+        quantize_dynamic(fp32_path, quantized_path, weight_type=QuantType.QInt8)
+
+    def __call__(self, texts):
+        """All label scores for each text, in the pipeline's output format"""
+        encoded = self.tokenizer(
+            list(texts), padding=True, truncation=True,
+            max_length=self.max_length, return_tensors="np"
+        )
+        feed = {k: v.astype(np.int64) for k, v in encoded.items() if k in self.input_names}
+        logits = self.session.run(["logits"], feed)[0]
+
+        exp = np.exp(logits - logits.max(axis=1, keepdims=True))
+        probs = exp / exp.sum(axis=1, keepdims=True)
+        return [
+            [{"label": label, "score": float(score)} for label, score in zip(self.labels, row)]
+            for row in probs
+        ]
+
+
+def load_backend(name="transformers", model_name=MODEL_NAME, **kwargs):
+    """Build the named inference backend ("transformers" or "onnx-int8")"""
+    if name == "transformers":
+        return TransformersBackend(model_name)
+    if name == "onnx-int8":
+        return OnnxInt8Backend(model_name, **kwargs)
+    raise ValueError(f"backend must be one of {BACKENDS}")
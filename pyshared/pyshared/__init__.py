@@ -0,0 +1,6 @@
+"""Python modules shared by the Streamlit app and the journal backend.
+
+Installed by both apps' requirements files (`-e` path to this project) and
+imported as `pyshared.metrics` and `pyshared.log_writer`, so there is one
+copy to fix.
+"""
@@ -0,0 +1,209 @@
+import atexit
+import csv
+import logging
+import os
+import threading
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process file locks, one writer per file
+    fcntl = None
+
+DURABILITY_MODES = ("none", "fsync")
+
+logger = logging.getLogger(__name__)
+
+
+class BufferedWriter:
+    """Append-only writer that group-commits rows from a background thread.
+
+    Rows are queued in memory and handed to `write_batch(rows)` when
+    `flush_rows` are pending or `flush_interval` seconds have passed.
+    A batch that fails to write is logged and put back at the head of the
+    queue; the thread retries with exponential back-off up to
+    `max_backoff` seconds. While writes keep failing at most `max_pending`
+    rows are held, the oldest being dropped first.
+    """
+
+    def __init__(self, write_batch, name="log", flush_rows=100, flush_interval=1.0,
+                 max_pending=100000, max_backoff=30.0):
+        self.write_batch = write_batch
+        self.name = name
+        self.flush_rows = flush_rows
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.max_backoff = max_backoff
+
+        self._buffer = []
+        self._buffer_lock = threading.Condition()
+        self._write_lock = threading.Lock()
+        self._closed = False
+        # The flush thread does not survive fork(); see get_writer
+        self.pid = os.getpid()
+
+        self.rows_written = 0
+        self.batches_written = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+        self.rows_dropped = 0
+        self.last_error = None
+
+        self._thread = threading.Thread(
+            target=self._run, name=f"buffered-writer-{name}", daemon=True
+        )
+        self._thread.start()
+
+    def write(self, row):
+        self.write_rows([row])
+
+    def write_rows(self, rows):
+        with self._buffer_lock:
+            if self._closed:
+                raise RuntimeError("Writer is closed")
+            self._buffer.extend(rows)
+            self._trim()
+            if len(self._buffer) >= self.flush_rows:
+                self._buffer_lock.notify()
+
+    def _trim(self):
+        overflow = len(self._buffer) - self.max_pending
+        if overflow > 0:
+            del self._buffer[:overflow]
+            self.rows_dropped += overflow
+
+    @property
+    def pending(self):
+        with self._buffer_lock:
+            return len(self._buffer)
+
+    def flush(self):
+        """Write every queued row now; False if the write failed and was requeued"""
+        with self._write_lock:
+            with self._buffer_lock:
+                rows, self._buffer = self._buffer, []
+            if not rows:
+                return True
+
+            try:
+                self.write_batch(rows)
+            except Exception as e:
+                with self._buffer_lock:
+                    self._buffer[:0] = rows
+                    self._trim()
+                    self.failures += 1
+                    self.consecutive_failures += 1
+                    self.last_error = f"{type(e).__name__}: {e}"
+                logger.exception("Writer %s failed to write %d rows; will retry", self.name, len(rows))
+                return False
+
+            self.rows_written += len(rows)
+            self.batches_written += 1
+            self.consecutive_failures = 0
+            return True
+
+    def _retry_delay(self):
+        return min(self.flush_interval * 2 ** self.consecutive_failures, self.max_backoff)
+
+    def _run(self):
+        while True:
+            with self._buffer_lock:
+                if self.consecutive_failures:
+                    # Back off without waking for new rows
+                    self._buffer_lock.wait(timeout=self._retry_delay())
+                elif not self._closed and len(self._buffer) < self.flush_rows:
+                    self._buffer_lock.wait(timeout=self.flush_interval)
+                closed = self._closed
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("Writer %s flush thread error", self.name)
+            if closed:
+                return
+
+    def close(self, retries=3):
+        """Flush what is left and stop the background thread"""
+        with self._buffer_lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._buffer_lock.notify()
+        self._thread.join()
+        for attempt in range(retries):
+            if self.flush():
+                return
+        logger.error("Writer %s closed with %d unwritten rows", self.name, self.pending)
+
+    def get_stats(self):
+        with self._buffer_lock:
+            return {
+                "pending": len(self._buffer),
+                "rows_written": self.rows_written,
+                "batches_written": self.batches_written,
+                "failures": self.failures,
+                "rows_dropped": self.rows_dropped,
+                "last_error": self.last_error
+            }
+
+
+class BufferedCSVWriter(BufferedWriter):
+    """BufferedWriter that appends to a CSV file.
+
+    With durability="fsync" every flushed batch is fsynced before the
+    writer moves on. Each batch is appended under an exclusive file lock,
+    so several processes (e.g. pre-forked server workers) can share a file.
+    """
+
+    def __init__(self, path, header=None, flush_rows=100, flush_interval=1.0,
+                 durability="none", encoding="utf-8"):
+        if durability not in DURABILITY_MODES:
+            raise ValueError(f"durability must be one of {DURABILITY_MODES}")
+
+        self.path = path
+        self.header = header
+        self.durability = durability
+        self.encoding = encoding
+        super().__init__(self._append, name=os.path.basename(path),
+                         flush_rows=flush_rows, flush_interval=flush_interval)
+
+    def _append(self, rows):
+        with open(self.path, mode='a', newline='', encoding=self.encoding) as file:
+            if fcntl is not None:
+                fcntl.flock(file.fileno(), fcntl.LOCK_EX)
+            # Another process may have appended between open() and the lock
+            needs_header = self.header and file.seek(0, os.SEEK_END) == 0
+            writer = csv.writer(file)
+            if needs_header:
+                writer.writerow(self.header)
+            writer.writerows(rows)
+            file.flush()
+            if self.durability == "fsync":
+                os.fsync(file.fileno())
+
+
+_writers = {}
+_writers_lock = threading.Lock()
+
+
+def get_writer(path, header=None, **kwargs):
+    """Process-wide writer for `path`, so every thread appends through one queue.
+
+    A writer inherited from a parent process across fork() has no flush
+    thread, so a forked child gets a fresh one.
+    """
+    key = os.path.abspath(path)
+    with _writers_lock:
+        writer = _writers.get(key)
+        if writer is None or writer._closed or writer.pid != os.getpid():
+            writer = BufferedCSVWriter(path, header=header, **kwargs)
+            _writers[key] = writer
+        return writer
+
+
+@atexit.register
+def close_all():
+    """Flush every open writer; runs automatically at interpreter shutdown"""
+    with _writers_lock:
+        writers = list(_writers.values())
+        _writers.clear()
+    for writer in writers:
+        writer.close()
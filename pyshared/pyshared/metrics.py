@@ -0,0 +1,343 @@
+import bisect
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+
+try:
+    import fcntl
+except ImportError:  # Windows: no pre-fork servers, so no snapshot directory either
+    fcntl = None
+
+# Seconds; spans cache hits through slow model calls and network timeouts
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+logger = logging.getLogger(__name__)
+
+
+def format_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{v}"' for k, v in sorted(labels.items())) + "}"
+
+
+class Histogram:
+    """Cumulative latency histogram in Prometheus' bucket layout"""
+
+    kind = "histogram"
+
+    def __init__(self, name, help="", labels=None, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = labels or {}
+        self.buckets = tuple(buckets)
+        self._counts = [0] * (len(self.buckets) + 1)
+        self._sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, seconds):
+        index = bisect.bisect_left(self.buckets, seconds)
+        with self._lock:
+            self._counts[index] += 1
+            self._sum += seconds
+
+    @contextmanager
+    def time(self):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start)
+
+    def snapshot(self):
+        with self._lock:
+            return list(self._counts), self._sum
+
+    def quantile(self, q):
+        """Estimate a quantile by interpolating inside its bucket (None if empty)"""
+        counts, _ = self.snapshot()
+        total = sum(counts)
+        if not total:
+            return None
+        rank = q * total
+        seen = 0
+        for i, count in enumerate(counts):
+            if seen + count >= rank and count:
+                lower = self.buckets[i - 1] if i > 0 else 0.0
+                upper = self.buckets[i] if i < len(self.buckets) else self.buckets[-1]
+                return lower + (upper - lower) * (rank - seen) / count
+            seen += count
+        return self.buckets[-1]
+
+    def summary(self):
+        counts, total_seconds = self.snapshot()
+        count = sum(counts)
+        return {
+            "count": count,
+            "mean_ms": total_seconds / count * 1000 if count else None,
+            "p50_ms": self.quantile(0.5) * 1000 if count else None,
+            "p95_ms": self.quantile(0.95) * 1000 if count else None
+        }
+
+    def export(self):
+        counts, total_seconds = self.snapshot()
+        return {"kind": self.kind, "name": self.name, "help": self.help, "labels": self.labels,
+                "buckets": list(self.buckets), "counts": counts, "sum": total_seconds}
+
+    def merge(self, data):
+        if tuple(data["buckets"]) != self.buckets:
+            logger.warning("skipping %s from another process: bucket layout differs", self.name)
+            return
+        with self._lock:
+            for i, count in enumerate(data["counts"]):
+                self._counts[i] += count
+            self._sum += data["sum"]
+
+    def render(self):
+        counts, total_seconds = self.snapshot()
+        lines, cumulative = [], 0
+        for bound, count in zip(self.buckets + (float("inf"),), counts):
+            cumulative += count
+            le = "+Inf" if bound == float("inf") else repr(bound)
+            lines.append(f"{self.name}_bucket{format_labels({**self.labels, 'le': le})} {cumulative}")
+        lines.append(f"{self.name}_sum{format_labels(self.labels)} {total_seconds}")
+        lines.append(f"{self.name}_count{format_labels(self.labels)} {cumulative}")
+        return lines
+
+
+class Counter:
+    """Monotonic event counter"""
+
+    kind = "counter"
+
+    def __init__(self, name, help="", labels=None):
+        self.name = name
+        self.help = help
+        self.labels = labels or {}
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+    def export(self):
+        return {"kind": self.kind, "name": self.name, "help": self.help, "labels": self.labels,
+                "value": self.value}
+
+    def merge(self, data):
+        self.inc(data["value"])
+
+    def render(self):
+        return [f"{self.name}{format_labels(self.labels)} {self.value}"]
+
+
+class MetricsRegistry:
+    """Named histograms and counters for one process, plus scrape-time gauges.
+
+    Collectors are callables returning (name, help, value) tuples; they let
+    components that already keep their own stats be exported without
+    double bookkeeping.
+    """
+
+    def __init__(self):
+        self._metrics = {}
+        self._collectors = []
+        self._lock = threading.Lock()
+
+    def _get(self, cls, name, help, labels, **kwargs):
+        key = (name, tuple(sorted((labels or {}).items())))
+        with self._lock:
+            metric = self._metrics.get(key)
+            if metric is None:
+                metric = cls(name, help, labels, **kwargs)
+                self._metrics[key] = metric
+            return metric
+
+    def histogram(self, name, help="", labels=None, buckets=DEFAULT_BUCKETS):
+        return self._get(Histogram, name, help, labels, buckets=buckets)
+
+    def counter(self, name, help="", labels=None):
+        return self._get(Counter, name, help, labels)
+
+    def add_collector(self, collector):
+        with self._lock:
+            self._collectors.append(collector)
+
+    def metrics(self):
+        with self._lock:
+            return list(self._metrics.values())
+
+    def collect(self):
+        """(name, help, value) gauges from every collector; a failing collector is logged and skipped"""
+        with self._lock:
+            collectors = list(self._collectors)
+        gauges = []
+        for collector in collectors:
+            try:
+                gauges.extend(collector())
+            except Exception:
+                # One broken collector must not take down the whole scrape
+                logger.exception("metrics collector %r failed", collector)
+        return [(name, help, value) for name, help, value in gauges if value is not None]
+
+    def export(self):
+        """This process's metrics and gauges as JSON-ready data, for merging across processes"""
+        return {
+            "pid": os.getpid(),
+            "metrics": [metric.export() for metric in self.metrics()],
+            "gauges": [list(gauge) for gauge in self.collect()]
+        }
+
+    def merge(self, data):
+        """Add another process's exported histograms and counters to this registry"""
+        for item in data["metrics"]:
+            if item["kind"] == Histogram.kind:
+                metric = self.histogram(item["name"], item["help"], item["labels"], item["buckets"])
+            else:
+                metric = self.counter(item["name"], item["help"], item["labels"])
+            metric.merge(item)
+
+    def render_prometheus(self, gauges=None):
+        """All metrics in the Prometheus text exposition format.
+
+        `gauges` are (name, help, value, labels) tuples to render instead of
+        this process's collectors.
+        """
+        lines, described = [], set()
+        for metric in sorted(self.metrics(), key=lambda m: m.name):
+            if metric.name not in described:
+                described.add(metric.name)
+                lines.append(f"# HELP {metric.name} {metric.help}")
+                lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.render())
+
+        if gauges is None:
+            gauges = [(name, help, value, {}) for name, help, value in self.collect()]
+        for name, help, value, labels in gauges:
+            if name not in described:
+                described.add(name)
+                lines.append(f"# HELP {name} {help}")
+                lines.append(f"# TYPE {name} gauge")
+            lines.append(f"{name}{format_labels(labels)} {float(value)}")
+        return "\n".join(lines) + "\n"
+
+REGISTRY = MetricsRegistry()
+
+
+def histogram(name, help="", labels=None, buckets=DEFAULT_BUCKETS):
+    return REGISTRY.histogram(name, help, labels, buckets)
+
+
+def counter(name, help="", labels=None):
+    return REGISTRY.counter(name, help, labels)
+
+
+def timed(metric):
+    """Decorator recording each call's duration in `metric`"""
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            with metric.time():
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+# Pre-fork servers: each worker process has its own REGISTRY. Workers write
+# snapshots to a shared directory and /metrics, whichever worker answers it,
+# merges them, so one scrape covers the whole server.
+
+RETIRED_SNAPSHOT = "retired.json"
+
+
+@contextmanager
+def _directory_lock(directory):
+    if fcntl is None:
+        yield
+        return
+    with open(os.path.join(directory, ".lock"), "a") as lock_file:
+        fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+        yield
+
+
+def _write_json(path, data):
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w") as file:
+        json.dump(data, file)
+    os.replace(tmp_path, path)
+
+
+def write_snapshot(directory, registry=None):
+    """Atomically write this process's metrics to `<directory>/<pid>.json`"""
+    _write_json(os.path.join(directory, f"{os.getpid()}.json"), (registry or REGISTRY).export())
+
+
+def retire_snapshot(directory, pid):
+    """Fold an exited worker's histograms and counters into retired.json.
+
+    Its gauges described a live process and are dropped. Called by the
+    master, so crashed workers are folded in too.
+    """
+    path = os.path.join(directory, f"{pid}.json")
+    retired_path = os.path.join(directory, RETIRED_SNAPSHOT)
+    with _directory_lock(directory):
+        if not os.path.exists(path):
+            return
+        retired = MetricsRegistry()
+        for source in (retired_path, path):
+            try:
+                with open(source) as file:
+                    retired.merge(json.load(file))
+            except FileNotFoundError:
+                continue
+            except ValueError:
+                logger.exception("unreadable metrics snapshot %s", source)
+        export = retired.export()
+        export.update(pid=None, gauges=[])
+        _write_json(retired_path, export)
+        os.remove(path)
+
+
+def render_snapshots(directory, registry=None):
+    """Prometheus text for every worker that wrote to `directory`.
+
+    Histograms and counters are summed; gauges keep one series per worker,
+    labelled with its pid. This process's snapshot is refreshed first, the
+    others are as old as their last write.
+    """
+    write_snapshot(directory, registry)
+    merged, gauges = MetricsRegistry(), []
+    with _directory_lock(directory):
+        for name in sorted(os.listdir(directory)):
+            if not name.endswith(".json"):
+                continue
+            try:
+                with open(os.path.join(directory, name)) as file:
+                    data = json.load(file)
+            except (OSError, ValueError):
+                logger.exception("unreadable metrics snapshot %s", name)
+                continue
+            merged.merge(data)
+            gauges.extend((gauge_name, help, value, {"pid": str(data["pid"])})
+                          for gauge_name, help, value in data["gauges"])
+    gauges.sort(key=lambda gauge: gauge[0])
+    return merged.render_prometheus(gauges)
+
+
+def start_snapshot_thread(directory, interval=5.0, registry=None):
+    """Write this process's snapshot every `interval` seconds from a daemon thread"""
+    def run():
+        while True:
+            try:
+                write_snapshot(directory, registry)
+            except OSError:
+                logger.exception("could not write metrics snapshot to %s", directory)
+            time.sleep(interval)
+
+    thread = threading.Thread(target=run, name="metrics-snapshot", daemon=True)
+    thread.start()
+    return thread
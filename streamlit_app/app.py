@@ -1,12 +1,7 @@
 import streamlit as st
-import cv2
-import numpy as np
-from enhanced_emotion_detector import EnhancedEmotionDetector
-from standalone_analyzer import generate_full_analysis
-from database_auth import DatabaseAuth
-from collections import Counter
-import pandas as pd
 import os
+from collections import Counter
+from database_auth import get_database_auth
 
 # Page configuration
 st.set_page_config(
@@ -15,8 +10,8 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
-# Initialize database authentication
-auth = DatabaseAuth()
+# Pooled, cached client for the user API, shared by every session
+auth = get_database_auth()
 
 # Custom CSS for better styling
 st.markdown("""
@@ -45,6 +40,56 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
+@st.fragment(run_every=0.25)
+def render_login_job():
+    """Poll the background login so the page keeps responding while the API answers"""
+    email, future = st.session_state.login_job
+    if not future.done():
+        st.info("⏳ Authenticating...")
+        return
+    
+    del st.session_state.login_job
+    try:
+        user = future.result()
+    except Exception as e:
+        st.session_state.login_error = f"Connection error: {e}"
+    else:
+        if user:
+            auth.login(user, email)
+        else:
+            st.session_state.login_error = "❌ User not found. Please check your email or register on the main website first."
+    # A full rerun drops this fragment, so polling stops once the answer is in
+    st.rerun(scope="app")
+
+@st.fragment(run_every=1.0)
+def render_batch_job():
+    """Progress of the background recording analysis"""
+    future, progress = st.session_state.batch_job
+    if not future.done():
+        total = progress["total"]
+        st.progress(progress["done"] / total if total else 0.0,
+                    text=f"🎞️ Analyzing recording... {progress['done']}/{total or '?'} shards")
+        return
+    
+    del st.session_state.batch_job
+    try:
+        st.session_state.batch_result = future.result()
+    except Exception as e:
+        st.session_state.batch_result = e
+    # A full rerun shows the result outside this fragment, so polling stops
+    st.rerun(scope="app")
+
+def render_batch_result(summary):
+    if isinstance(summary, Exception):
+        st.error(f"❌ Batch analysis failed: {summary} (start it again to resume)")
+    elif summary.get("already_merged"):
+        st.info("ℹ️ This recording was already analyzed and logged.")
+    else:
+        st.success(
+            f"✅ Analyzed {summary['samples']} samples in {summary['shards']} shards "
+            f"({summary['resumed_shards']} resumed) and logged {summary['logged']} emotion changes."
+        )
+
 # Authentication Section
 if "authenticated" not in st.session_state:
     st.session_state.authenticated = False
@@ -65,12 +110,13 @@ if not st.session_state.authenticated:
         login_btn = st.button("🚀 Login", type="primary")
     
     if login_btn and email:
-        with st.spinner("Authenticating..."):
-            if auth.authenticate_user(email):
-                st.success(f"✅ Welcome back, {st.session_state.username}!")
-                st.rerun()
-            else:
-                st.error("❌ User not found. Please check your email or register on the main website first.")
+        st.session_state.pop("login_error", None)
+        st.session_state.login_job = (email, auth.validate_user_async(email))
+    
+    if "login_job" in st.session_state:
+        render_login_job()
+    elif "login_error" in st.session_state:
+        st.error(st.session_state.login_error)
     
     st.markdown("---")
     st.markdown("### 📝 Don't have an account?")
@@ -79,15 +125,59 @@ if not st.session_state.authenticated:
     st.stop()
 
 # Main Application (Authenticated Users)
+# Heavier modules are imported only past the login gate, so the login page paints without them
+import datetime
+from enhanced_emotion_detector import EnhancedEmotionDetector
+from model_registry import get_model_registry, preload_model, shared_registry, default_backend
+from emotion_backends import BACKENDS
+from diagnostics import render_diagnostics_panel, get_session_profiler
+from pyshared.metrics import counter
+from batch_analysis import BatchJob, VIDEO_EXTENSIONS, IMAGE_EXTENSIONS, submit_batch_job, user_dir_for
+
 user_data = st.session_state.user_data
 username = st.session_state.username
 
+# The shared model loads in the background while the page renders (EMOTION_PRELOAD=0 waits for first use)
+face_backend = st.session_state.get("face_backend", default_backend())
+if os.environ.get("EMOTION_PRELOAD", "1") != "0":
+    model_registry = preload_model(face_backend)
+else:
+    model_registry = shared_registry(face_backend)
+
 st.markdown(f'<div class="main-header"><h1>🧠 Real-Time Emotion Detection</h1><h3>Welcome, {username}!</h3></div>', unsafe_allow_html=True)
 
 # User Information Sidebar
 with st.sidebar:
     st.markdown(f'<div class="user-info"><h3>👤 User Profile</h3><p><strong>Name:</strong> {user_data["name"]}</p><p><strong>Email:</strong> {user_data["email"]}</p><p><strong>User ID:</strong> {user_data["id"]}</p></div>', unsafe_allow_html=True)
     
+    with st.expander("🧠 Model"):
+        st.selectbox(
+            "Inference backend",
+            BACKENDS,
+            index=BACKENDS.index(default_backend()),
+            key="face_backend",
+            help="DeepFace runs its full analysis API; the TFLite backends call the emotion CNN directly on tracked face crops"
+        )
+        model_stats = model_registry.get_stats()
+        if not model_stats["loaded"]:
+            st.caption("⏳ Model not loaded yet (loads in the background or on first detection)")
+        st.caption(f"Load time: {model_stats['load_time']:.2f}s (warm-up {model_stats['warmup_time']:.2f}s)")
+        if model_stats["model_memory_mb"] is not None:
+            st.caption(f"Model memory: {model_stats['model_memory_mb']:.0f} MB")
+        if model_stats["resident_memory_mb"] is not None:
+            st.caption(f"Process RSS: {model_stats['resident_memory_mb']:.0f} MB")
+    
+    st.toggle(
+        "📡 Low-latency video stream",
+        # The stream is served from its own port; only default to it once MJPEG_PUBLIC_URL says how browsers reach it
+        value=bool(os.environ.get("MJPEG_PUBLIC_URL")),
+        key="low_latency_stream",
+        help="Stream the camera as MJPEG instead of re-sending an image through Streamlit every frame. "
+             "Served on MJPEG_PORT; browsers on other hosts need MJPEG_HOST/MJPEG_PUBLIC_URL set"
+    )
+    
+    render_diagnostics_panel()
+    
     if st.button("🚪 Logout"):
         for key in list(st.session_state.keys()):
             del st.session_state[key]
@@ -95,9 +185,11 @@ with st.sidebar:
 
 # Initialize detector
 if "detector" not in st.session_state:
-    st.session_state.detector = EnhancedEmotionDetector(user_data)
+    st.session_state.detector = EnhancedEmotionDetector(user_data, model_registry=model_registry)
 
 detector = st.session_state.detector
+detector.model_registry = model_registry
+detector.profiler = get_session_profiler()
 
 # Control buttons
 col1, col2, col3 = st.columns([1, 1, 2])
@@ -121,70 +213,131 @@ if start_detection:
 if stop_detection:
     st.session_state.detection_running = False
 
-# Main content area
+# Keep the report open across reruns so its own widgets (PDF, downloads) keep working
 if show_analysis:
+    st.session_state.analysis_open = True
+
+if start_detection:
+    st.session_state.analysis_open = False
+
+# Main content area
+if st.session_state.get("analysis_open"):
+    from standalone_analyzer import generate_full_analysis
+    
     st.markdown("## 📈 Your Emotion Analysis")
-    if os.path.exists(detector.CSV_FILE):
-        generate_full_analysis(detector.CSV_FILE, key_prefix=f"user_{user_data['id']}")
+    if detector.store.count():
+        generate_full_analysis(
+            detector.store,
+            key_prefix=f"user_{user_data['id']}",
+            snapshot_index=detector.snapshot_index
+        )
     else:
         st.info("🆕 No emotion data found yet. Start detection to begin tracking your emotions!")
 
 # Real-time detection
 if st.session_state.detection_running:
+    import cv2
+    from mjpeg_stream import get_stream_server
+    from frame_sources import open_frame_source
+    
     st.markdown("### 🎥 Live Emotion Detection")
     
     # Create placeholders
     video_placeholder = st.empty()
     emotion_placeholder = st.empty()
     stats_placeholder = st.empty()
+    perf_placeholder = st.empty()
     
-    # Initialize webcam
-    cap = cv2.VideoCapture(0)
+    # Webcam by default; FRAME_SOURCE can point at a video file or image directory to replay
+    replay_fps = os.environ.get("FRAME_SOURCE_FPS")
+    source = open_frame_source(
+        os.environ.get("FRAME_SOURCE", "0"),
+        fps=float(replay_fps) if replay_fps else None
+    )
     
-    if not cap.isOpened():
-        st.error("❌ Could not access webcam. Please check your camera permissions.")
+    if not source.open():
+        if source.is_live:
+            st.error("❌ Could not access webcam. Please check your camera permissions.")
+        else:
+            st.error("❌ Could not open the replay source.")
         st.session_state.detection_running = False
     else:
-        cap.set(cv2.CAP_PROP_FRAME_WIDTH, 640)
-        cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 480)
-        
         emotion_counter = Counter()
-        frame_count = 0
+        last_result_seq = 0
+        
+        stream_server, stream_token, frame_stream = None, None, None
+        
+        frames_captured = counter("app_frames_captured_total", "Frames read from the frame source")
+        
+        # Profile this loop and the inference worker when the session asked for it
+        if detector.profiler is not None:
+            detector.profiler.add_thread()
+            detector.profiler.start()
+        
+        # Wait for the background preload (or load now) before the worker needs the model
+        detector.model_registry = get_model_registry(face_backend)
+        
+        # Inference runs on a background worker so capture never waits on DeepFace
+        detector.start_worker()
         
         try:
+            # The MJPEG stream is paced and encoded on its own thread; the <img> tag is sent once
+            if st.session_state.low_latency_stream:
+                try:
+                    stream_server = get_stream_server()
+                except OSError as e:
+                    st.warning(f"⚠️ Low-latency stream unavailable ({e}); showing frames through Streamlit")
+                else:
+                    stream_token, frame_stream = stream_server.open_stream(target_fps=15)
+                    video_placeholder.markdown(
+                        f'<img src="{stream_server.stream_url(stream_token)}" style="width:100%;border-radius:8px;">',
+                        unsafe_allow_html=True
+                    )
+            
             while st.session_state.detection_running:
-                ret, frame = cap.read()
+                ret, frame = source.read()
                 if not ret:
-                    st.error("❌ Failed to read from webcam")
+                    if source.is_live:
+                        st.error("❌ Failed to read from webcam")
+                    else:
+                        st.info("⏹️ Replay finished")
+                        st.session_state.detection_running = False
                     break
+                frames_captured.inc()
                 
-                frame = cv2.flip(frame, 1)  # Mirror the frame
+                # The scheduler paces inference; the worker only keeps the newest frame
+                if detector.scheduler.should_infer(frame):
+                    detector.submit_frame(frame)
                 
-                # Analyze every 5th frame for performance
-                if frame_count % 5 == 0:
-                    emotion, confidence = detector.analyze_frame(frame)
+                result = detector.get_latest_result()
+                new_result = bool(result) and result["seq"] != last_result_seq
+                if new_result:
+                    last_result_seq = result["seq"]
+                    emotion, confidence = result["emotion"], result["confidence"]
+                    
+                    if result["error"]:
+                        st.error(f"Analysis error: {result['error']}")
                     
                     if confidence >= detector.confidence_threshold:
                         # Log significant emotion changes
                         if emotion != detector.current_emotion:
-                            detector.log_emotion_change(emotion, confidence, frame)
+                            detector.log_emotion_change(emotion, confidence, result["frame"], result["face_box"])
                         
                         detector.current_emotion = emotion
                         detector.current_confidence = confidence
                         emotion_counter[emotion] += 1
                 
-                # Draw emotion info on frame
-                if detector.current_emotion:
-                    emoji = detector.emotion_emoji.get(detector.current_emotion, "🙂")
-                    label = f"{emoji} {detector.current_emotion.upper()} ({detector.current_confidence:.1f}%)"
+                # One BGR->RGB conversion; the label is blended into the RGB frame in place
+                frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+                detector.draw_label(frame_rgb, detector.current_emotion, detector.current_confidence)
+                if frame_stream is not None:
+                    frame_stream.publish(frame_rgb)
                 else:
-                    label = "🔍 Detecting..."
+                    video_placeholder.image(frame_rgb, channels="RGB", use_container_width=True)
                 
-                frame = detector.draw_text_with_emoji(frame, label, 30, 60)
-                
-                # Convert BGR to RGB for Streamlit
-                frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-                video_placeholder.image(frame_rgb, channels="RGB", use_container_width=True)
+                # Everything below only changes with a new result, so skip the websocket otherwise
+                if not new_result:
+                    continue
                 
                 # Update emotion display
                 if detector.current_emotion:
@@ -194,14 +347,73 @@ if st.session_state.detection_running:
                 if emotion_counter:
                     stats_placeholder.bar_chart(emotion_counter)
                 
-                frame_count += 1
+                worker_stats = detector.get_worker_stats()
+                snapshot_stats = detector.snapshot_sink.get_stats()
+                stream_info = ""
+                if frame_stream is not None:
+                    stream_stats = frame_stream.get_stats()
+                    stream_info = f" | Stream: q{stream_stats['quality']} x{stream_stats['scale']:.2f}"
+                perf_placeholder.caption(
+                    f"Inferences: {worker_stats['inferences']} | "
+                    f"Rate: {detector.scheduler.current_rate:.1f}/s | "
+                    f"Dropped frames: {worker_stats['dropped_frames']} | "
+                    f"Result age: {result['age'] * 1000:.0f} ms | "
+                    f"Snapshot queue: {snapshot_stats['queue_depth']} "
+                    f"({snapshot_stats['avg_write_ms']:.0f} ms/write)"
+                    f"{stream_info}"
+                )
                 
         except Exception as e:
             st.error(f"❌ Detection error: {e}")
         finally:
-            cap.release()
+            if stream_server is not None:
+                stream_server.close_stream(stream_token)
+            detector.stop_worker()
+            if detector.profiler is not None:
+                detector.profiler.stop()
+                detector.profiler.discard_thread()
+            detector.flush_logs()
+            source.release()
             cv2.destroyAllWindows()
 
+# Batch analysis of uploaded recordings
+if not st.session_state.detection_running:
+    with st.expander("🎞️ Analyze a Recording"):
+        st.caption("Upload a recorded session (one video, or a set of images) to add it to your emotion log.")
+        uploads = st.file_uploader(
+            "Video or images",
+            type=[ext.lstrip(".") for ext in VIDEO_EXTENSIONS + IMAGE_EXTENSIONS],
+            accept_multiple_files=True,
+            key="batch_uploads"
+        )
+        sample_fps = st.slider("Video frames analyzed per second", 0.5, 10.0, 2.0, 0.5)
+        
+        job_running = "batch_job" in st.session_state
+        if st.button("🚀 Analyze", disabled=not uploads or job_running):
+            upload_dir = os.path.join(user_dir_for(user_data), "uploads")
+            videos = [f for f in uploads if f.name.lower().endswith(VIDEO_EXTENSIONS)]
+            if videos:
+                source = os.path.join(upload_dir, os.path.basename(videos[0].name))
+                files = videos[:1]
+            else:
+                source = os.path.join(upload_dir, f"images_{datetime.datetime.now():%Y%m%d_%H%M%S}")
+                files = uploads
+            
+            target_dir = source if not videos else upload_dir
+            os.makedirs(target_dir, exist_ok=True)
+            for upload in files:
+                with open(os.path.join(target_dir, os.path.basename(upload.name)), "wb") as f:
+                    f.write(upload.getbuffer())
+            
+            job = BatchJob(source, user_data, backend=model_registry.backend.name, sample_fps=sample_fps)
+            st.session_state.pop("batch_result", None)
+            st.session_state.batch_job = submit_batch_job(job)
+        
+        if "batch_job" in st.session_state:
+            render_batch_job()
+        elif "batch_result" in st.session_state:
+            render_batch_result(st.session_state.batch_result)
+
 # Show user statistics
 if not st.session_state.detection_running:
     st.markdown("### 📊 Your Emotion Statistics")
@@ -0,0 +1,381 @@
+"""Analyze recorded videos and image folders into a user's emotion log.
+
+The source is split into shards (frame ranges of a video, or slices of an
+image folder) that run on a process pool with one warm model per worker.
+Each finished shard is saved under the job directory, so an interrupted
+job resumes where it stopped. Once every shard is in, raw predictions are
+merged in timestamp order and the live detector's smoothing and
+change-detection rules are applied before the rows are logged.
+
+Usage (from streamlit_app/):
+    python batch_analysis.py session.mp4 --user-id 7 --username "Ada L" --email ada@example.com
+"""
+import argparse
+import datetime
+import hashlib
+import json
+import multiprocessing
+import os
+import sys
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+import cv2
+import numpy as np
+from emotion_store import TIMESTAMP_FORMAT, get_store
+
+VIDEO_EXTENSIONS = (".mp4", ".avi", ".mov", ".mkv", ".webm")
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp")
+
+# Jobs started from the Streamlit page run here; each one fans out to its own process pool
+BATCH_JOBS = ThreadPoolExecutor(max_workers=1, thread_name_prefix="batch-analysis")
+# Each worker process loads its own model, so jobs started from the web server stay small
+UI_MAX_WORKERS = int(os.environ.get("BATCH_UI_WORKERS", 2))
+EXIF_DATETIME_FORMAT = "%Y:%m:%d %H:%M:%S"
+
+
+def user_dir_for(user_data):
+    """Same per-user directory the live detector writes to"""
+    return f"logs/user_{user_data['id']}_{user_data['name'].replace(' ', '_')}"
+
+
+def source_fingerprint(source):
+    """Stable id for a source's content, so a re-uploaded file resumes the same job"""
+    digest = hashlib.sha1()
+    if os.path.isdir(source):
+        for name in sorted(os.listdir(source)):
+            if name.lower().endswith(IMAGE_EXTENSIONS):
+                digest.update(f"{name}:{os.path.getsize(os.path.join(source, name))}".encode())
+        return digest.hexdigest()
+
+    size = os.path.getsize(source)
+    digest.update(str(size).encode())
+    with open(source, "rb") as f:
+        digest.update(f.read(1 << 20))
+        f.seek(max(0, size - (1 << 20)))
+        digest.update(f.read(1 << 20))
+    return digest.hexdigest()
+
+
+def image_timestamp(path):
+    """Capture time from the image's EXIF data, or None"""
+    from PIL import Image
+
+    try:
+        with Image.open(path) as image:
+            exif = image.getexif()
+            # DateTimeOriginal (in the Exif IFD), else the base DateTime tag
+            value = exif.get_ifd(0x8769).get(36867) or exif.get(306)
+        return datetime.datetime.strptime(str(value).strip("\x00 "), EXIF_DATETIME_FORMAT).timestamp()
+    except (OSError, ValueError, TypeError, AttributeError):
+        return None
+
+
+def count_frames(source):
+    """Frame count by decoding the whole file, for containers that don't report one"""
+    cap = cv2.VideoCapture(source)
+    total = 0
+    while cap.grab():
+        total += 1
+    cap.release()
+    return total
+
+
+def plan_shards(source, shard_frames=600, shard_images=200, sample_fps=2.0, start_time=None,
+                image_interval=1.0):
+    """Split a video into frame ranges or an image folder into slices.
+
+    Each sample gets a timestamp. Video frames count from `start_time`
+    (default: the file's modification time minus its duration). Images use
+    their EXIF capture time; images without one are placed in file-name
+    order, `image_interval` seconds apart, from `start_time` (default: the
+    earliest modification time, which for uploads is the upload time).
+    """
+    if os.path.isdir(source):
+        files = sorted(
+            os.path.join(source, name) for name in os.listdir(source)
+            if name.lower().endswith(IMAGE_EXTENSIONS)
+        )
+        if start_time is None and files:
+            start_time = min(os.path.getmtime(path) for path in files)
+        timed = []
+        for position, path in enumerate(files):
+            timestamp = image_timestamp(path)
+            timed.append([path, timestamp if timestamp is not None else start_time + position * image_interval])
+        return [
+            {"id": i, "kind": "images", "files": timed[start:start + shard_images]}
+            for i, start in enumerate(range(0, len(timed), shard_images))
+        ]
+
+    cap = cv2.VideoCapture(source)
+    if not cap.isOpened():
+        raise ValueError(f"Could not open {source}")
+    total = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+    cap.release()
+
+    # Some containers (e.g. streamed WebM) report no frame count and seek unreliably:
+    # count the frames once and read the whole file as a single sequential shard
+    sequential = total <= 0
+    if sequential:
+        total = count_frames(source)
+        shard_frames = max(total, 1)
+
+    if start_time is None:
+        start_time = os.path.getmtime(source) - total / fps
+    step = max(1, round(fps / sample_fps)) if sample_fps else 1
+
+    return [
+        {"id": i, "kind": "video", "path": source, "start": start,
+         "end": min(start + shard_frames, total), "fps": fps, "step": step,
+         "start_time": start_time}
+        for i, start in enumerate(range(0, total, shard_frames))
+    ]
+
+
+# One registry and tracker per worker process, built once by the pool initializer
+_worker_registry = None
+_worker_tracker = None
+
+
+def _init_worker(backend):
+    global _worker_registry, _worker_tracker
+    from model_registry import EmotionModelRegistry
+    from face_tracker import FaceTracker
+
+    _worker_registry = EmotionModelRegistry(backend=backend)
+    _worker_registry.load()
+    _worker_tracker = FaceTracker()
+
+
+def _predict(frame):
+    face = _worker_tracker.locate(frame)
+    if face is not None:
+        result = _worker_registry.analyze(face, detector_backend='skip')
+    else:
+        result = _worker_registry.analyze(frame)
+    emotion = result[0]['dominant_emotion']
+    return emotion, float(result[0]['emotion'][emotion])
+
+
+def analyze_shard(shard):
+    """Raw (timestamp, emotion, confidence) predictions for one shard"""
+    _worker_tracker.reset()
+    samples = []
+
+    if shard["kind"] == "images":
+        for entry in shard["files"]:
+            # Manifests written before timestamps were planned hold bare paths
+            path, timestamp = entry if isinstance(entry, list) else (entry, os.path.getmtime(entry))
+            frame = cv2.imread(path)
+            if frame is None:
+                continue
+            emotion, confidence = _predict(frame)
+            samples.append((timestamp, emotion, confidence))
+        return shard["id"], samples
+
+    cap = cv2.VideoCapture(shard["path"])
+    if shard["start"]:
+        cap.set(cv2.CAP_PROP_POS_FRAMES, shard["start"])
+    # Sample on a grid anchored at frame 0 so shard boundaries don't shift it
+    first = -(-shard["start"] // shard["step"]) * shard["step"]
+    for index in range(shard["start"], shard["end"]):
+        if index < first or (index - first) % shard["step"]:
+            if not cap.grab():
+                break
+            continue
+        ret, frame = cap.read()
+        if not ret:
+            break
+        emotion, confidence = _predict(frame)
+        samples.append((shard["start_time"] + index / shard["fps"], emotion, confidence))
+    cap.release()
+    return shard["id"], samples
+
+
+def detect_changes(samples, window=3, threshold=40):
+    """Apply EnhancedEmotionDetector's smoothing and change rule to time-ordered samples"""
+    emotions, confidences = deque(maxlen=window), deque(maxlen=window)
+    current = None
+    changes = []
+    for timestamp, emotion, confidence in samples:
+        emotions.append(emotion)
+        confidences.append(confidence)
+        if len(emotions) >= 2:
+            emotion = Counter(emotions).most_common(1)[0][0]
+            confidence = float(np.mean(confidences))
+
+        if confidence >= threshold and emotion != current:
+            changes.append((timestamp, emotion, confidence))
+        if confidence >= threshold:
+            current = emotion
+    return changes
+
+
+class BatchJob:
+    """One resumable batch analysis of `source` into the user's emotion store"""
+
+    def __init__(self, source, user_data, workers=None, backend="deepface",
+                 shard_frames=600, shard_images=200, sample_fps=2.0, start_time=None,
+                 image_interval=1.0):
+        self.source = source
+        self.user_data = user_data
+        self.workers = workers or max(1, (os.cpu_count() or 2) - 1)
+        self.backend = backend
+        self.options = {
+            "shard_frames": shard_frames, "shard_images": shard_images,
+            "sample_fps": sample_fps, "start_time": start_time,
+            "image_interval": image_interval
+        }
+
+        params = json.dumps([backend, self.options], sort_keys=True)
+        self.job_id = hashlib.sha1(
+            (source_fingerprint(source) + params).encode()
+        ).hexdigest()[:16]
+        self.user_dir = user_dir_for(user_data)
+        self.job_dir = os.path.join(self.user_dir, "batch", self.job_id)
+        os.makedirs(self.user_dir, exist_ok=True)
+        self.store = get_store(os.path.join(self.user_dir, "emotion_log.db"))
+
+    def shard_path(self, shard_id):
+        return os.path.join(self.job_dir, f"shard_{shard_id:05d}.json")
+
+    def _save_shard(self, shard_id, samples):
+        path = self.shard_path(shard_id)
+        with open(f"{path}.tmp", "w", encoding="utf-8") as f:
+            json.dump(samples, f)
+        os.replace(f"{path}.tmp", path)
+
+    def _load_shard(self, shard_id):
+        try:
+            with open(self.shard_path(shard_id), encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _load_plan(self):
+        """Shard plan saved on the first run, so a resumed job keeps its timestamps"""
+        manifest = os.path.join(self.job_dir, "manifest.json")
+        try:
+            with open(manifest, encoding="utf-8") as f:
+                return json.load(f)["shards"]
+        except (OSError, ValueError, KeyError):
+            pass
+
+        shards = plan_shards(self.source, **self.options)
+        with open(f"{manifest}.tmp", "w", encoding="utf-8") as f:
+            json.dump({"source": self.source, "backend": self.backend, "shards": shards}, f)
+        os.replace(f"{manifest}.tmp", manifest)
+        return shards
+
+    @property
+    def merged(self):
+        return self.store.get_meta(f"batch:{self.job_id}") == "merged"
+
+    def run(self, progress=None):
+        """Analyze every unfinished shard, then merge once; returns a summary dict.
+
+        `progress(done, total)` is called after each shard, including shards
+        recovered from an earlier run.
+        """
+        if self.merged:
+            return {"job_id": self.job_id, "already_merged": True}
+
+        os.makedirs(self.job_dir, exist_ok=True)
+        shards = self._load_plan()
+        results = {s["id"]: self._load_shard(s["id"]) for s in shards}
+        pending = [s for s in shards if results[s["id"]] is None]
+        resumed = len(shards) - len(pending)
+
+        done = resumed
+        if progress:
+            progress(done, len(shards))
+
+        if pending:
+            # spawn: TensorFlow does not survive fork
+            context = multiprocessing.get_context("spawn")
+            with ProcessPoolExecutor(max_workers=min(self.workers, len(pending)), mp_context=context,
+                                     initializer=_init_worker, initargs=(self.backend,)) as pool:
+                futures = [pool.submit(analyze_shard, shard) for shard in pending]
+                for future in as_completed(futures):
+                    shard_id, samples = future.result()
+                    self._save_shard(shard_id, samples)
+                    results[shard_id] = samples
+                    done += 1
+                    if progress:
+                        progress(done, len(shards))
+
+        samples = sorted(
+            (tuple(sample) for shard_samples in results.values() for sample in shard_samples),
+            key=lambda sample: sample[0]
+        )
+        changes = detect_changes(samples)
+        rows = [
+            [datetime.datetime.fromtimestamp(ts).strftime(TIMESTAMP_FORMAT), emotion,
+             round(confidence, 2), self.user_data["id"], self.user_data["name"], self.user_data["email"]]
+            for ts, emotion, confidence in changes
+        ]
+        # Rows and the merged marker commit together, so a crash can't make a resume log them twice
+        self.store.insert_rows(rows, meta={f"batch:{self.job_id}": "merged"})
+
+        return {
+            "job_id": self.job_id,
+            "shards": len(shards),
+            "resumed_shards": resumed,
+            "samples": len(samples),
+            "logged": len(rows)
+        }
+
+
+def submit_batch_job(job, max_workers=None):
+    """Run `job` in the background; returns (future, progress dict with done/total).
+
+    The job's worker processes are capped at `max_workers` (default:
+    BATCH_UI_WORKERS, 2), since each one loads a model inside the web server.
+    """
+    job.workers = min(job.workers, max_workers or UI_MAX_WORKERS)
+    progress = {"done": 0, "total": 0}
+
+    def report(done, total):
+        progress.update(done=done, total=total)
+
+    return BATCH_JOBS.submit(job.run, report), progress
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("source", help="Video file or directory of images")
+    parser.add_argument("--user-id", required=True)
+    parser.add_argument("--username", required=True)
+    parser.add_argument("--email", default="")
+    parser.add_argument("--workers", type=int)
+    parser.add_argument("--backend", default="deepface")
+    parser.add_argument("--sample-fps", type=float, default=2.0, help="Video frames analyzed per second")
+    parser.add_argument("--shard-frames", type=int, default=600)
+    parser.add_argument("--shard-images", type=int, default=200)
+    parser.add_argument("--image-interval", type=float, default=1.0,
+                        help="Seconds between images that carry no EXIF capture time")
+    parser.add_argument("--start", help="Recording start, 'YYYY-MM-DD HH:MM:SS'")
+    args = parser.parse_args()
+
+    start_time = None
+    if args.start:
+        start_time = datetime.datetime.strptime(args.start, TIMESTAMP_FORMAT).timestamp()
+
+    job = BatchJob(
+        args.source,
+        {"id": args.user_id, "name": args.username, "email": args.email},
+        workers=args.workers, backend=args.backend, shard_frames=args.shard_frames,
+        shard_images=args.shard_images, sample_fps=args.sample_fps, start_time=start_time,
+        image_interval=args.image_interval
+    )
+
+    def report(done, total):
+        print(f"\rshards {done}/{total}", end="", file=sys.stderr, flush=True)
+
+    summary = job.run(progress=report)
+    print(file=sys.stderr)
+    print(json.dumps(summary, indent=2))
+
+
+if __name__ == "__main__":
+    main()
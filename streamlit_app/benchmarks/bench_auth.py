@@ -0,0 +1,60 @@
+"""Compare one-connection-per-call lookups with the pooled, cached DatabaseAuth.
+
+Runs against a local StubUserAPI, so no website is needed.
+
+Usage (from streamlit_app/):
+    python benchmarks/bench_auth.py --calls 200 --latency-ms 5
+"""
+import argparse
+import os
+import sys
+import time
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from database_auth import DatabaseAuth
+from stub_user_api import StubUserAPI
+
+
+def time_calls(fn, calls):
+    start = time.perf_counter()
+    for _ in range(calls):
+        fn()
+    return (time.perf_counter() - start) / calls * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--calls", type=int, default=200)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--fail-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    stub = StubUserAPI(latency_ms=args.latency_ms, fail_rate=args.fail_rate).start()
+    url = f"{stub.url}/api/streamlit/users"
+    email = "demo@example.com"
+
+    unpooled = time_calls(lambda: requests.post(url, json={"email": email}, timeout=10), args.calls)
+    stub.connections.clear()
+
+    auth = DatabaseAuth(stub.url, cache_ttl=0, negative_ttl=0)
+    pooled = time_calls(lambda: auth.validate_user(email), args.calls)
+    pooled_connections = len(stub.connections)
+
+    auth = DatabaseAuth(stub.url)
+    cached = time_calls(lambda: auth.validate_user(email), args.calls)
+
+    unknown = DatabaseAuth(stub.url)
+    negative = time_calls(lambda: unknown.validate_user("nobody@example.com"), args.calls)
+
+    stub.stop()
+    print(f"requests.post per call : {unpooled:7.3f} ms")
+    print(f"pooled session         : {pooled:7.3f} ms  ({pooled_connections} connection(s))")
+    print(f"pooled + cache         : {cached:7.3f} ms  {auth.get_stats()}")
+    print(f"unknown email (cached) : {negative:7.3f} ms  {unknown.get_stats()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,242 @@
+"""End-to-end benchmark of the detection loop on a replayed clip or image folder.
+
+Runs the same steps as the live loop in app.py, synchronously and without
+Streamlit, and reports per-stage latency (capture, analyze_frame,
+smooth_predictions, draw_text_with_emoji, colour conversion, logging),
+end-to-end FPS and peak memory. analyze_frame includes
+smooth_predictions, which is also reported on its own.
+
+Results can be saved as a named baseline and later runs compared against
+it; --compare exits non-zero when a stage's p50 or the FPS regresses by
+more than --tolerance.
+
+Usage (from streamlit_app/):
+    python benchmarks/bench_pipeline.py path/to/clip.mp4 --frames 300 --save-baseline laptop-deepface
+    python benchmarks/bench_pipeline.py path/to/clip.mp4 --frames 300 --compare laptop-deepface
+"""
+import argparse
+import datetime
+import functools
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from emotion_backends import BACKENDS
+from enhanced_emotion_detector import EnhancedEmotionDetector
+from frame_sources import open_frame_source
+from model_registry import EmotionModelRegistry, resident_memory_mb
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+BASELINES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines", "pipeline.json")
+STAGES = ["capture", "analyze_frame", "smooth_predictions", "draw_text_with_emoji",
+          "color_conversion", "logging"]
+BENCH_USER = {"id": "bench", "name": "Bench User", "email": "bench@example.com"}
+
+
+class StageTimer:
+    def __init__(self):
+        self.samples = {stage: [] for stage in STAGES}
+
+    def record(self, stage, seconds):
+        self.samples[stage].append(seconds)
+
+    def wrap(self, obj, method, stage):
+        """Time every call of obj.method, including calls made from inside obj"""
+        original = getattr(obj, method)
+
+        @functools.wraps(original)
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return original(*args, **kwargs)
+            finally:
+                self.record(stage, time.perf_counter() - start)
+
+        setattr(obj, method, timed)
+
+    def summary(self):
+        result = {}
+        for stage, samples in self.samples.items():
+            if not samples:
+                continue
+            ms = np.array(samples) * 1000
+            result[stage] = {
+                "calls": len(ms),
+                "mean_ms": float(ms.mean()),
+                "p50_ms": float(np.percentile(ms, 50)),
+                "p95_ms": float(np.percentile(ms, 95))
+            }
+        return result
+
+
+def peak_memory_mb():
+    """Peak RSS of this process in MB, where the platform reports it"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(source, registry, max_frames, infer_every):
+    # The detector writes under ./logs, so keep benchmark output out of the real logs
+    workdir = tempfile.mkdtemp(prefix="bench_pipeline_")
+    cwd = os.getcwd()
+    os.chdir(workdir)
+    try:
+        detector = EnhancedEmotionDetector(BENCH_USER, model_registry=registry)
+        timer = StageTimer()
+        for method, stage in [("analyze_frame", "analyze_frame"),
+                              ("smooth_predictions", "smooth_predictions"),
+                              ("draw_text_with_emoji", "draw_text_with_emoji"),
+                              ("log_emotion_change", "logging")]:
+            timer.wrap(detector, method, stage)
+
+        frames = 0
+        peak_rss = resident_memory_mb() or 0.0
+        start = time.perf_counter()
+        while frames < max_frames:
+            t = time.perf_counter()
+            ret, frame = source.read()
+            timer.record("capture", time.perf_counter() - t)
+            if not ret:
+                break
+
+            if frames % infer_every == 0:
+                emotion, confidence = detector.analyze_frame(frame)
+                if confidence >= detector.confidence_threshold:
+                    if emotion != detector.current_emotion:
+                        detector.log_emotion_change(emotion, confidence, frame, detector.last_face_box)
+                    detector.current_emotion = emotion
+                    detector.current_confidence = confidence
+
+            t = time.perf_counter()
+            frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+            timer.record("color_conversion", time.perf_counter() - t)
+            detector.draw_label(frame_rgb, detector.current_emotion, detector.current_confidence)
+
+            frames += 1
+            peak_rss = max(peak_rss, resident_memory_mb() or 0.0)
+        elapsed = time.perf_counter() - start
+
+        detector.flush_logs()
+        detector.snapshot_sink.wait()
+    finally:
+        os.chdir(cwd)
+
+    return {
+        "frames": frames,
+        "fps": frames / elapsed if elapsed else 0.0,
+        "peak_rss_mb": peak_memory_mb() or peak_rss,
+        "stages": timer.summary()
+    }
+
+
+def load_baselines(path):
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_baseline(path, name, result):
+    baselines = load_baselines(path)
+    baselines[name] = result
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(baselines, f, indent=2, sort_keys=True)
+
+
+def compare(result, baseline, tolerance):
+    """Print deltas against a baseline; returns the list of regressions"""
+    regressions = []
+    print(f"\nvs baseline ({baseline.get('commit') or 'unknown commit'}, {baseline.get('recorded')})")
+    for stage, stats in result["stages"].items():
+        before = baseline["stages"].get(stage)
+        if not before or not before["p50_ms"]:
+            continue
+        change = stats["p50_ms"] / before["p50_ms"] - 1
+        flag = "  REGRESSION" if change > tolerance else ""
+        print(f"  {stage:<22} p50 {before['p50_ms']:8.2f} -> {stats['p50_ms']:8.2f} ms ({change:+.1%}){flag}")
+        if flag:
+            regressions.append(stage)
+
+    change = result["fps"] / baseline["fps"] - 1 if baseline["fps"] else 0.0
+    flag = "  REGRESSION" if change < -tolerance else ""
+    print(f"  {'fps':<22}     {baseline['fps']:8.2f} -> {result['fps']:8.2f}    ({change:+.1%}){flag}")
+    if flag:
+        regressions.append("fps")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("source", help="Video file or directory of images")
+    parser.add_argument("--frames", type=int, default=300)
+    parser.add_argument("--fps", type=float, default=0, help="Replay rate; 0 = unthrottled")
+    parser.add_argument("--infer-every", type=int, default=1, help="Run inference on every Nth frame")
+    parser.add_argument("--backend", default="deepface", choices=BACKENDS)
+    parser.add_argument("--baselines", default=BASELINES_PATH)
+    parser.add_argument("--save-baseline", metavar="NAME")
+    parser.add_argument("--compare", metavar="NAME")
+    parser.add_argument("--tolerance", type=float, default=0.15)
+    args = parser.parse_args()
+
+    source = open_frame_source(args.source, fps=args.fps, loop=True)
+    if source.is_live or not source.open():
+        sys.exit(f"Could not open {args.source} for replay")
+
+    registry = EmotionModelRegistry(backend=args.backend)
+    registry.load()
+
+    try:
+        result = run(source, registry, args.frames, max(1, args.infer_every))
+    finally:
+        source.release()
+    result.update({
+        "backend": args.backend,
+        "source": os.path.basename(os.path.normpath(args.source)),
+        "commit": git_commit(),
+        "recorded": datetime.datetime.now().isoformat(timespec="seconds")
+    })
+
+    print(f"frames {result['frames']} | {result['fps']:.1f} FPS | peak RSS {result['peak_rss_mb']:.0f} MB")
+    for stage in STAGES:
+        stats = result["stages"].get(stage)
+        if stats:
+            print(f"  {stage:<22} mean {stats['mean_ms']:8.2f} ms | p50 {stats['p50_ms']:8.2f} ms | "
+                  f"p95 {stats['p95_ms']:8.2f} ms | n={stats['calls']}")
+
+    if args.save_baseline:
+        save_baseline(args.baselines, args.save_baseline, result)
+        print(f"\nSaved baseline '{args.save_baseline}' to {args.baselines}")
+
+    if args.compare:
+        baseline = load_baselines(args.baselines).get(args.compare)
+        if baseline is None:
+            sys.exit(f"No baseline named '{args.compare}' in {args.baselines}")
+        if compare(result, baseline, args.tolerance):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
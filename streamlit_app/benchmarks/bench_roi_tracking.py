@@ -0,0 +1,85 @@
+"""Compare full-frame and tracked-ROI emotion inference latency on a recorded clip.
+
+Usage (from streamlit_app/):
+    python benchmarks/bench_roi_tracking.py path/to/clip.mp4 --frames 300
+"""
+import argparse
+import os
+import sys
+import time
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from model_registry import EmotionModelRegistry
+from face_tracker import FaceTracker
+
+
+def read_frames(path, max_frames):
+    cap = cv2.VideoCapture(path)
+    frames = []
+    while len(frames) < max_frames:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        frames.append(cv2.resize(frame, (640, 480)))
+    cap.release()
+    return frames
+
+
+def summarize(name, latencies):
+    ms = np.array(latencies) * 1000
+    print(f"{name:<14} mean {ms.mean():7.1f} ms | p50 {np.percentile(ms, 50):7.1f} ms | "
+          f"p95 {np.percentile(ms, 95):7.1f} ms | n={len(ms)}")
+    return ms.mean()
+
+
+def run_full_frame(registry, frames):
+    latencies = []
+    for frame in frames:
+        start = time.perf_counter()
+        registry.analyze(frame)
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def run_tracked(registry, frames, redetect_interval):
+    tracker = FaceTracker(redetect_interval=redetect_interval)
+    latencies = []
+    for frame in frames:
+        start = time.perf_counter()
+        face = tracker.locate(frame)
+        if face is not None:
+            registry.analyze(face, detector_backend='skip')
+        else:
+            registry.analyze(frame)
+        latencies.append(time.perf_counter() - start)
+    return latencies, tracker.get_stats()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("clip", help="Recorded video file")
+    parser.add_argument("--frames", type=int, default=300, help="Maximum frames to read")
+    parser.add_argument("--redetect-interval", type=int, default=10)
+    args = parser.parse_args()
+
+    frames = read_frames(args.clip, args.frames)
+    if not frames:
+        sys.exit(f"Could not read any frames from {args.clip}")
+
+    registry = EmotionModelRegistry()
+    registry.load()
+
+    full = summarize("full frame", run_full_frame(registry, frames))
+    tracked_latencies, tracker_stats = run_tracked(registry, frames, args.redetect_interval)
+    tracked = summarize("tracked ROI", tracked_latencies)
+
+    print(f"full detections: {tracker_stats['full_detections']} | "
+          f"tracked frames: {tracker_stats['tracked_frames']}")
+    print(f"speed-up: {full / tracked:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
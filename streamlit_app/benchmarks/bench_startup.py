@@ -0,0 +1,87 @@
+"""Cold-start benchmark for the Streamlit login page.
+
+Each run starts a fresh interpreter, renders app.py once with Streamlit's
+AppTest harness (an unauthenticated session, so only the login page) and
+reports the wall time of imports plus the first script run. It also checks
+that none of the heavy modules (TensorFlow, DeepFace, OpenCV, pandas,
+matplotlib, fpdf) were imported to draw it.
+
+Exits non-zero when the median render time exceeds --budget-ms or a heavy
+module was loaded, so it can guard CI.
+
+Usage (from streamlit_app/):
+    python benchmarks/bench_startup.py --runs 5 --budget-ms 1500
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+HEAVY_MODULES = ("tensorflow", "deepface", "cv2", "pandas", "matplotlib", "fpdf", "torch")
+
+# Runs in the child interpreter; prints one JSON line
+CHILD = """
+import json, sys, time
+start = time.perf_counter()
+from streamlit.testing.v1 import AppTest
+harness_loaded = time.perf_counter()
+at = AppTest.from_file("app.py", default_timeout=60).run()
+rendered = time.perf_counter()
+heavy = sorted({name.split(".")[0] for name in sys.modules} & set(sys.argv[1].split(",")))
+print(json.dumps({
+    "harness_ms": (harness_loaded - start) * 1000,
+    "render_ms": (rendered - harness_loaded) * 1000,
+    "login_form": len(at.text_input) > 0,
+    "exceptions": [e.value for e in at.exception],
+    "modules": len(sys.modules),
+    "heavy": heavy
+}))
+"""
+
+
+def run_once():
+    env = {**os.environ, "EMOTION_PRELOAD": "0"}
+    output = subprocess.run(
+        [sys.executable, "-c", CHILD, ",".join(HEAVY_MODULES)],
+        cwd=APP_DIR, env=env, capture_output=True, text=True, check=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--budget-ms", type=float, default=1500.0,
+                        help="Fail when the median login-page render takes longer")
+    args = parser.parse_args()
+
+    results = [run_once() for _ in range(args.runs)]
+    render = [r["render_ms"] for r in results]
+    median = statistics.median(render)
+
+    print(f"login page render: median {median:.0f} ms, min {min(render):.0f} ms, max {max(render):.0f} ms "
+          f"({args.runs} cold runs; AppTest import {statistics.median(r['harness_ms'] for r in results):.0f} ms)")
+    print(f"modules loaded: {results[-1]['modules']}")
+
+    failures = []
+    heavy = sorted({name for r in results for name in r["heavy"]})
+    if heavy:
+        failures.append(f"heavy modules imported by the login page: {', '.join(heavy)}")
+    if not all(r["login_form"] for r in results):
+        failures.append("login form was not rendered")
+    for r in results:
+        failures.extend(f"script raised: {e}" for e in r["exceptions"])
+    if median > args.budget_ms:
+        failures.append(f"median render {median:.0f} ms is over the {args.budget_ms:.0f} ms budget")
+
+    for failure in dict.fromkeys(failures):
+        print(f"FAIL: {failure}", file=sys.stderr)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""Check a direct facial emotion backend against DeepFace on the same face crops.
+
+Faces are cut from a recorded clip or a folder of images with FaceTracker,
+then scored by DeepFace and by the candidate backend. Reports top-1
+agreement, score drift (in percentage points) and per-face latency, and
+exits non-zero when agreement is below --min-agreement.
+
+Usage (from streamlit_app/):
+    python benchmarks/parity_emotion_backends.py path/to/clip.mp4 --backend tflite-int8
+    python benchmarks/parity_emotion_backends.py path/to/faces/ --backend tflite
+"""
+import argparse
+import os
+import sys
+import time
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from emotion_backends import BACKENDS, EMOTION_LABELS, load_emotion_backend
+from face_tracker import FaceTracker
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp")
+
+
+def read_images(source, max_images):
+    if os.path.isdir(source):
+        for name in sorted(os.listdir(source))[:max_images]:
+            if name.lower().endswith(IMAGE_EXTENSIONS):
+                image = cv2.imread(os.path.join(source, name))
+                if image is not None:
+                    yield image
+        return
+
+    cap = cv2.VideoCapture(source)
+    for _ in range(max_images):
+        ret, frame = cap.read()
+        if not ret:
+            break
+        yield frame
+    cap.release()
+
+
+def collect_faces(source, max_images):
+    tracker = FaceTracker(redetect_interval=1)
+    faces = []
+    for image in read_images(source, max_images):
+        tracker.reset()
+        face = tracker.locate(image)
+        if face is not None:
+            faces.append(face)
+    return faces
+
+
+def score(backend, faces):
+    scores, latencies = [], []
+    for face in faces:
+        start = time.perf_counter()
+        result = backend.predict(face, is_face=True)
+        latencies.append(time.perf_counter() - start)
+        scores.append([result[label] for label in EMOTION_LABELS])
+    return np.array(scores), np.array(latencies) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("source", help="Video file or directory of images")
+    parser.add_argument("--backend", default="tflite-int8", choices=[b for b in BACKENDS if b != "deepface"])
+    parser.add_argument("--max-images", type=int, default=500)
+    parser.add_argument("--min-agreement", type=float, default=0.95)
+    args = parser.parse_args()
+
+    faces = collect_faces(args.source, args.max_images)
+    if not faces:
+        sys.exit(f"No faces found in {args.source}")
+
+    reference = load_emotion_backend("deepface")
+    candidate = load_emotion_backend(args.backend)
+    reference.load()
+    candidate.load()
+    # First calls pay for graph building; keep them out of the latency figures
+    reference.predict(faces[0], is_face=True)
+    candidate.predict(faces[0], is_face=True)
+
+    ref_scores, ref_ms = score(reference, faces)
+    cand_scores, cand_ms = score(candidate, faces)
+
+    agree = ref_scores.argmax(axis=1) == cand_scores.argmax(axis=1)
+    drift = np.abs(ref_scores - cand_scores)
+
+    print(f"faces            : {len(faces)}")
+    print(f"top-1 agreement  : {agree.mean():.2%}")
+    print(f"max score diff   : {drift.max():.2f} pts")
+    print(f"mean score diff  : {drift.mean():.2f} pts")
+    print(f"deepface         : p50 {np.percentile(ref_ms, 50):6.2f} ms | p95 {np.percentile(ref_ms, 95):6.2f} ms")
+    print(f"{args.backend:<17}: p50 {np.percentile(cand_ms, 50):6.2f} ms | p95 {np.percentile(cand_ms, 95):6.2f} ms")
+
+    sys.exit(0 if agree.mean() >= args.min_agreement else 1)
+
+
+if __name__ == "__main__":
+    main()
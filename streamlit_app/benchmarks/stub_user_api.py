@@ -0,0 +1,115 @@
+"""Local stand-in for the Next.js /api/streamlit/users endpoint.
+
+Serves a fixed set of users with optional latency and injected 503s, so
+DatabaseAuth can be exercised without the website running.
+
+Usage (from streamlit_app/):
+    python benchmarks/stub_user_api.py --port 5173 --latency-ms 50 --fail-rate 0.1
+    USER_API_URL=http://localhost:5173 streamlit run app.py
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+DEFAULT_USERS = {
+    "demo@example.com": {"id": "1", "name": "Demo User", "email": "demo@example.com"},
+}
+
+
+class StubUserAPI:
+    """Threaded HTTP server answering user lookups by email"""
+
+    def __init__(self, users=None, host="127.0.0.1", port=0, latency_ms=0.0, fail_rate=0.0, fail_first=0):
+        # Exact-match lookup, like the real API's `WHERE email = ${email}`
+        self.users = dict(users or DEFAULT_USERS)
+        self.latency = latency_ms / 1000
+        self.fail_rate = fail_rate
+        # The first `fail_first` requests get a 503, for deterministic retry tests
+        self.fail_first = fail_first
+        self.requests = 0
+        self.connections = set()
+
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True
+
+            def log_message(self, format, *args):
+                pass
+
+            def do_GET(self):
+                email = parse_qs(urlparse(self.path).query).get("email", [""])[0]
+                stub.respond(self, email)
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                try:
+                    email = json.loads(self.rfile.read(length) or b"{}").get("email", "")
+                except ValueError:
+                    email = ""
+                stub.respond(self, email)
+
+        self.httpd = ThreadingHTTPServer((host, port), Handler)
+        self.httpd.daemon_threads = True
+        self.url = f"http://{host}:{self.httpd.server_address[1]}"
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name="stub-user-api", daemon=True)
+
+    def respond(self, handler, email):
+        self.requests += 1
+        self.connections.add(handler.client_address)
+        if self.latency:
+            time.sleep(self.latency)
+
+        if not urlparse(handler.path).path == "/api/streamlit/users":
+            status, body = 404, {"error": "not found"}
+        elif self.requests <= self.fail_first or (self.fail_rate and random.random() < self.fail_rate):
+            status, body = 503, {"error": "unavailable"}
+        else:
+            user = self.users.get(email)
+            status, body = (200, {"user": user}) if user else (404, {"user": None})
+
+        payload = json.dumps(body).encode()
+        handler.send_response(status)
+        handler.send_header("Content-Type", "application/json")
+        handler.send_header("Content-Length", str(len(payload)))
+        handler.end_headers()
+        handler.wfile.write(payload)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--port", type=int, default=5173)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--fail-rate", type=float, default=0.0)
+    parser.add_argument("--users", help="JSON file mapping email -> user object")
+    args = parser.parse_args()
+
+    users = None
+    if args.users:
+        with open(args.users, encoding="utf-8") as f:
+            users = json.load(f)
+
+    stub = StubUserAPI(users, host="0.0.0.0", port=args.port,
+                       latency_ms=args.latency_ms, fail_rate=args.fail_rate)
+    print(f"Stub user API on port {args.port}")
+    try:
+        stub.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -1,62 +1,163 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 import requests
 import streamlit as st
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from typing import Optional, Dict
+from pyshared.metrics import histogram, counter
+
+AUTH_CACHE_HITS = counter("auth_cache_hits_total", "User lookups answered from the TTL cache")
+AUTH_CACHE_MISSES = counter("auth_cache_misses_total", "User lookups that went to the user API")
 
 class DatabaseAuth:
-  def __init__(self, api_base_url: str = "http://localhost:5173"):
+  """Client for the Next.js user API.
+
+  Requests share one keep-alive session with retry/backoff on transient
+  failures. Validated users are cached for `cache_ttl` seconds and emails
+  the API does not know for `negative_ttl` seconds; connection errors are
+  never cached.
+  """
+
+  def __init__(self, api_base_url: str = "http://localhost:5173", cache_ttl: float = 300.0,
+               negative_ttl: float = 30.0, retries: int = 2, backoff: float = 0.3,
+               connect_timeout: float = 3.05, read_timeout: float = 10.0, pool_size: int = 10):
       self.api_base_url = api_base_url
-  
+      self.cache_ttl = cache_ttl
+      self.negative_ttl = negative_ttl
+      self.timeout = (connect_timeout, read_timeout)
+
+      retry = Retry(
+          total=retries,
+          backoff_factor=backoff,
+          status_forcelist=(502, 503, 504),
+          allowed_methods=frozenset({"GET", "POST"})
+      )
+      adapter = HTTPAdapter(max_retries=retry, pool_connections=pool_size, pool_maxsize=pool_size)
+      self.session = requests.Session()
+      self.session.mount("http://", adapter)
+      self.session.mount("https://", adapter)
+
+      self._cache = {}
+      self._cache_lock = threading.Lock()
+      self._executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="auth")
+      self.cache_hits = 0
+      self.cache_misses = 0
+
+  def _cached(self, email: str):
+      """(found, user) from the cache; found is False on a miss or expiry.
+
+      Keyed on the exact email: the API's lookup is case-sensitive, so
+      normalizing here would let one casing answer for another.
+      """
+      with self._cache_lock:
+          entry = self._cache.get(email)
+          if entry is not None and entry[0] > time.monotonic():
+              self.cache_hits += 1
+              AUTH_CACHE_HITS.inc()
+              return True, entry[1]
+          self._cache.pop(email, None)
+          self.cache_misses += 1
+          AUTH_CACHE_MISSES.inc()
+          return False, None
+
+  def _remember(self, email: str, user: Optional[Dict]):
+      ttl = self.cache_ttl if user else self.negative_ttl
+      with self._cache_lock:
+          self._cache[email] = (time.monotonic() + ttl, user)
+
+  def invalidate(self, email: Optional[str] = None):
+      """Forget one cached email, or all of them"""
+      with self._cache_lock:
+          if email is None:
+              self._cache.clear()
+          else:
+              self._cache.pop(email, None)
+
+  def _fetch_user(self, method: str, email: str) -> Optional[Dict]:
+      """Ask the API for a user, going through the cache; raises RequestException"""
+      found, user = self._cached(email)
+      if found:
+          return user
+
+      with histogram("auth_request_seconds", "User API round trips, retries included",
+                     labels={"method": method}).time():
+          if method == "POST":
+              response = self.session.post(
+                  f"{self.api_base_url}/api/streamlit/users",
+                  json={"email": email},
+                  timeout=self.timeout
+              )
+          else:
+              response = self.session.get(
+                  f"{self.api_base_url}/api/streamlit/users",
+                  params={"email": email},
+                  timeout=self.timeout
+              )
+
+      user = response.json().get("user") if response.status_code == 200 else None
+      if response.status_code == 200 or response.status_code in (400, 401, 403, 404):
+          self._remember(email, user)
+      return user
+
   def validate_user(self, email: str) -> Optional[Dict]:
       """
       Validate user against the Next.js database
       """
       try:
-          response = requests.post(
-              f"{self.api_base_url}/api/streamlit/users",
-              json={"email": email},
-              timeout=10
-          )
-          
-          if response.status_code == 200:
-              data = response.json()
-              return data.get("user")
-          else:
-              return None
-              
+          return self._fetch_user("POST", email)
       except requests.exceptions.RequestException as e:
           st.error(f"Connection error: {e}")
           return None
-  
+
+  def validate_user_async(self, email: str):
+      """
+      Validate user on a background thread; the Future resolves to the user
+      or None and raises RequestException on connection errors
+      """
+      return self._executor.submit(self._fetch_user, "POST", email)
+
   def get_user_by_email(self, email: str) -> Optional[Dict]:
       """
       Get user data by email
       """
       try:
-          response = requests.get(
-              f"{self.api_base_url}/api/streamlit/users",
-              params={"email": email},
-              timeout=10
-          )
-          
-          if response.status_code == 200:
-              data = response.json()
-              return data.get("user")
-          else:
-              return None
-              
+          return self._fetch_user("GET", email)
       except requests.exceptions.RequestException as e:
           st.error(f"Connection error: {e}")
           return None
-  
+
+  def login(self, user: Dict, email: str):
+      """
+      Store a validated user in session state
+      """
+      st.session_state.authenticated = True
+      st.session_state.user_data = user
+      st.session_state.username = user["name"]
+      st.session_state.user_email = email
+
   def authenticate_user(self, email: str) -> bool:
       """
       Authenticate user and store in session state
       """
       user = self.validate_user(email)
       if user:
-          st.session_state.authenticated = True
-          st.session_state.user_data = user
-          st.session_state.username = user["name"]
-          st.session_state.user_email = email
+          self.login(user, email)
           return True
       return False
+
+  def get_stats(self) -> Dict:
+      with self._cache_lock:
+          return {
+              "cached_users": len(self._cache),
+              "cache_hits": self.cache_hits,
+              "cache_misses": self.cache_misses
+          }
+
+
+@st.cache_resource
+def get_database_auth():
+    """One pooled client per Streamlit process (USER_API_URL overrides the base URL)"""
+    return DatabaseAuth(os.environ.get("USER_API_URL", "http://localhost:5173"))
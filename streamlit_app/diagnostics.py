@@ -0,0 +1,49 @@
+import pandas as pd
+import streamlit as st
+from pyshared.metrics import REGISTRY, format_labels
+from sampling_profiler import SamplingProfiler
+
+
+def get_session_profiler():
+    """This session's profiler when the sidebar switch is on, otherwise None"""
+    if not st.session_state.get("profiling"):
+        return None
+    if "profiler" not in st.session_state:
+        st.session_state.profiler = SamplingProfiler()
+    return st.session_state.profiler
+
+
+def render_diagnostics_panel():
+    with st.expander("🩺 Diagnostics"):
+        latencies, counters = [], []
+        for metric in sorted(REGISTRY.metrics(), key=lambda m: m.name):
+            name = metric.name + format_labels(metric.labels)
+            if metric.kind == "histogram":
+                latencies.append({"stage": name, **metric.summary()})
+            else:
+                counters.append({"counter": name, "value": metric.value})
+
+        if latencies:
+            st.markdown("**Latency**")
+            st.dataframe(pd.DataFrame(latencies).set_index("stage").round(1), use_container_width=True)
+        if counters:
+            st.markdown("**Counters**")
+            st.dataframe(pd.DataFrame(counters).set_index("counter"), use_container_width=True)
+        st.caption("Process-wide. /metrics (Prometheus format) is served on MJPEG_PORT "
+                   "only while the low-latency stream is running.")
+
+        st.toggle("🔬 Sampling profiler (this session)", key="profiling",
+                  help="Samples the detection loop and inference worker stacks every 5 ms while detection runs")
+        profiler = st.session_state.get("profiler")
+        if profiler is not None and profiler.samples:
+            st.caption(f"{profiler.samples} samples over {profiler.duration:.1f}s")
+            st.dataframe(pd.DataFrame(profiler.top()).set_index("function").round(1),
+                         use_container_width=True)
+            col1, col2 = st.columns(2)
+            with col1:
+                st.download_button("📥 Collapsed stacks", profiler.collapsed(),
+                                   file_name="profile.folded", mime="text/plain")
+            with col2:
+                if st.button("🧹 Reset profile"):
+                    profiler.reset()
+                    st.rerun()
@@ -0,0 +1,144 @@
+import os
+import threading
+import cv2
+import numpy as np
+
+# Output order of DeepFace's facial-expression model
+EMOTION_LABELS = ["angry", "disgust", "fear", "happy", "sad", "surprise", "neutral"]
+BACKENDS = ("deepface", "tflite", "tflite-int8")
+
+
+def preprocess_face(face, target_size=(224, 224)):
+    """BGR face crop -> the (1, 48, 48, 1) grayscale tensor in [0, 1] the model expects.
+
+    Mirrors what DeepFace.analyze (0.0.93) does to a face before its emotion
+    model: scale to [0, 1], letterbox onto a black 224x224 canvas, then
+    convert to grayscale and resize to 48x48. Keeping the same steps is what
+    lets the TFLite backends match DeepFace's scores.
+    """
+    if face.ndim == 2:
+        face = cv2.cvtColor(face, cv2.COLOR_GRAY2BGR)
+    image = face.astype(np.float32) / 255.0
+
+    factor = min(target_size[0] / image.shape[0], target_size[1] / image.shape[1])
+    image = cv2.resize(image, (int(image.shape[1] * factor), int(image.shape[0] * factor)))
+    pad_rows = target_size[0] - image.shape[0]
+    pad_cols = target_size[1] - image.shape[1]
+    image = np.pad(
+        image,
+        ((pad_rows // 2, pad_rows - pad_rows // 2), (pad_cols // 2, pad_cols - pad_cols // 2), (0, 0)),
+        "constant"
+    )
+    if image.shape[:2] != target_size:
+        image = cv2.resize(image, target_size)
+
+    gray = cv2.resize(cv2.cvtColor(image, cv2.COLOR_BGR2GRAY), (48, 48))
+    return gray[np.newaxis, :, :, np.newaxis]
+
+
+def to_percentages(probabilities):
+    probabilities = np.asarray(probabilities, dtype=np.float64)
+    probabilities = probabilities / probabilities.sum()
+    return {label: float(p * 100) for label, p in zip(EMOTION_LABELS, probabilities)}
+
+
+class DeepFaceBackend:
+    """The full DeepFace.analyze path, with its own face detector for whole frames"""
+
+    name = "deepface"
+
+    def __init__(self, detector_backend="opencv"):
+        self.detector_backend = detector_backend
+        self.model = None
+
+    def load(self):
+        from deepface import DeepFace
+
+        self._deepface = DeepFace
+        # DeepFace caches built models module-wide, so analyze() reuses this one
+        self.model = DeepFace.build_model(model_name="Emotion", task="facial_attribute")
+
+    def predict(self, frame, is_face=False):
+        """Emotion percentages for a frame, or for a face crop when `is_face`"""
+        result = self._deepface.analyze(
+            frame,
+            actions=['emotion'],
+            enforce_detection=False,
+            detector_backend='skip' if is_face else self.detector_backend
+        )
+        return {label: float(score) for label, score in result[0]['emotion'].items()}
+
+
+class TFLiteBackend:
+    """DeepFace's emotion CNN converted to TensorFlow Lite and called directly.
+
+    Whole frames are treated as the face, so pair it with FaceTracker crops.
+    The converted model is cached in `model_dir`; converting needs
+    TensorFlow and DeepFace once, serving only needs `tflite_runtime`
+    (or TensorFlow as a fallback). `quantize` stores int8 weights.
+    """
+
+    def __init__(self, model_dir="models", quantize=False, num_threads=None):
+        self.model_dir = model_dir
+        self.quantize = quantize
+        self.num_threads = num_threads
+        self.name = "tflite-int8" if quantize else "tflite"
+        self.model_path = os.path.join(
+            model_dir, "emotion.int8.tflite" if quantize else "emotion.tflite"
+        )
+        self.interpreter = None
+        # One interpreter is shared by every session's worker and is not thread-safe
+        self._lock = threading.Lock()
+
+    def convert(self):
+        """Convert the Keras emotion model to a .tflite file"""
+        import tensorflow as tf
+        from deepface import DeepFace
+
+        keras_model = DeepFace.build_model(model_name="Emotion", task="facial_attribute").model
+        converter = tf.lite.TFLiteConverter.from_keras_model(keras_model)
+        if self.quantize:
+            converter.optimizations = [tf.lite.Optimize.DEFAULT]
+
+        os.makedirs(self.model_dir, exist_ok=True)
+        with open(self.model_path, "wb") as f:
+            f.write(converter.convert())
+
+    def load(self):
+        if not os.path.exists(self.model_path):
+            self.convert()
+
+        try:
+            from tflite_runtime.interpreter import Interpreter
+        except ImportError:
+            import tensorflow as tf
+            Interpreter = tf.lite.Interpreter
+
+        self.interpreter = Interpreter(model_path=self.model_path, num_threads=self.num_threads)
+        self.interpreter.allocate_tensors()
+        self._input = self.interpreter.get_input_details()[0]["index"]
+        self._output = self.interpreter.get_output_details()[0]["index"]
+
+    @property
+    def model(self):
+        return self.interpreter
+
+    def predict(self, frame, is_face=False):
+        """Emotion percentages for a face crop (whole frames are used as-is)"""
+        tensor = preprocess_face(frame)
+        with self._lock:
+            self.interpreter.set_tensor(self._input, tensor)
+            self.interpreter.invoke()
+            probabilities = self.interpreter.get_tensor(self._output)[0].copy()
+        return to_percentages(probabilities)
+
+
+def load_emotion_backend(name="deepface", detector_backend="opencv", **kwargs):
+    """Build (but do not load) the named facial emotion backend"""
+    if name == "deepface":
+        return DeepFaceBackend(detector_backend)
+    if name == "tflite":
+        return TFLiteBackend(quantize=False, **kwargs)
+    if name == "tflite-int8":
+        return TFLiteBackend(quantize=True, **kwargs)
+    raise ValueError(f"backend must be one of {BACKENDS}")
@@ -0,0 +1,123 @@
+"""Running emotion aggregates kept in a JSON sidecar next to a user's log.
+
+Rebuild a drifted sidecar from the raw log with:
+    python emotion_stats.py rebuild logs/user_<id>_<name>/emotion_log.db
+"""
+import json
+import os
+import sys
+import threading
+from collections import Counter
+
+
+class RunningEmotionStats:
+    """Counts, confidence sum and date range updated row by row"""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self.reset()
+        self.loaded = self.load()
+
+    def reset(self):
+        self.total = 0
+        self.emotion_counts = Counter()
+        self.confidence_sum = 0.0
+        self.start = None
+        self.end = None
+        self.days = {}
+
+    def load(self):
+        """Read the sidecar; False if it is missing or unreadable"""
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                data = json.load(f)
+            self.total = data["total"]
+            self.emotion_counts = Counter(data["emotion_counts"])
+            self.confidence_sum = data["confidence_sum"]
+            self.start = data["start"]
+            self.end = data["end"]
+            self.days = data["days"]
+        except (OSError, ValueError, KeyError, TypeError):
+            self.reset()
+            return False
+        return True
+
+    def save(self):
+        """Atomically replace the sidecar with the current aggregates"""
+        with self._lock:
+            data = {
+                "total": self.total,
+                "emotion_counts": dict(self.emotion_counts),
+                "confidence_sum": self.confidence_sum,
+                "start": self.start,
+                "end": self.end,
+                "days": self.days
+            }
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(tmp_path, self.path)
+
+    def add(self, timestamp, emotion, confidence):
+        """Fold one log row (timestamp as 'YYYY-MM-DD HH:MM:SS') into the aggregates"""
+        with self._lock:
+            self.total += 1
+            self.emotion_counts[emotion] += 1
+            self.confidence_sum += confidence
+            if self.start is None or timestamp < self.start:
+                self.start = timestamp
+            if self.end is None or timestamp > self.end:
+                self.end = timestamp
+
+            day = self.days.setdefault(timestamp[:10], {
+                "total": 0, "confidence_sum": 0.0, "emotion_counts": {}
+            })
+            day["total"] += 1
+            day["confidence_sum"] += confidence
+            day["emotion_counts"][emotion] = day["emotion_counts"].get(emotion, 0) + 1
+
+    def add_rows(self, rows):
+        for timestamp, emotion, confidence in rows:
+            self.add(timestamp, emotion, confidence)
+
+    def summary(self):
+        """Same shape as the statistics the dashboard has always shown"""
+        with self._lock:
+            return {
+                "total_detections": self.total,
+                "emotion_counts": dict(self.emotion_counts.most_common()),
+                "avg_confidence": self.confidence_sum / self.total if self.total else 0.0,
+                "date_range": {"start": self.start, "end": self.end},
+                "daily": {
+                    day: {
+                        "total": bucket["total"],
+                        "avg_confidence": bucket["confidence_sum"] / bucket["total"],
+                        "emotion_counts": dict(bucket["emotion_counts"])
+                    }
+                    for day, bucket in sorted(self.days.items())
+                }
+            }
+
+    def rebuild(self, rows):
+        """Recompute everything from (timestamp, emotion, confidence) rows and save"""
+        with self._lock:
+            self.reset()
+        self.add_rows(rows)
+        self.save()
+
+
+def main():
+    if len(sys.argv) != 3 or sys.argv[1] != "rebuild":
+        sys.exit(__doc__)
+
+    from emotion_store import EmotionStore
+
+    store = EmotionStore(sys.argv[2])
+    store.rebuild_stats()
+    print(f"Rebuilt {store.stats.path}: {store.stats.total} rows")
+    store.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,286 @@
+import atexit
+import logging
+import os
+import sqlite3
+import threading
+import pandas as pd
+from pyshared.log_writer import BufferedWriter
+from emotion_stats import RunningEmotionStats
+from timeline_rollups import RESOLUTIONS, rollup_table, bucket_expression, bucket_key, \
+    choose_resolution, downsample
+
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+CSV_COLUMNS = ["Timestamp", "Emotion", "Confidence", "User_ID", "Username", "Email"]
+
+logger = logging.getLogger(__name__)
+
+
+def parse_timestamps(series):
+    """Parse logged timestamps, including the older underscore format"""
+    normalized = series.astype(str).str.replace(
+        r"^(\d{4}-\d{2}-\d{2})_(\d{2})-(\d{2})-(\d{2})$", r"\1 \2:\3:\4", regex=True
+    )
+    return pd.to_datetime(normalized, errors='coerce')
+
+
+class EmotionStore:
+    """SQLite store for one user's emotion history, indexed by timestamp.
+
+    Rows are appended through a BufferedWriter so logging stays off the
+    capture loop; every read flushes pending rows first. Running totals
+    live in a JSON sidecar that is updated with each inserted batch, and
+    per-emotion counts are rolled up at 10 s, minute, hour and day
+    resolution in the same transaction as the rows themselves.
+    """
+
+    def __init__(self, db_path, flush_rows=20, flush_interval=2.0):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS emotions (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                timestamp TEXT NOT NULL,
+                emotion TEXT NOT NULL,
+                confidence REAL NOT NULL,
+                user_id TEXT,
+                username TEXT,
+                email TEXT
+            );
+            CREATE INDEX IF NOT EXISTS idx_emotions_timestamp ON emotions (timestamp);
+            CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+        """)
+        for resolution in RESOLUTIONS:
+            self._conn.execute(
+                f"CREATE TABLE IF NOT EXISTS {rollup_table(resolution)} ("
+                "bucket TEXT NOT NULL, emotion TEXT NOT NULL, count INTEGER NOT NULL, "
+                "PRIMARY KEY (bucket, emotion))"
+            )
+        self._conn.commit()
+
+        self.stats = RunningEmotionStats(os.path.splitext(db_path)[0] + ".stats.json")
+        if not self.stats.loaded or self.stats.total != self._row_count():
+            self.rebuild_stats()
+
+        self._writer = BufferedWriter(
+            self.insert_rows, name=os.path.basename(db_path),
+            flush_rows=flush_rows, flush_interval=flush_interval
+        )
+        if not self.get_meta("rollups_built"):
+            self.rebuild_rollups()
+
+    def append(self, row):
+        """Queue one (timestamp, emotion, confidence, user_id, username, email) row"""
+        self._writer.write(row)
+
+    def flush(self):
+        self._writer.flush()
+
+    def insert_rows(self, rows, meta=None):
+        """Insert rows immediately in one transaction and update the running stats.
+
+        `meta` key/values are written in the same transaction, e.g. to mark
+        a batch as merged together with its rows.
+        """
+        rows = [(ts, emotion, float(conf), str(uid), name, email)
+                for ts, emotion, conf, uid, name, email in rows]
+        with self._lock:
+            # Rolled back as a whole on failure, so the writer can safely retry the batch
+            with self._conn:
+                self._conn.executemany(
+                    "INSERT INTO emotions (timestamp, emotion, confidence, user_id, username, email) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    rows
+                )
+                for resolution in RESOLUTIONS:
+                    self._conn.executemany(
+                        f"INSERT INTO {rollup_table(resolution)} (bucket, emotion, count) VALUES (?, ?, 1) "
+                        "ON CONFLICT (bucket, emotion) DO UPDATE SET count = count + 1",
+                        [(bucket_key(resolution, ts), emotion) for ts, emotion, *_ in rows]
+                    )
+                if meta:
+                    self._conn.executemany(
+                        "INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+                        [(key, str(value)) for key, value in meta.items()]
+                    )
+
+        self.stats.add_rows((ts, emotion, conf) for ts, emotion, conf, _, _, _ in rows)
+        try:
+            self.stats.save()
+        except OSError:
+            # The rows are committed; a stale sidecar is rebuilt on the next open
+            logger.exception("Could not save emotion stats sidecar for %s", self.db_path)
+
+    def writer_stats(self):
+        """Pending rows, write failures and the last error of the background writer"""
+        return self._writer.get_stats()
+
+    def rebuild_stats(self):
+        """Regenerate the stats sidecar from the raw rows"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT timestamp, emotion, confidence FROM emotions"
+            ).fetchall()
+        self.stats.rebuild(rows)
+
+    def rebuild_rollups(self):
+        """Recompute every rollup table from the raw rows"""
+        with self._lock:
+            for resolution in RESOLUTIONS:
+                table = rollup_table(resolution)
+                self._conn.execute(f"DELETE FROM {table}")
+                self._conn.execute(
+                    f"INSERT INTO {table} (bucket, emotion, count) "
+                    f"SELECT {bucket_expression(resolution)}, emotion, COUNT(*) "
+                    "FROM emotions GROUP BY 1, 2"
+                )
+            self._conn.execute(
+                "INSERT OR REPLACE INTO meta (key, value) VALUES ('rollups_built', '1')"
+            )
+            self._conn.commit()
+
+    def timeline(self, start=None, end=None, point_budget=500, lttb=True):
+        """Per-emotion counts over [start, end] from the coarsest-needed rollup.
+
+        Returns (DataFrame indexed by bucket start, resolution name). The
+        resolution is the finest one that fits `point_budget`; anything still
+        over budget is reduced with LTTB when `lttb` is set.
+        """
+        self.flush()
+        start = pd.Timestamp(start if start is not None else self.stats.start)
+        end = pd.Timestamp(end if end is not None else self.stats.end)
+        resolution = choose_resolution(start, end, point_budget)
+        freq = RESOLUTIONS[resolution][2]
+
+        first = start.floor(freq)
+        last = end.floor(freq)
+        rows = self._fetch(
+            f"SELECT bucket, emotion, count FROM {rollup_table(resolution)} "
+            "WHERE bucket >= ? AND bucket <= ?",
+            (first.strftime(TIMESTAMP_FORMAT), last.strftime(TIMESTAMP_FORMAT))
+        )
+
+        timeline = pd.DataFrame(rows, columns=["Timestamp", "Emotion", "Count"])
+        timeline["Timestamp"] = pd.to_datetime(timeline["Timestamp"], format=TIMESTAMP_FORMAT)
+        timeline = timeline.pivot_table(
+            index="Timestamp", columns="Emotion", values="Count", aggfunc="sum", fill_value=0
+        )
+        timeline = timeline.reindex(pd.date_range(first, last, freq=freq), fill_value=0)
+        timeline.index.name = "Timestamp"
+
+        if lttb:
+            timeline = downsample(timeline, point_budget)
+        return timeline, resolution
+
+    def _fetch(self, sql, params=()):
+        self.flush()
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+
+    def _row_count(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM emotions").fetchone()[0]
+
+    def count(self):
+        self.flush()
+        return self._row_count()
+
+    def query(self, start=None, end=None):
+        """Typed DataFrame of rows with start <= Timestamp < end (either may be None)"""
+        clauses, params = [], []
+        if start is not None:
+            clauses.append("timestamp >= ?")
+            params.append(pd.Timestamp(start).strftime(TIMESTAMP_FORMAT))
+        if end is not None:
+            clauses.append("timestamp < ?")
+            params.append(pd.Timestamp(end).strftime(TIMESTAMP_FORMAT))
+        where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+
+        self.flush()
+        with self._lock:
+            df = pd.read_sql_query(
+                "SELECT timestamp AS Timestamp, emotion AS Emotion, confidence AS Confidence, "
+                "user_id AS User_ID, username AS Username, email AS Email "
+                f"FROM emotions{where} ORDER BY timestamp, id",
+                self._conn, params=params
+            )
+        df['Timestamp'] = pd.to_datetime(df['Timestamp'], format=TIMESTAMP_FORMAT)
+        return df
+
+    def summary(self):
+        """Totals, per-emotion counts, average confidence, date range and daily buckets"""
+        self.flush()
+        return self.stats.summary()
+
+    def get_meta(self, key, default=None):
+        rows = self._fetch("SELECT value FROM meta WHERE key = ?", (key,))
+        return rows[0][0] if rows else default
+
+    def set_meta(self, key, value):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, str(value))
+            )
+            self._conn.commit()
+
+    def migrate_csv(self, csv_path):
+        """One-time import of an existing emotion_log.csv; returns rows imported"""
+        if self.get_meta("csv_migrated") or not os.path.exists(csv_path) \
+                or os.path.getsize(csv_path) == 0:
+            return 0
+
+        df = pd.read_csv(csv_path, dtype={"User_ID": str})
+        imported = 0
+        if not df.empty:
+            df['Timestamp'] = parse_timestamps(df['Timestamp'])
+            df['Confidence'] = pd.to_numeric(df['Confidence'], errors='coerce')
+            df = df.dropna(subset=['Timestamp', 'Confidence'])
+            df['Timestamp'] = df['Timestamp'].dt.strftime(TIMESTAMP_FORMAT)
+            for column in CSV_COLUMNS:
+                if column not in df.columns:
+                    df[column] = None
+            self.insert_rows(df[CSV_COLUMNS].itertuples(index=False, name=None))
+            imported = len(df)
+
+        self.set_meta("csv_migrated", csv_path)
+        return imported
+
+    def export_csv(self, path=None, df=None):
+        """CSV export of the full history (or of an already queried `df`); written to `path` or returned as bytes"""
+        df = self.query() if df is None else df.copy()
+        df['Timestamp'] = df['Timestamp'].dt.strftime(TIMESTAMP_FORMAT)
+        df['Confidence'] = df['Confidence'].map(lambda c: f"{c:.2f}")
+        if path is None:
+            return df.to_csv(index=False).encode('utf-8')
+        df.to_csv(path, index=False)
+        return path
+
+    def close(self):
+        self._writer.close()
+        with self._lock:
+            self._conn.close()
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def get_store(db_path):
+    """Process-wide store for `db_path`, shared by every session of that user"""
+    key = os.path.abspath(db_path)
+    with _stores_lock:
+        store = _stores.get(key)
+        if store is None:
+            store = EmotionStore(db_path)
+            _stores[key] = store
+        return store
+
+
+@atexit.register
+def close_all():
+    with _stores_lock:
+        stores = list(_stores.values())
+        _stores.clear()
+    for store in stores:
+        store.close()
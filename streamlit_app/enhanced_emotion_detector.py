@@ -1,18 +1,34 @@
 import cv2
-from deepface import DeepFace
 from PIL import Image, ImageFont, ImageDraw
 import numpy as np
 import os
+import time
 import datetime
-import csv
-from collections import deque, Counter
+from collections import deque, Counter, OrderedDict
 import threading
 import queue
 import streamlit as st
+from model_registry import get_model_registry
+from face_tracker import FaceTracker
+from inference_scheduler import AdaptiveInferenceScheduler
+from emotion_store import get_store
+from snapshot_sink import get_snapshot_sink
+from snapshot_index import get_snapshot_index
+from pyshared.metrics import histogram, counter
+
+ANALYZE_FRAME_SECONDS = histogram(
+    "detector_analyze_frame_seconds", "Face tracking plus emotion inference for one frame")
+LOG_CHANGE_SECONDS = histogram(
+    "detector_log_emotion_change_seconds", "Queueing the snapshot and log row for an emotion change")
+FRAMES_SUBMITTED = counter("detector_frames_submitted_total", "Frames handed to the inference worker")
+FRAMES_DROPPED = counter("detector_frames_dropped_total", "Frames replaced before the worker picked them up")
+INFERENCES = counter("detector_inferences_total", "Completed emotion inferences")
 
 class EnhancedEmotionDetector:
-    def __init__(self, user_data: dict):
+    def __init__(self, user_data: dict, model_registry=None, snapshot_sink=None):
         self.user_data = user_data
+        self.model_registry = model_registry or get_model_registry()
+        self.snapshot_sink = snapshot_sink or get_snapshot_sink()
         self.username = user_data["name"]
         self.user_id = user_data["id"]
         self.user_email = user_data["email"]
@@ -32,33 +48,61 @@ class EnhancedEmotionDetector:
             except:
                 self.emoji_font = ImageFont.load_default()
 
+        # Pre-rendered RGBA label sprites, keyed by label text
+        self.label_sprites = OrderedDict()
+        self.max_label_sprites = 256
+
         self.emotion_history = deque(maxlen=3)
         self.confidence_history = deque(maxlen=3)
         self.confidence_threshold = 40
 
         # Create user-specific directories and files
         self.user_dir = f"logs/user_{self.user_id}_{self.username.replace(' ', '_')}"
-        self.CSV_FILE = f"{self.user_dir}/emotion_log.csv"
+        self.DB_FILE = f"{self.user_dir}/emotion_log.db"
+        self.CSV_FILE = f"{self.user_dir}/emotion_log.csv"  # legacy log, imported into the store once
         self.SNAPSHOTS_DIR = f"{self.user_dir}/snapshots"
         
         self.setup_files()
 
+        # Full face detection only every few frames, tracked crops in between
+        self.use_roi_tracking = True
+        self.face_tracker = FaceTracker()
+        self.last_face_box = None
+
+        # Picks which frames get analyzed from latency and prediction stability
+        self.scheduler = AdaptiveInferenceScheduler()
+
+        # Optional SamplingProfiler; the worker thread registers with it on start
+        self.profiler = None
+
         self.current_emotion = None
         self.current_confidence = 0
         self.frame_count = 0
 
+        # Threaded mode: the worker owns inference and only ever sees the
+        # newest frame, the UI loop just reads the latest result
+        self._frame_slot = queue.Queue(maxsize=1)
+        self._stop_event = threading.Event()
+        self._result_lock = threading.Lock()
+        self._worker = None
+        self._latest_result = None
+        self._result_seq = 0
+
+        self.submitted_frames = 0
+        self.dropped_frames = 0
+        self.inference_count = 0
+        self.last_result_age = 0.0
+        self.total_result_age = 0.0
+
     def setup_files(self):
-        """Create user-specific directories and CSV file"""
+        """Create user-specific directories and open the emotion store"""
         os.makedirs(self.user_dir, exist_ok=True)
         os.makedirs(self.SNAPSHOTS_DIR, exist_ok=True)
-        
-        if not os.path.exists(self.CSV_FILE):
-            with open(self.CSV_FILE, mode='w', newline='') as file:
-                writer = csv.writer(file)
-                writer.writerow([
-                    "Timestamp", "Emotion", "Confidence", 
-                    "User_ID", "Username", "Email"
-                ])
+
+        self.snapshot_index = get_snapshot_index(self.SNAPSHOTS_DIR)
+        self.store = get_store(self.DB_FILE)
+        # Older installs logged straight to CSV; import that history once
+        self.store.migrate_csv(self.CSV_FILE)
 
     def preprocess_frame(self, frame):
         """Preprocess frame for better emotion detection"""
@@ -78,85 +122,229 @@ class EnhancedEmotionDetector:
         
         return smoothed_emotion, smoothed_confidence
 
+    def render_label_sprite(self, text):
+        """Render text once into premultiplied RGB and inverse-alpha arrays"""
+        left, top, right, bottom = self.emoji_font.getbbox(text)
+        sprite = Image.new("RGBA", (max(1, right), max(1, bottom)), (0, 0, 0, 0))
+        ImageDraw.Draw(sprite).text(
+            (0, 0), text, font=self.emoji_font, fill=(0, 255, 0, 255), embedded_color=True
+        )
+
+        rgba = np.asarray(sprite, dtype=np.float32)
+        alpha = rgba[..., 3:4] / 255.0
+        return rgba[..., :3] * alpha, 1.0 - alpha
+
+    def get_label_sprite(self, text):
+        sprite = self.label_sprites.get(text)
+        if sprite is None:
+            sprite = self.render_label_sprite(text)
+            self.label_sprites[text] = sprite
+            if len(self.label_sprites) > self.max_label_sprites:
+                self.label_sprites.popitem(last=False)
+        else:
+            self.label_sprites.move_to_end(text)
+        return sprite
+
     def draw_text_with_emoji(self, frame, text, x, y):
-        """Draw text with emoji on frame"""
+        """Draw text with emoji onto an RGB frame in place, blending only the label region"""
         try:
-            img_pil = Image.fromarray(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
-            draw = ImageDraw.Draw(img_pil)
-            draw.text((x, y), text, font=self.emoji_font, fill=(0, 255, 0))
-            return cv2.cvtColor(np.array(img_pil), cv2.COLOR_RGB2BGR)
-        except:
+            premultiplied, inverse_alpha = self.get_label_sprite(text)
+            h = min(premultiplied.shape[0], frame.shape[0] - y)
+            w = min(premultiplied.shape[1], frame.shape[1] - x)
+            if h > 0 and w > 0:
+                region = frame[y:y + h, x:x + w]
+                region[:] = region * inverse_alpha[:h, :w] + premultiplied[:h, :w]
+            return frame
+        except Exception:
             # Fallback to OpenCV text if PIL fails
             cv2.putText(frame, text, (x, y), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2)
             return frame
 
-    def log_emotion_change(self, emotion, confidence, frame):
+    def draw_label(self, frame, emotion, confidence, x=30, y=60):
+        """Overlay the current emotion label; confidence is rounded so sprites stay cached"""
+        if emotion:
+            emoji = self.emotion_emoji.get(emotion, "🙂")
+            label = f"{emoji} {emotion.upper()} ({confidence:.0f}%)"
+        else:
+            label = "🔍 Detecting..."
+        return self.draw_text_with_emoji(frame, label, x, y)
+
+    def log_emotion_change(self, emotion, confidence, frame, face_box=None):
         """Log emotion change with user data"""
-        timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        start = time.perf_counter()
+        now = datetime.datetime.now()
+        timestamp = now.strftime("%Y-%m-%d %H:%M:%S")
         
-        # Save snapshot
-        filename = f"{self.SNAPSHOTS_DIR}/{emotion}_{timestamp.replace(':', '-').replace(' ', '_')}.jpg"
-        cv2.imwrite(filename, frame)
+        # Save snapshot; encoding and the disk write happen on the sink's workers.
+        # Milliseconds keep two changes within one second from sharing a file.
+        filename = f"{self.SNAPSHOTS_DIR}/{emotion}_{now:%Y-%m-%d_%H-%M-%S}-{now.microsecond // 1000:03d}.jpg"
+        self.snapshot_sink.submit(
+            filename, frame, face_box,
+            index=self.snapshot_index,
+            record={"timestamp": timestamp, "emotion": emotion, "confidence": confidence}
+        )
         
-        # Log to CSV with user information
-        with open(self.CSV_FILE, mode='a', newline='') as file:
-            writer = csv.writer(file)
-            writer.writerow([
-                timestamp, emotion, f"{confidence:.2f}",
-                self.user_id, self.username, self.user_email
-            ])
+        # Queue the row with user information; the store writes it in the background
+        self.store.append([
+            timestamp, emotion, round(float(confidence), 2),
+            self.user_id, self.username, self.user_email
+        ])
+        LOG_CHANGE_SECONDS.observe(time.perf_counter() - start)
         
         # Display in Streamlit
         st.success(f"📸 {self.username}: {emotion} ({confidence:.1f}%)")
 
+    def _run_inference(self, frame):
+        """Run the shared emotion model on a frame and return the smoothed prediction"""
+        start = time.perf_counter()
+        processed_frame = self.preprocess_frame(frame)
+
+        face = self.face_tracker.locate(processed_frame) if self.use_roi_tracking else None
+        self.last_face_box = self.face_tracker.box if face is not None else None
+        if face is not None:
+            # The crop is already a face, so skip DeepFace's own detector
+            result = self.model_registry.analyze(face, detector_backend='skip')
+        else:
+            result = self.model_registry.analyze(processed_frame)
+
+        dominant_emotion = result[0]['dominant_emotion']
+        confidence = result[0]['emotion'][dominant_emotion]
+
+        latency = time.perf_counter() - start
+        ANALYZE_FRAME_SECONDS.observe(latency)
+        INFERENCES.inc()
+        self.scheduler.record_inference(latency, dominant_emotion, confidence)
+
+        return self.smooth_predictions(dominant_emotion, confidence)
+
     def analyze_frame(self, frame):
         """Analyze frame for emotions"""
         try:
-            processed_frame = self.preprocess_frame(frame)
-            result = DeepFace.analyze(
-                processed_frame,
-                actions=['emotion'],
-                enforce_detection=False,
-                detector_backend='opencv'
-            )
-            
-            dominant_emotion = result[0]['dominant_emotion']
-            confidence = result[0]['emotion'][dominant_emotion]
-            
-            smoothed_emotion, smoothed_confidence = self.smooth_predictions(
-                dominant_emotion, confidence
-            )
-            
-            return smoothed_emotion, smoothed_confidence
-            
+            return self._run_inference(frame)
         except Exception as e:
             st.error(f"Analysis error: {e}")
             return "neutral", 0
 
-    def get_emotion_stats(self):
-        """Get emotion statistics for the user"""
-        if not os.path.exists(self.CSV_FILE):
-            return {}
-            
+    def start_worker(self):
+        """Start the background inference worker"""
+        if self._worker is not None:
+            if not self._stop_event.is_set():
+                return
+            # A stopped worker may still be inside an inference; two workers
+            # must never share the tracker and the result state
+            self._worker.join()
+            self._worker = None
+
+        # Each worker gets its own event, so restarting can't un-stop an old one
+        self._stop_event = threading.Event()
+        self._worker = threading.Thread(
+            target=self._inference_loop,
+            args=(self._stop_event,),
+            name=f"emotion-worker-{self.user_id}",
+            daemon=True
+        )
+        self._worker.start()
+        if self.profiler is not None:
+            self.profiler.add_thread(self._worker.ident)
+
+    def stop_worker(self, timeout=2.0):
+        """Stop the background inference worker and discard any pending frame"""
+        self._stop_event.set()
+        if self._worker is not None:
+            if self.profiler is not None:
+                self.profiler.discard_thread(self._worker.ident)
+            self._worker.join(timeout=timeout)
+            # Still finishing an inference: keep the handle so start_worker() waits for it
+            if not self._worker.is_alive():
+                self._worker = None
+
         try:
-            import pandas as pd
-            df = pd.read_csv(self.CSV_FILE)
-            
-            if df.empty:
-                return {}
-                
-            stats = {
-                "total_detections": len(df),
-                "emotion_counts": df['Emotion'].value_counts().to_dict(),
-                "avg_confidence": df['Confidence'].astype(float).mean(),
-                "date_range": {
-                    "start": df['Timestamp'].min(),
-                    "end": df['Timestamp'].max()
+            self._frame_slot.get_nowait()
+        except queue.Empty:
+            pass
+
+    def submit_frame(self, frame):
+        """Hand the newest frame to the worker, replacing one it has not picked up yet"""
+        item = (frame, time.time())
+        try:
+            self._frame_slot.put_nowait(item)
+        except queue.Full:
+            try:
+                self._frame_slot.get_nowait()
+                self.dropped_frames += 1
+                FRAMES_DROPPED.inc()
+            except queue.Empty:
+                pass
+            # The UI loop is the only producer, so the slot is free again here
+            self._frame_slot.put_nowait(item)
+        self.submitted_frames += 1
+        FRAMES_SUBMITTED.inc()
+
+    def _inference_loop(self, stop_event):
+        """Worker body: analyze the latest frame whenever one is available"""
+        while not stop_event.is_set():
+            try:
+                frame, captured_at = self._frame_slot.get(timeout=0.1)
+            except queue.Empty:
+                continue
+
+            error = None
+            try:
+                emotion, confidence = self._run_inference(frame)
+            except Exception as e:
+                emotion, confidence, error = "neutral", 0, str(e)
+            if stop_event.is_set():
+                break
+
+            completed_at = time.time()
+            with self._result_lock:
+                self._result_seq += 1
+                self.inference_count += 1
+                self.last_result_age = completed_at - captured_at
+                self.total_result_age += self.last_result_age
+                self._latest_result = {
+                    "seq": self._result_seq,
+                    "emotion": emotion,
+                    "confidence": confidence,
+                    "frame": frame,
+                    "face_box": self.last_face_box,
+                    "captured_at": captured_at,
+                    "completed_at": completed_at,
+                    "error": error
                 }
+
+    def get_latest_result(self):
+        """Return the newest worker result (or None) with its current age in seconds"""
+        with self._result_lock:
+            if self._latest_result is None:
+                return None
+            result = dict(self._latest_result)
+
+        result["age"] = time.time() - result["captured_at"]
+        return result
+
+    def get_worker_stats(self):
+        """Frame and latency counters for the threaded mode"""
+        with self._result_lock:
+            inferences = self.inference_count
+            avg_age = self.total_result_age / inferences if inferences else 0.0
+            return {
+                "submitted_frames": self.submitted_frames,
+                "dropped_frames": self.dropped_frames,
+                "inferences": inferences,
+                "last_result_age": self.last_result_age,
+                "avg_result_age": avg_age
             }
-            
-            return stats
-            
+
+    def flush_logs(self):
+        """Write queued log rows so readers of the store see everything"""
+        self.store.flush()
+
+    def get_emotion_stats(self):
+        """Get emotion statistics for the user"""
+        try:
+            stats = self.store.summary()
+            return stats if stats["total_detections"] else {}
         except Exception as e:
             st.error(f"Error getting stats: {e}")
             return {}
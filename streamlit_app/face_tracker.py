@@ -0,0 +1,137 @@
+import cv2
+import numpy as np
+
+
+class FaceTracker:
+    """Follow the face box between periodic full Haar detections"""
+
+    def __init__(self, redetect_interval: int = 10, min_confidence: float = 0.6,
+                 margin: float = 0.2, face_size: int = 224):
+        self.redetect_interval = redetect_interval
+        self.min_confidence = min_confidence
+        self.margin = margin
+        self.face_size = face_size
+
+        self.face_cascade = cv2.CascadeClassifier(
+            cv2.data.haarcascades + "haarcascade_frontalface_default.xml"
+        )
+        self.eye_cascade = cv2.CascadeClassifier(
+            cv2.data.haarcascades + "haarcascade_eye.xml"
+        )
+
+        self.box = None
+        self.template = None
+        self.roll_angle = 0.0
+        self.confidence = 0.0
+        self.frames_since_detection = 0
+
+        self.full_detections = 0
+        self.tracked_frames = 0
+
+    def reset(self):
+        """Forget the current face so the next frame runs a full detection"""
+        self.box = None
+        self.template = None
+        self.roll_angle = 0.0
+        self.confidence = 0.0
+        self.frames_since_detection = 0
+
+    def detect(self, gray):
+        """Full-frame Haar detection, keeping the largest face"""
+        self.full_detections += 1
+        faces = self.face_cascade.detectMultiScale(
+            gray, scaleFactor=1.1, minNeighbors=5, minSize=(48, 48)
+        )
+        if len(faces) == 0:
+            self.reset()
+            return None
+
+        x, y, w, h = max(faces, key=lambda f: f[2] * f[3])
+        self.box = (int(x), int(y), int(w), int(h))
+        self.template = gray[y:y + h, x:x + w].copy()
+        self.roll_angle = self.estimate_roll(gray[y:y + h, x:x + w])
+        self.confidence = 1.0
+        self.frames_since_detection = 0
+        return self.box
+
+    def track(self, gray):
+        """Template-match the last face inside a window around its old position"""
+        x, y, w, h = self.box
+        pad_x, pad_y = int(w * self.margin), int(h * self.margin)
+        x0, y0 = max(0, x - pad_x), max(0, y - pad_y)
+        x1 = min(gray.shape[1], x + w + pad_x)
+        y1 = min(gray.shape[0], y + h + pad_y)
+
+        search = gray[y0:y1, x0:x1]
+        if search.shape[0] < h or search.shape[1] < w:
+            self.confidence = 0.0
+            return None
+
+        scores = cv2.matchTemplate(search, self.template, cv2.TM_CCOEFF_NORMED)
+        _, max_val, _, max_loc = cv2.minMaxLoc(scores)
+
+        self.tracked_frames += 1
+        self.frames_since_detection += 1
+        self.confidence = float(max_val)
+        self.box = (x0 + max_loc[0], y0 + max_loc[1], w, h)
+        return self.box
+
+    def estimate_roll(self, face_gray):
+        """Head roll in degrees from the two most prominent eyes (0 if not found)"""
+        upper = face_gray[:face_gray.shape[0] // 2]
+        eyes = self.eye_cascade.detectMultiScale(upper, scaleFactor=1.1, minNeighbors=5)
+        if len(eyes) < 2:
+            return 0.0
+
+        eyes = sorted(eyes, key=lambda e: e[2] * e[3], reverse=True)[:2]
+        (ax, ay, aw, ah), (bx, by, bw, bh) = sorted(eyes, key=lambda e: e[0])
+        left = (ax + aw / 2, ay + ah / 2)
+        right = (bx + bw / 2, by + bh / 2)
+        return float(np.degrees(np.arctan2(right[1] - left[1], right[0] - left[0])))
+
+    def update(self, frame):
+        """Return the current face box, re-detecting when due or when tracking is weak"""
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+
+        needs_detection = (
+            self.box is None
+            or self.frames_since_detection >= self.redetect_interval
+        )
+        if not needs_detection:
+            self.track(gray)
+            needs_detection = self.confidence < self.min_confidence
+
+        if needs_detection:
+            return self.detect(gray)
+        return self.box
+
+    def crop_face(self, frame, box):
+        """Cut out the face with a margin, level the eyes and resize for the model"""
+        x, y, w, h = box
+        pad_x, pad_y = int(w * self.margin), int(h * self.margin)
+        x0, y0 = max(0, x - pad_x), max(0, y - pad_y)
+        x1 = min(frame.shape[1], x + w + pad_x)
+        y1 = min(frame.shape[0], y + h + pad_y)
+        face = frame[y0:y1, x0:x1]
+
+        if abs(self.roll_angle) > 2:
+            center = (face.shape[1] / 2, face.shape[0] / 2)
+            rotation = cv2.getRotationMatrix2D(center, self.roll_angle, 1.0)
+            face = cv2.warpAffine(face, rotation, (face.shape[1], face.shape[0]),
+                                  borderMode=cv2.BORDER_REPLICATE)
+
+        return cv2.resize(face, (self.face_size, self.face_size))
+
+    def locate(self, frame):
+        """Aligned face crop for the current frame, or None if no face is visible"""
+        box = self.update(frame)
+        if box is None:
+            return None
+        return self.crop_face(frame, box)
+
+    def get_stats(self):
+        return {
+            "full_detections": self.full_detections,
+            "tracked_frames": self.tracked_frames,
+            "confidence": self.confidence
+        }
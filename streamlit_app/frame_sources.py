@@ -0,0 +1,164 @@
+import os
+import time
+import cv2
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp")
+
+
+class Pacer:
+    """Sleep so frames come out at `fps`; fps of None or 0 means as fast as possible"""
+
+    def __init__(self, fps=None):
+        self.interval = 1.0 / fps if fps else 0.0
+        self._next_due = None
+
+    def wait(self):
+        if not self.interval:
+            return
+        now = time.perf_counter()
+        if self._next_due is None:
+            self._next_due = now
+        delay = self._next_due - now
+        if delay > 0:
+            time.sleep(delay)
+        # A late frame resets the schedule instead of bursting to catch up
+        self._next_due = max(self._next_due + self.interval, time.perf_counter())
+
+
+class CameraSource:
+    """Live webcam, mirrored like a selfie view"""
+
+    is_live = True
+
+    def __init__(self, index=0, width=640, height=480, mirror=True):
+        self.index = index
+        self.width = width
+        self.height = height
+        self.mirror = mirror
+        self.frames_read = 0
+        self.cap = None
+
+    def open(self):
+        self.cap = cv2.VideoCapture(self.index)
+        if not self.cap.isOpened():
+            return False
+        self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, self.width)
+        self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, self.height)
+        return True
+
+    def read(self):
+        ret, frame = self.cap.read()
+        if not ret:
+            return False, None
+        self.frames_read += 1
+        return True, cv2.flip(frame, 1) if self.mirror else frame
+
+    def release(self):
+        if self.cap is not None:
+            self.cap.release()
+
+
+class VideoFileSource:
+    """Replay a recorded clip at its own frame rate, a fixed `fps`, or unthrottled (fps=0)"""
+
+    is_live = False
+
+    def __init__(self, path, fps=None, loop=False, size=(640, 480)):
+        self.path = path
+        self.fps = fps
+        self.loop = loop
+        self.size = size
+        self.frames_read = 0
+        self.cap = None
+        self.pacer = None
+
+    def open(self):
+        self.cap = cv2.VideoCapture(self.path)
+        if not self.cap.isOpened():
+            return False
+        fps = self.fps if self.fps is not None else self.cap.get(cv2.CAP_PROP_FPS)
+        self.pacer = Pacer(fps)
+        return True
+
+    def read(self):
+        ret, frame = self.cap.read()
+        if not ret and self.loop and self.frames_read:
+            self.cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            ret, frame = self.cap.read()
+        if not ret:
+            return False, None
+
+        self.pacer.wait()
+        self.frames_read += 1
+        if self.size and (frame.shape[1], frame.shape[0]) != tuple(self.size):
+            frame = cv2.resize(frame, tuple(self.size))
+        return True, frame
+
+    def release(self):
+        if self.cap is not None:
+            self.cap.release()
+
+
+class ImageDirectorySource:
+    """Replay the images in a directory in name order, paced like VideoFileSource"""
+
+    is_live = False
+
+    def __init__(self, path, fps=None, loop=False, size=(640, 480)):
+        self.path = path
+        self.fps = fps
+        self.loop = loop
+        self.size = size
+        self.frames_read = 0
+        self.files = []
+        self._position = 0
+        self.pacer = None
+
+    def open(self):
+        if not os.path.isdir(self.path):
+            return False
+        self.files = sorted(
+            os.path.join(self.path, name) for name in os.listdir(self.path)
+            if name.lower().endswith(IMAGE_EXTENSIONS)
+        )
+        self.pacer = Pacer(self.fps)
+        return bool(self.files)
+
+    def read(self):
+        # Undecodable files are skipped, but at most one full pass per read:
+        # a looping directory with no readable image must not spin forever
+        for _ in range(len(self.files)):
+            if self._position >= len(self.files):
+                if not self.loop:
+                    return False, None
+                self._position = 0
+
+            frame = cv2.imread(self.files[self._position])
+            self._position += 1
+            if frame is not None:
+                break
+        else:
+            return False, None
+
+        self.pacer.wait()
+        self.frames_read += 1
+        if self.size and (frame.shape[1], frame.shape[0]) != tuple(self.size):
+            frame = cv2.resize(frame, tuple(self.size))
+        return True, frame
+
+    def release(self):
+        pass
+
+
+def open_frame_source(spec="0", fps=None, loop=False):
+    """Frame source for a camera index, a video file or an image directory.
+
+    For replays, fps=None keeps the clip's own rate (images: unthrottled)
+    and fps=0 reads as fast as possible.
+    """
+    spec = str(spec)
+    if spec.isdigit():
+        return CameraSource(int(spec))
+    if os.path.isdir(spec):
+        return ImageDirectorySource(spec, fps=fps, loop=loop)
+    return VideoFileSource(spec, fps=fps, loop=loop)
@@ -0,0 +1,120 @@
+import time
+import threading
+from collections import deque
+import cv2
+import numpy as np
+
+
+class AdaptiveInferenceScheduler:
+    """Decide when the next frame should go to the emotion model"""
+
+    def __init__(self, cpu_budget: float = 0.5, min_interval: float = 0.05,
+                 max_interval: float = 2.0, backoff: float = 1.5, max_backoff: float = 8.0,
+                 motion_threshold: float = 12.0, confidence_jump: float = 15.0):
+        # cpu_budget is the share of one core inference may use, so an
+        # inference taking 100 ms at a 0.5 budget runs at most every 200 ms
+        self.cpu_budget = cpu_budget
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.motion_threshold = motion_threshold
+        self.confidence_jump = confidence_jump
+
+        self.avg_latency = None
+        self.stability_factor = 1.0
+        self.last_scheduled = 0.0
+        self.next_due = 0.0
+        self.last_emotion = None
+        self.last_confidence = 0.0
+        self.last_motion = 0.0
+        self._reference = None
+        self._scheduled_at = deque(maxlen=64)
+        self._lock = threading.Lock()
+
+    @property
+    def budget_interval(self):
+        """Shortest gap between inferences that keeps within cpu_budget"""
+        latency = self.avg_latency if self.avg_latency is not None else self.min_interval
+        return float(np.clip(latency / self.cpu_budget, self.min_interval, self.max_interval))
+
+    @property
+    def interval(self):
+        """Seconds between scheduled inferences while the scene is still"""
+        return float(min(self.budget_interval * self.stability_factor, self.max_interval))
+
+    def scheduled_rate(self, now=None, window=5.0):
+        """Inferences actually scheduled per second over the last `window` seconds"""
+        now = now if now is not None else time.time()
+        recent = [t for t in self._scheduled_at if now - t <= window]
+        if len(recent) < 2:
+            return 1.0 / self.interval
+        return (len(recent) - 1) / max(now - recent[0], recent[-1] - recent[0])
+
+    @property
+    def current_rate(self):
+        """Scheduled inferences per second"""
+        with self._lock:
+            return self.scheduled_rate()
+
+    def _thumbnail(self, frame):
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        return cv2.resize(gray, (32, 24), interpolation=cv2.INTER_AREA).astype(np.float32)
+
+    def should_infer(self, frame, now=None):
+        """True when this frame should be analyzed"""
+        now = now if now is not None else time.time()
+        thumbnail = self._thumbnail(frame)
+
+        with self._lock:
+            if self._reference is not None:
+                self.last_motion = float(np.mean(np.abs(thumbnail - self._reference)))
+
+            due = now >= self.next_due
+            # A visible change since the last analyzed frame cuts the back-off
+            # short, but never below the CPU budget's interval
+            moved = (
+                self.last_motion > self.motion_threshold
+                and now - self.last_scheduled >= self.budget_interval
+            )
+            if moved:
+                self.stability_factor = 1.0
+
+            if due or moved:
+                self.last_scheduled = now
+                self._scheduled_at.append(now)
+                self.next_due = now + self.interval
+                self._reference = thumbnail
+                return True
+            return False
+
+    def record_inference(self, latency, emotion, confidence):
+        """Feed back one inference: its latency and raw prediction"""
+        with self._lock:
+            if self.avg_latency is None:
+                self.avg_latency = latency
+            else:
+                self.avg_latency = 0.7 * self.avg_latency + 0.3 * latency
+
+            stable = (
+                emotion == self.last_emotion
+                and abs(confidence - self.last_confidence) < self.confidence_jump
+            )
+            if stable:
+                self.stability_factor = min(self.stability_factor * self.backoff, self.max_backoff)
+            else:
+                self.stability_factor = 1.0
+
+            self.last_emotion = emotion
+            self.last_confidence = confidence
+            self.next_due = self.last_scheduled + self.interval
+
+    def get_stats(self):
+        with self._lock:
+            return {
+                "rate": self.scheduled_rate(),
+                "interval": self.interval,
+                "avg_latency": self.avg_latency or 0.0,
+                "stability_factor": self.stability_factor,
+                "motion": self.last_motion
+            }
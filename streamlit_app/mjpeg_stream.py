@@ -0,0 +1,235 @@
+import os
+import secrets
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import cv2
+import streamlit as st
+from pyshared.metrics import REGISTRY
+
+BOUNDARY = "frame"
+
+
+class FrameStream:
+    """Latest-frame slot for one viewer, JPEG-encoded on its own thread.
+
+    Encoding is paced to `target_fps`. When the client falls behind, the
+    stream lowers JPEG quality and then resolution; after a run of frames
+    delivered on time it steps back up.
+    """
+
+    def __init__(self, target_fps=15, quality=80, min_quality=40, min_scale=0.5):
+        self.target_fps = target_fps
+        self.max_quality = quality
+        self.min_quality = min_quality
+        self.min_scale = min_scale
+        self.quality = quality
+        self.scale = 1.0
+
+        self._frame = None
+        self._frame_ready = threading.Event()
+        self._jpeg = None
+        self._jpeg_seq = 0
+        self._jpeg_ready = threading.Condition()
+        self._closed = False
+        self._on_time = 0
+
+        self.encoded_frames = 0
+        self.skipped_frames = 0
+        self.encode_time = 0.0
+
+        self._encoder = threading.Thread(target=self._encode_loop, name="mjpeg-encoder", daemon=True)
+        self._encoder.start()
+
+    @property
+    def closed(self):
+        return self._closed
+
+    @property
+    def frame_interval(self):
+        return 1.0 / self.target_fps
+
+    def publish(self, frame_rgb):
+        """Offer the newest RGB frame; unencoded older frames are simply replaced"""
+        if self._frame_ready.is_set():
+            self.skipped_frames += 1
+        self._frame = frame_rgb
+        self._frame_ready.set()
+
+    def _encode_loop(self):
+        next_due = time.perf_counter()
+        while not self._closed:
+            if not self._frame_ready.wait(timeout=0.5):
+                continue
+
+            # Pace to the target FPS; frames published meanwhile replace this one
+            delay = next_due - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            next_due = max(next_due + self.frame_interval, time.perf_counter())
+
+            self._frame_ready.clear()
+            frame = self._frame
+            start = time.perf_counter()
+            if self.scale < 1.0:
+                frame = cv2.resize(frame, None, fx=self.scale, fy=self.scale,
+                                   interpolation=cv2.INTER_AREA)
+            ok, encoded = cv2.imencode(
+                ".jpg", cv2.cvtColor(frame, cv2.COLOR_RGB2BGR),
+                [cv2.IMWRITE_JPEG_QUALITY, int(self.quality)]
+            )
+            self.encode_time = time.perf_counter() - start
+            if not ok:
+                continue
+
+            with self._jpeg_ready:
+                self._jpeg = encoded.tobytes()
+                self._jpeg_seq += 1
+                self.encoded_frames += 1
+                self._jpeg_ready.notify_all()
+
+    def next_jpeg(self, after_seq, timeout=1.0):
+        """Wait for a JPEG newer than `after_seq`; returns (seq, bytes) or None"""
+        with self._jpeg_ready:
+            if not self._jpeg_ready.wait_for(
+                lambda: self._closed or self._jpeg_seq > after_seq, timeout=timeout
+            ):
+                return None
+            if self._closed:
+                return None
+            return self._jpeg_seq, self._jpeg
+
+    def report_send(self, seconds, frames_behind):
+        """Adapt quality and resolution from how long the client took to receive a frame"""
+        if seconds > self.frame_interval or frames_behind > 1:
+            self._on_time = 0
+            if self.quality > self.min_quality:
+                self.quality = max(self.min_quality, self.quality - 10)
+            elif self.scale > self.min_scale:
+                self.scale = max(self.min_scale, self.scale - 0.25)
+            return
+
+        self._on_time += 1
+        if self._on_time >= self.target_fps * 2:
+            self._on_time = 0
+            if self.scale < 1.0:
+                self.scale = min(1.0, self.scale + 0.25)
+            elif self.quality < self.max_quality:
+                self.quality = min(self.max_quality, self.quality + 10)
+
+    def close(self):
+        self._closed = True
+        self._frame_ready.set()
+        with self._jpeg_ready:
+            self._jpeg_ready.notify_all()
+
+    def get_stats(self):
+        return {
+            "encoded_frames": self.encoded_frames,
+            "skipped_frames": self.skipped_frames,
+            "encode_ms": self.encode_time * 1000,
+            "quality": self.quality,
+            "scale": self.scale
+        }
+
+
+class StreamServer:
+    """Serves every session's FrameStream as multipart MJPEG over plain HTTP.
+
+    The same server answers /metrics with this process's metrics in
+    Prometheus text format.
+    """
+
+    def __init__(self, host="127.0.0.1", port=8590, public_url=None):
+        self.streams = {}
+        self._lock = threading.Lock()
+        self.public_url = (public_url or f"http://localhost:{port}").rstrip("/")
+
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def do_GET(self):
+                if self.path == "/metrics":
+                    body = REGISTRY.render_prometheus().encode()
+                    self.send_response(200)
+                    self.send_header("Content-Type", "text/plain; version=0.0.4")
+                    self.send_header("Content-Length", str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+                    return
+
+                token = self.path.rsplit("/", 1)[-1]
+                stream = server.streams.get(token)
+                if not self.path.startswith("/stream/") or stream is None:
+                    self.send_error(404)
+                    return
+
+                self.send_response(200)
+                self.send_header("Content-Type", f"multipart/x-mixed-replace; boundary={BOUNDARY}")
+                self.send_header("Cache-Control", "no-cache, private")
+                self.end_headers()
+                server.serve_stream(self.wfile, stream)
+
+        self.httpd = ThreadingHTTPServer((host, port), Handler)
+        self.httpd.daemon_threads = True
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name="mjpeg-server", daemon=True)
+        self._thread.start()
+
+    def serve_stream(self, wfile, stream):
+        seq = 0
+        try:
+            while True:
+                item = stream.next_jpeg(seq)
+                if item is None:
+                    if stream.closed:
+                        return
+                    continue
+
+                new_seq, jpeg = item
+                start = time.perf_counter()
+                wfile.write(
+                    f"--{BOUNDARY}\r\nContent-Type: image/jpeg\r\n"
+                    f"Content-Length: {len(jpeg)}\r\n\r\n".encode()
+                )
+                wfile.write(jpeg)
+                wfile.write(b"\r\n")
+                wfile.flush()
+                stream.report_send(time.perf_counter() - start, new_seq - seq if seq else 1)
+                seq = new_seq
+        except (BrokenPipeError, ConnectionResetError):
+            return
+
+    def open_stream(self, **kwargs):
+        """Register a new stream; returns (token, stream)"""
+        token = secrets.token_urlsafe(16)
+        stream = FrameStream(**kwargs)
+        with self._lock:
+            self.streams[token] = stream
+        return token, stream
+
+    def close_stream(self, token):
+        with self._lock:
+            stream = self.streams.pop(token, None)
+        if stream is not None:
+            stream.close()
+
+    def stream_url(self, token):
+        return f"{self.public_url}/stream/{token}"
+
+
+@st.cache_resource
+def get_stream_server():
+    """One MJPEG server per Streamlit process (MJPEG_HOST, MJPEG_PORT, MJPEG_PUBLIC_URL).
+
+    Binds to loopback by default: streams are only guarded by their
+    unguessable token, so exposing them (MJPEG_HOST=0.0.0.0) should go
+    through a reverse proxy that also serves MJPEG_PUBLIC_URL over HTTPS.
+    """
+    return StreamServer(
+        host=os.environ.get("MJPEG_HOST", "127.0.0.1"),
+        port=int(os.environ.get("MJPEG_PORT", 8590)),
+        public_url=os.environ.get("MJPEG_PUBLIC_URL")
+    )
@@ -0,0 +1,141 @@
+import os
+import time
+import threading
+import numpy as np
+import streamlit as st
+from emotion_backends import BACKENDS, load_emotion_backend
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+
+def resident_memory_mb():
+    """Current resident set size of this process in MB (None if unknown)"""
+    if psutil is not None:
+        return psutil.Process().memory_info().rss / (1024 * 1024)
+
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+class EmotionModelRegistry:
+    """Process-wide emotion model shared by every Streamlit session.
+
+    `backend` picks the implementation (see emotion_backends.BACKENDS);
+    results keep DeepFace's shape whichever one is used.
+    """
+
+    def __init__(self, detector_backend: str = "opencv", backend: str = "deepface", **backend_options):
+        self.detector_backend = detector_backend
+        self.backend = load_emotion_backend(backend, detector_backend, **backend_options)
+        self.model = None
+        self.load_time = 0.0
+        self.warmup_time = 0.0
+        self.memory_before_mb = None
+        self.memory_after_mb = None
+        self.preload_thread = None
+        self._lock = threading.Lock()
+
+    @property
+    def is_loaded(self):
+        return self.model is not None
+
+    def load(self):
+        """Build the emotion model once and run a warm-up forward pass"""
+        with self._lock:
+            if self.model is not None:
+                return
+
+            self.memory_before_mb = resident_memory_mb()
+
+            start = time.perf_counter()
+            self.backend.load()
+            self.load_time = time.perf_counter() - start
+
+            start = time.perf_counter()
+            self.warm_up()
+            self.warmup_time = time.perf_counter() - start
+
+            self.memory_after_mb = resident_memory_mb()
+            # Published last so is_loaded means loaded and warmed up
+            self.model = self.backend.model
+
+    def warm_up(self):
+        """Dummy forward pass so graph building and detector loading happen now"""
+        dummy = np.zeros((480, 640, 3), dtype=np.uint8)
+        self.backend.predict(dummy)
+
+    def analyze(self, frame, detector_backend=None):
+        """Run emotion analysis with the shared model.
+
+        detector_backend='skip' marks `frame` as an already-cropped face.
+        """
+        if self.model is None:
+            self.load()
+
+        scores = self.backend.predict(frame, is_face=detector_backend == 'skip')
+        return [{"dominant_emotion": max(scores, key=scores.get), "emotion": scores}]
+
+    def get_stats(self):
+        """Load timings and memory figures for host sizing"""
+        model_memory = None
+        if self.memory_before_mb is not None and self.memory_after_mb is not None:
+            model_memory = self.memory_after_mb - self.memory_before_mb
+
+        return {
+            "backend": self.backend.name,
+            "loaded": self.is_loaded,
+            "load_time": self.load_time,
+            "warmup_time": self.warmup_time,
+            "model_memory_mb": model_memory,
+            "resident_memory_mb": resident_memory_mb()
+        }
+
+
+def default_backend():
+    """Facial emotion backend from EMOTION_FACE_BACKEND, DeepFace by default"""
+    backend = os.environ.get("EMOTION_FACE_BACKEND", "deepface")
+    return backend if backend in BACKENDS else "deepface"
+
+
+_registries = {}
+_registries_lock = threading.Lock()
+
+
+def shared_registry(backend=None):
+    """The process-wide (possibly not yet loaded) registry for `backend`"""
+    backend = backend or default_backend()
+    with _registries_lock:
+        registry = _registries.get(backend)
+        if registry is None:
+            registry = EmotionModelRegistry(backend=backend)
+            _registries[backend] = registry
+        return registry
+
+
+def preload_model(backend=None):
+    """Start loading the model on a background thread; returns the registry at once"""
+    registry = shared_registry(backend)
+    with _registries_lock:
+        if not registry.is_loaded and registry.preload_thread is None:
+            registry.preload_thread = threading.Thread(
+                target=registry.load, name=f"model-preload-{registry.backend.name}", daemon=True
+            )
+            registry.preload_thread.start()
+    return registry
+
+
+def get_model_registry(backend=None):
+    """Shared, warmed-up registry for the whole Streamlit process, one per backend"""
+    registry = shared_registry(backend)
+    if not registry.is_loaded:
+        # Waits on the registry's lock if a preload is already running
+        with st.spinner("🧠 Loading emotion model..."):
+            registry.load()
+    return registry
@@ -0,0 +1,101 @@
+import collections
+import os
+import sys
+import threading
+import time
+
+
+class SamplingProfiler:
+    """Statistical profiler that samples chosen threads' stacks on a timer.
+
+    Overhead is one sys._current_frames() call per interval, so it can be
+    left on for a whole detection session. Results are kept as collapsed
+    stacks ("outer;inner;leaf count"), the input format of flamegraph tools.
+    """
+
+    def __init__(self, interval=0.005, max_depth=64):
+        self.interval = interval
+        self.max_depth = max_depth
+        self.thread_ids = set()
+        self.stacks = collections.Counter()
+        self.samples = 0
+        self.started_at = None
+        self.duration = 0.0
+        self._stop = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def add_thread(self, thread_id=None):
+        """Sample this thread (default: the caller's) from now on"""
+        self.thread_ids.add(thread_id or threading.get_ident())
+
+    def discard_thread(self, thread_id=None):
+        self.thread_ids.discard(thread_id or threading.get_ident())
+
+    def start(self):
+        if self.running:
+            return
+        self._stop.clear()
+        self.started_at = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=1.0)
+            self._thread = None
+        if self.started_at is not None:
+            self.duration += time.perf_counter() - self.started_at
+            self.started_at = None
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frames = sys._current_frames()
+            for thread_id in list(self.thread_ids):
+                frame = frames.get(thread_id)
+                if frame is not None:
+                    self._record(frame)
+
+    def _record(self, frame):
+        stack = []
+        while frame is not None and len(stack) < self.max_depth:
+            code = frame.f_code
+            stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+            frame = frame.f_back
+        with self._lock:
+            self.stacks[";".join(reversed(stack))] += 1
+            self.samples += 1
+
+    def top(self, n=15):
+        """Functions with the most samples anywhere on the stack (inclusive) and at the top (self)"""
+        inclusive, exclusive = collections.Counter(), collections.Counter()
+        with self._lock:
+            items = list(self.stacks.items())
+        for stack, count in items:
+            functions = [entry.rsplit(":", 1)[0] + ")" for entry in stack.split(";")]
+            for function in set(functions):
+                inclusive[function] += count
+            exclusive[functions[-1]] += count
+
+        total = sum(count for _, count in items) or 1
+        return [
+            {"function": function, "inclusive_pct": count / total * 100,
+             "self_pct": exclusive[function] / total * 100}
+            for function, count in inclusive.most_common(n)
+        ]
+
+    def collapsed(self):
+        """Collapsed-stack text for flamegraph.pl / speedscope"""
+        with self._lock:
+            return "\n".join(f"{stack} {count}" for stack, count in self.stacks.most_common())
+
+    def reset(self):
+        with self._lock:
+            self.stacks.clear()
+            self.samples = 0
+        self.duration = 0.0
@@ -0,0 +1,209 @@
+import json
+import os
+import re
+import threading
+import cv2
+import numpy as np
+
+EVICTION_POLICIES = ("oldest", "importance")
+SNAPSHOT_NAME = re.compile(r"^(?P<emotion>[a-z]+)_(?P<date>\d{4}-\d{2}-\d{2})_(?P<time>\d{2}-\d{2}-\d{2})(-\d{3})?\.jpg$")
+
+
+def dhash(image, size=8):
+    """64-bit difference hash of an image; near-identical frames differ by a few bits"""
+    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if image.ndim == 3 else image
+    small = cv2.resize(gray, (size + 1, size), interpolation=cv2.INTER_AREA)
+    bits = (small[:, 1:] > small[:, :-1]).flatten()
+    return int(np.packbits(bits).view('>u8')[0])
+
+
+def hamming(a, b):
+    return bin(a ^ b).count("1")
+
+
+class SnapshotIndex:
+    """Per-user snapshot index with perceptual-hash dedup and a storage quota.
+
+    Each log row (timestamp, emotion) maps to an entry; when a new snapshot
+    is near-identical to a recent one the entry points at the existing file
+    instead of writing another JPEG.
+    """
+
+    def __init__(self, snapshots_dir, quota_mb=200, eviction="oldest",
+                 recent=10, max_distance=6):
+        if eviction not in EVICTION_POLICIES:
+            raise ValueError(f"eviction must be one of {EVICTION_POLICIES}")
+
+        self.snapshots_dir = snapshots_dir
+        self.index_path = os.path.join(snapshots_dir, "index.json")
+        self.quota_bytes = int(quota_mb * 1024 * 1024)
+        self.eviction = eviction
+        self.recent = recent
+        self.max_distance = max_distance
+
+        self._lock = threading.Lock()
+        self.deduplicated = 0
+        self.evicted = 0
+        self.entries = []
+        if not self.load():
+            self.rebuild()
+
+    def load(self):
+        try:
+            with open(self.index_path, encoding="utf-8") as f:
+                self.entries = json.load(f)
+            return True
+        except (OSError, ValueError):
+            return False
+
+    def save(self):
+        tmp_path = f"{self.index_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump([e for e in self.entries if not e.get("pending")], f, separators=(",", ":"))
+        os.replace(tmp_path, self.index_path)
+
+    def rebuild(self):
+        """Index snapshots already on disk (one directory scan, then never again)"""
+        entries = []
+        if os.path.isdir(self.snapshots_dir):
+            for name in sorted(os.listdir(self.snapshots_dir)):
+                match = SNAPSHOT_NAME.match(name)
+                if not match:
+                    continue
+                path = os.path.join(self.snapshots_dir, name)
+                entries.append({
+                    "file": name,
+                    "timestamp": f"{match['date']} {match['time'].replace('-', ':')}",
+                    "emotion": match["emotion"],
+                    "confidence": None,
+                    "bytes": os.path.getsize(path),
+                    "phash": None
+                })
+        with self._lock:
+            self.entries = sorted(entries, key=lambda e: e["timestamp"])
+            self.save()
+
+    @property
+    def used_bytes(self):
+        return sum(e["bytes"] for e in self.entries if "duplicate_of" not in e)
+
+    def _find_duplicate(self, phash):
+        originals = [e for e in self.entries if "duplicate_of" not in e and e["phash"] is not None]
+        for entry in reversed(originals[-self.recent:]):
+            if hamming(entry["phash"], phash) <= self.max_distance:
+                return entry["file"]
+        return None
+
+    @staticmethod
+    def _entry(name, timestamp, emotion, confidence, size, phash, duplicate_of=None):
+        entry = {
+            "file": duplicate_of or name,
+            "timestamp": timestamp,
+            "emotion": emotion,
+            "confidence": round(float(confidence), 2),
+            "bytes": 0 if duplicate_of else size,
+            "phash": phash
+        }
+        if duplicate_of:
+            entry["duplicate_of"] = duplicate_of
+        return entry
+
+    def reserve(self, name, timestamp, emotion, confidence, phash):
+        """Dedup check and insert in one step.
+
+        Returns the existing file when the snapshot is a near-duplicate, or
+        when `name` itself is already indexed (a pointer entry is recorded,
+        so one file never has two entries or two writers). Otherwise records
+        a pending entry for `name`, so concurrent writers see it, and
+        returns None; finish with commit() once the file is written or
+        discard() if writing failed.
+        """
+        with self._lock:
+            if any(e["file"] == name and "duplicate_of" not in e for e in self.entries):
+                duplicate_of = name
+            else:
+                duplicate_of = self._find_duplicate(phash)
+            if duplicate_of:
+                self.deduplicated += 1
+                self.entries.append(self._entry(name, timestamp, emotion, confidence, 0, phash, duplicate_of))
+                self.save()
+                return duplicate_of
+
+            entry = self._entry(name, timestamp, emotion, confidence, 0, phash)
+            entry["pending"] = True
+            self.entries.append(entry)
+            return None
+
+    def commit(self, name, size):
+        """Record the written size of a reserved snapshot and enforce the quota"""
+        with self._lock:
+            for entry in self.entries:
+                if entry["file"] == name and entry.pop("pending", False):
+                    entry["bytes"] = size
+                    break
+            self._enforce_quota()
+            self.save()
+
+    def discard(self, name):
+        """Drop a reserved snapshot whose file was never written, and pointers to it"""
+        with self._lock:
+            self.entries = [
+                e for e in self.entries
+                if not (e["file"] == name and (e.get("pending") or e.get("duplicate_of") == name))
+            ]
+            self.save()
+
+    def _eviction_order(self):
+        originals = [e for e in self.entries if "duplicate_of" not in e and not e.get("pending")]
+        if self.eviction == "importance":
+            # Low-confidence snapshots go first, oldest first among equals
+            return sorted(originals, key=lambda e: (e["confidence"] or 0, e["timestamp"]))
+        return originals
+
+    def _enforce_quota(self):
+        used = self.used_bytes
+        for victim in self._eviction_order():
+            if used <= self.quota_bytes:
+                break
+            try:
+                os.remove(os.path.join(self.snapshots_dir, victim["file"]))
+            except OSError:
+                pass
+            used -= victim["bytes"]
+            self.evicted += 1
+            self.entries = [e for e in self.entries if e["file"] != victim["file"]]
+
+    def list(self, start=None, end=None):
+        """Index entries with start <= timestamp < end, oldest first"""
+        with self._lock:
+            return [
+                dict(e) for e in self.entries
+                if (start is None or e["timestamp"] >= start)
+                and (end is None or e["timestamp"] < end)
+            ]
+
+    def get_stats(self):
+        with self._lock:
+            return {
+                "snapshots": sum(1 for e in self.entries if "duplicate_of" not in e),
+                "entries": len(self.entries),
+                "used_mb": self.used_bytes / (1024 * 1024),
+                "quota_mb": self.quota_bytes / (1024 * 1024),
+                "deduplicated": self.deduplicated,
+                "evicted": self.evicted
+            }
+
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def get_snapshot_index(snapshots_dir, **kwargs):
+    """Process-wide index for `snapshots_dir`, shared by every session of that user"""
+    key = os.path.abspath(snapshots_dir)
+    with _indexes_lock:
+        index = _indexes.get(key)
+        if index is None:
+            index = SnapshotIndex(snapshots_dir, **kwargs)
+            _indexes[key] = index
+        return index
@@ -0,0 +1,171 @@
+import os
+import queue
+import threading
+import time
+import cv2
+import streamlit as st
+from snapshot_index import dhash
+
+DROP_POLICIES = ("drop_newest", "drop_oldest", "block")
+
+
+class SnapshotSink:
+    """JPEG-encode and write snapshots on a worker pool instead of the capture loop.
+
+    When the queue is full, `policy` decides what happens: "drop_newest"
+    discards the incoming snapshot, "drop_oldest" evicts the oldest queued
+    one, and "block" waits up to `block_timeout` seconds before dropping.
+    Snapshots submitted with a SnapshotIndex are deduplicated against it
+    and recorded in it once written.
+    """
+
+    def __init__(self, workers=2, max_queue=16, policy="drop_oldest", block_timeout=0.5,
+                 max_width=640, jpeg_quality=85, face_only=False):
+        if policy not in DROP_POLICIES:
+            raise ValueError(f"policy must be one of {DROP_POLICIES}")
+
+        self.policy = policy
+        self.block_timeout = block_timeout
+        self.max_width = max_width
+        self.jpeg_quality = jpeg_quality
+        self.face_only = face_only
+
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._stats_lock = threading.Lock()
+        self.submitted = 0
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+        self.deduplicated = 0
+        self.total_write_time = 0.0
+        self.max_write_time = 0.0
+
+        self._workers = [
+            threading.Thread(target=self._run, name=f"snapshot-writer-{i}", daemon=True)
+            for i in range(workers)
+        ]
+        for worker in self._workers:
+            worker.start()
+
+    def submit(self, path, frame, face_box=None, index=None, record=None):
+        """Queue a snapshot; returns False if the drop policy discarded it.
+
+        `record` holds the timestamp, emotion and confidence of the log row
+        the snapshot belongs to and is required when `index` is given.
+        """
+        item = (path, frame, face_box, index, record)
+        with self._stats_lock:
+            self.submitted += 1
+
+        try:
+            if self.policy == "block":
+                self._queue.put(item, timeout=self.block_timeout)
+            else:
+                self._queue.put_nowait(item)
+            return True
+        except queue.Full:
+            pass
+
+        if self.policy == "drop_oldest":
+            try:
+                self._queue.get_nowait()
+                self._queue.task_done()
+            except queue.Empty:
+                pass
+            try:
+                self._queue.put_nowait(item)
+                self._count_drop()
+                return True
+            except queue.Full:
+                pass
+
+        self._count_drop()
+        return False
+
+    def _count_drop(self):
+        with self._stats_lock:
+            self.dropped += 1
+
+    def prepare(self, frame, face_box=None):
+        """Crop to the face (when enabled) and downscale to max_width"""
+        if self.face_only and face_box is not None:
+            x, y, w, h = face_box
+            frame = frame[max(0, y):y + h, max(0, x):x + w]
+
+        if self.max_width and frame.shape[1] > self.max_width:
+            scale = self.max_width / frame.shape[1]
+            frame = cv2.resize(frame, (self.max_width, int(frame.shape[0] * scale)),
+                               interpolation=cv2.INTER_AREA)
+        return frame
+
+    def _write(self, path, frame, face_box, index, record):
+        """Encode and write one snapshot; returns False if it was a duplicate"""
+        image = self.prepare(frame, face_box)
+
+        name = os.path.basename(path)
+        if index is not None:
+            # Check and reserve atomically so two workers can't both store the same scene
+            duplicate_of = index.reserve(name, record["timestamp"], record["emotion"],
+                                         record["confidence"], dhash(image))
+            if duplicate_of:
+                return False
+
+        try:
+            ok, encoded = cv2.imencode(".jpg", image, [cv2.IMWRITE_JPEG_QUALITY, self.jpeg_quality])
+            if not ok:
+                raise ValueError("JPEG encoding failed")
+            with open(path, "wb") as f:
+                f.write(encoded.tobytes())
+        except Exception:
+            if index is not None:
+                index.discard(name)
+            raise
+
+        if index is not None:
+            index.commit(name, len(encoded))
+        return True
+
+    def _run(self):
+        while True:
+            path, frame, face_box, index, record = self._queue.get()
+            start = time.perf_counter()
+            written, ok = False, True
+            try:
+                written = self._write(path, frame, face_box, index, record)
+            except Exception:
+                ok = False
+            elapsed = time.perf_counter() - start
+
+            with self._stats_lock:
+                if not ok:
+                    self.failed += 1
+                elif written:
+                    self.written += 1
+                    self.total_write_time += elapsed
+                    self.max_write_time = max(self.max_write_time, elapsed)
+                else:
+                    self.deduplicated += 1
+            self._queue.task_done()
+
+    def wait(self):
+        """Block until every queued snapshot has been written"""
+        self._queue.join()
+
+    def get_stats(self):
+        with self._stats_lock:
+            return {
+                "queue_depth": self._queue.qsize(),
+                "submitted": self.submitted,
+                "written": self.written,
+                "dropped": self.dropped,
+                "deduplicated": self.deduplicated,
+                "failed": self.failed,
+                "avg_write_ms": self.total_write_time / self.written * 1000 if self.written else 0.0,
+                "max_write_ms": self.max_write_time * 1000
+            }
+
+
+@st.cache_resource
+def get_snapshot_sink():
+    """Worker pool shared by every session in this process"""
+    return SnapshotSink()
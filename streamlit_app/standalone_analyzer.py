@@ -1,86 +1,368 @@
 # ✅ Updated standalone_analyzer.py to accept key_prefix for download buttons
 import pandas as pd
-import matplotlib.pyplot as plt
+import matplotlib
 import numpy as np
 import streamlit as st
 import os
+import threading
+import time
+from matplotlib.figure import Figure
 from fpdf import FPDF
 from io import BytesIO
-import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from emotion_store import EmotionStore, parse_timestamps
+from timeline_rollups import RESOLUTIONS, choose_resolution, downsample
+from pyshared.metrics import REGISTRY
 
-def generate_full_analysis(csv_path, key_prefix=""):
-    if not os.path.exists(csv_path) or os.stat(csv_path).st_size == 0:
-        st.warning("📭 No past emotion detection found. Please start detection to generate your report.")
+# Cache counters for the instrumentation panel, shared by every session
+ANALYSIS_CACHE_STATS = {"hits": 0, "misses": 0, "last_miss_ms": {}}
+_stats_lock = threading.Lock()
+REGISTRY.add_collector(lambda: [
+    ("analysis_cache_hits", "Report renders served from the analysis cache", ANALYSIS_CACHE_STATS["hits"]),
+    ("analysis_cache_misses", "Report renders that recomputed the analysis", ANALYSIS_CACHE_STATS["misses"])
+])
+
+# Most points the timeline chart is asked to draw
+TIMELINE_POINTS = 500
+
+# Detailed multi-page reports are built here so the page stays responsive
+REPORT_JOBS = ThreadPoolExecutor(max_workers=2, thread_name_prefix="pdf-report")
+
+
+def load_emotion_data(source):
+    """Emotion log as a DataFrame from an EmotionStore or a legacy CSV path"""
+    if isinstance(source, EmotionStore):
+        return source.query()
+
+    if not os.path.exists(source) or os.stat(source).st_size == 0:
+        return None
+
+    df = pd.read_csv(source)
+    if 'Timestamp' in df.columns and not df.empty:
+        df['Timestamp'] = parse_timestamps(df['Timestamp'])
+    return df
+
+
+def data_version(source):
+    """Cheap fingerprint that changes whenever the log does"""
+    if isinstance(source, EmotionStore):
+        source.flush()
+        return source.stats.total, source.stats.end
+
+    if not os.path.exists(source):
+        return None
+    stat = os.stat(source)
+    return stat.st_size, stat.st_mtime_ns
+
+
+def figure_to_png(fig):
+    buffer = BytesIO()
+    fig.savefig(buffer, format="png", bbox_inches='tight')
+    return buffer.getvalue()
+
+
+@st.cache_resource(max_entries=16, ttl=3600, show_spinner="📊 Building your report...")
+def compute_analysis(log_path, version, timeline_freq, _source):
+    """Everything the report shows, computed once per (log, version, parameters).
+
+    Returned objects are shared between sessions and must not be mutated.
+    """
+    timings = {}
+    start = time.perf_counter()
+    df = load_emotion_data(_source)
+    timings["load"] = time.perf_counter() - start
+
+    if df is None or df.empty:
+        return None
+
+    start = time.perf_counter()
+    emotion_counts = df['Emotion'].value_counts()
+    colors = matplotlib.colormaps['Set3'](np.linspace(0, 1, len(emotion_counts)))
+
+    conf_vals = None
+    if 'Confidence' in df.columns:
+        conf_vals = pd.to_numeric(df['Confidence'], errors='coerce').dropna()
+
+    has_timestamps = 'Timestamp' in df.columns and not df['Timestamp'].isna().all()
+    timeline, timeline_error = None, None
+    # EmotionStore timelines come from its rollup tables at render time
+    if has_timestamps and not isinstance(_source, EmotionStore):
+        try:
+            if timeline_freq is None:
+                resolution = choose_resolution(df['Timestamp'].min(), df['Timestamp'].max(), TIMELINE_POINTS)
+                timeline_freq = RESOLUTIONS[resolution][2]
+            timeline = df.groupby([pd.Grouper(key='Timestamp', freq=timeline_freq), 'Emotion']).size().unstack(fill_value=0)
+            timeline = downsample(timeline, TIMELINE_POINTS)
+        except Exception as e:
+            timeline_error = str(e)
+    timings["compute"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    charts = {}
+
+    fig1 = Figure(figsize=(4, 4))
+    ax1 = fig1.subplots()
+    ax1.pie(emotion_counts, labels=emotion_counts.index, autopct='%1.1f%%', colors=colors)
+    ax1.axis('equal')
+    charts["distribution"] = figure_to_png(fig1)
+
+    fig2 = Figure(figsize=(5, 3.5))
+    ax2 = fig2.subplots()
+    ax2.bar(emotion_counts.index, emotion_counts.values, color=colors)
+    ax2.set_ylabel("Count")
+    ax2.set_xticks(range(len(emotion_counts)))
+    ax2.set_xticklabels(emotion_counts.index, rotation=45)
+    charts["frequency"] = figure_to_png(fig2)
+
+    if conf_vals is not None and not conf_vals.empty:
+        fig3 = Figure(figsize=(5, 3))
+        ax3 = fig3.subplots()
+        ax3.hist(conf_vals, bins=20, color='skyblue', edgecolor='white')
+        ax3.set_xlabel("Confidence (%)")
+        ax3.set_ylabel("Frequency")
+        ax3.set_title("Confidence Distribution")
+        charts["confidence"] = figure_to_png(fig3)
+    timings["render"] = time.perf_counter() - start
+
+    analysis = {
+        "df": df,
+        "emotion_counts": emotion_counts,
+        "conf_vals": conf_vals,
+        "timeline": timeline,
+        "timeline_error": timeline_error,
+        "charts": charts,
+        "avg_conf": conf_vals.mean() if conf_vals is not None and not conf_vals.empty else None,
+        "min_conf": conf_vals.min() if conf_vals is not None and not conf_vals.empty else None,
+        "max_conf": conf_vals.max() if conf_vals is not None and not conf_vals.empty else None,
+        "start": df['Timestamp'].min() if has_timestamps else None,
+        "end": df['Timestamp'].max() if has_timestamps else None,
+        "csv": _source.export_csv(df=df) if isinstance(_source, EmotionStore) else df.to_csv(index=False).encode('utf-8')
+    }
+
+    with _stats_lock:
+        ANALYSIS_CACHE_STATS["misses"] += 1
+        ANALYSIS_CACHE_STATS["last_miss_ms"] = {k: v * 1000 for k, v in timings.items()}
+    return analysis
+
+
+def get_analysis(source, timeline_freq=None):
+    """Cached analysis for `source`, counting hits and misses.
+
+    With `timeline_freq` left as None the CSV timeline picks its own bucket size.
+    """
+    log_path = source.db_path if isinstance(source, EmotionStore) else source
+    with _stats_lock:
+        misses_before = ANALYSIS_CACHE_STATS["misses"]
+
+    analysis = compute_analysis(os.path.abspath(log_path), data_version(source), timeline_freq, source)
+
+    with _stats_lock:
+        if ANALYSIS_CACHE_STATS["misses"] == misses_before:
+            ANALYSIS_CACHE_STATS["hits"] += 1
+    return analysis
+
+
+def render_timeline(source, analysis, key_prefix):
+    """Zoomable timeline; an EmotionStore answers each zoom from its rollups"""
+    if not isinstance(source, EmotionStore):
+        if analysis["timeline"] is not None:
+            st.line_chart(analysis["timeline"])
+        elif analysis["timeline_error"]:
+            st.warning(f"Could not plot timeline: {analysis['timeline_error']}")
+        else:
+            st.warning("No timestamp data available.")
+        return
+
+    start, end = analysis["start"], analysis["end"]
+    if start is None or pd.isna(start):
+        st.warning("No timestamp data available.")
         return
 
+    start, end = start.to_pydatetime(), end.to_pydatetime()
+    if end > start:
+        start, end = st.slider(
+            "Zoom", min_value=start, max_value=end, value=(start, end),
+            format="YYYY-MM-DD HH:mm", key=f"{key_prefix}_timeline_zoom"
+        )
+
     try:
-        df = pd.read_csv(csv_path)
+        timeline, resolution = source.timeline(start, end, point_budget=TIMELINE_POINTS)
+    except Exception as e:
+        st.warning(f"Could not plot timeline: {e}")
+        return
+    st.line_chart(timeline)
+    st.caption(f"{resolution} buckets · {len(timeline)} points")
+
+
+def render_cache_panel():
+    with st.expander("⚙️ Analysis Cache"):
+        with _stats_lock:
+            stats = dict(ANALYSIS_CACHE_STATS)
+        st.caption(f"Hits: {stats['hits']} | Misses: {stats['misses']}")
+        if stats["last_miss_ms"]:
+            total = sum(stats["last_miss_ms"].values())
+            breakdown = " | ".join(f"{stage}: {ms:.0f} ms" for stage, ms in stats["last_miss_ms"].items())
+            st.caption(f"Last miss cost: {total:.0f} ms ({breakdown})")
+
+
+def write_line(pdf, text, height=10):
+    """multi_cell from the left margin, whichever FPDF variant leaves x elsewhere"""
+    pdf.set_x(pdf.l_margin)
+    pdf.multi_cell(0, height, text)
 
-        if df.empty:
+
+def build_pdf_report(analysis, username, detailed=False, progress=None):
+    """Render the report to PDF bytes entirely in memory.
+
+    With `detailed`, one page per day is appended; `progress` is a dict
+    whose "value" is updated from 0 to 1 as pages are written.
+    """
+    def report(value):
+        if progress is not None:
+            progress["value"] = value
+
+    df = analysis["df"]
+    emotion_counts = analysis["emotion_counts"]
+
+    pdf = FPDF()
+    pdf.add_page()
+    pdf.set_font("Arial", "B", 16)
+    pdf.cell(0, 10, f"Emotion Report for {username}", ln=True)
+
+    pdf.set_font("Arial", "", 12)
+    write_line(pdf, f"Total Detections: {len(df)}")
+    write_line(pdf, f"Most Common Emotion: {emotion_counts.idxmax()}")
+    if analysis["avg_conf"]:
+        write_line(pdf, f"Avg Confidence: {analysis['avg_conf']:.2f}%")
+    if analysis["start"] is not None:
+        write_line(pdf, f"Duration: {analysis['end'] - analysis['start']}")
+
+    for png in analysis["charts"].values():
+        pdf.image(BytesIO(png), w=170)
+        pdf.ln(3)
+    report(0.1)
+
+    if detailed and analysis["start"] is not None:
+        days = list(df.groupby(df['Timestamp'].dt.date))
+        for idx, (day, day_df) in enumerate(days):
+            pdf.add_page()
+            pdf.set_font("Arial", "B", 14)
+            pdf.cell(0, 10, f"{day}", ln=True)
+            pdf.set_font("Arial", "", 12)
+            write_line(pdf, f"Detections: {len(day_df)}", 8)
+            write_line(pdf, f"Avg Confidence: {day_df['Confidence'].astype(float).mean():.2f}%", 8)
+            for emotion, count in day_df['Emotion'].value_counts().items():
+                write_line(pdf, f"  {emotion}: {count}", 8)
+            report(0.1 + 0.85 * (idx + 1) / len(days))
+
+    data = bytes(pdf.output())
+    report(1.0)
+    return data
+
+
+def render_pdf_export(analysis, username, key_prefix):
+    """Build the PDF only when asked; detailed reports run as a background job"""
+    job_key = f"{key_prefix}_pdf_job"
+    data_key = f"{key_prefix}_pdf_data"
+
+    col1, col2 = st.columns([1, 2])
+    with col1:
+        prepare = st.button("📄 Prepare PDF Report", key=f"{key_prefix}_pdf_prepare")
+    with col2:
+        detailed = st.checkbox("Include a page per day", key=f"{key_prefix}_pdf_detailed")
+
+    if prepare:
+        st.session_state.pop(data_key, None)
+        if detailed:
+            progress = {"value": 0.0}
+            future = REPORT_JOBS.submit(build_pdf_report, analysis, username, True, progress)
+            st.session_state[job_key] = (future, progress)
+        else:
+            st.session_state.pop(job_key, None)
+            st.session_state[data_key] = build_pdf_report(analysis, username)
+
+    if job_key in st.session_state:
+        render_pdf_job(job_key, data_key)
+        return
+
+    data = st.session_state.get(data_key)
+    if isinstance(data, Exception):
+        st.error(f"❌ Could not build the PDF report: {data}")
+        del st.session_state[data_key]
+    elif data is not None:
+        st.download_button(
+            label="📥 Download Emotion Report (PDF)",
+            data=data,
+            file_name=f"{username}_report.pdf",
+            mime="application/pdf",
+            key=f"{key_prefix}_pdf"
+        )
+
+
+@st.fragment(run_every=1.0)
+def render_pdf_job(job_key, data_key):
+    """Poll a background PDF build; hands the result to the page and stops polling once done"""
+    job = st.session_state.get(job_key)
+    if job is None:
+        return
+
+    future, progress = job
+    if not future.done():
+        st.progress(progress["value"], text="🛠️ Building PDF report...")
+        return
+
+    try:
+        st.session_state[data_key] = future.result()
+    except Exception as e:
+        st.session_state[data_key] = e
+    del st.session_state[job_key]
+    # A full rerun renders the result outside this fragment, so it stops polling
+    st.rerun(scope="app")
+
+
+def generate_full_analysis(source, key_prefix="", snapshot_index=None):
+    log_path = source.db_path if isinstance(source, EmotionStore) else source
+    csv_name = os.path.splitext(os.path.basename(log_path))[0] + ".csv"
+
+    try:
+        analysis = get_analysis(source)
+
+        if analysis is None:
+            st.warning("📭 No past emotion detection found. Please start detection to generate your report.")
             return
 
-        if 'Timestamp' in df.columns:
-            try:
-                if '_' in str(df['Timestamp'].iloc[0]):
-                    df['Timestamp'] = pd.to_datetime(df['Timestamp'], format='%Y-%m-%d_%H-%M-%S')
-                else:
-                    df['Timestamp'] = pd.to_datetime(df['Timestamp'])
-            except:
-                df['Timestamp'] = pd.to_datetime(df['Timestamp'], errors='coerce')
+        df = analysis["df"]
+        emotion_counts = analysis["emotion_counts"]
+        charts = analysis["charts"]
 
         st.markdown("## 🧠 Emotion Report")
         st.markdown("A visual summary of your past emotions.")
         st.markdown("---")
 
-        emotion_counts = df['Emotion'].value_counts()
-        colors = plt.cm.Set3(np.linspace(0, 1, len(emotion_counts)))
-
         col1, col2 = st.columns(2)
 
         with col1:
             st.markdown("### 🥧 Emotion Distribution")
-            fig1, ax1 = plt.subplots(figsize=(4, 4))
-            ax1.pie(emotion_counts, labels=emotion_counts.index, autopct='%1.1f%%', colors=colors)
-            ax1.axis('equal')
-            st.pyplot(fig1)
+            st.image(charts["distribution"])
 
         with col2:
             st.markdown("### 📊 Emotion Frequency")
-            fig2, ax2 = plt.subplots(figsize=(5, 3.5))
-            ax2.bar(emotion_counts.index, emotion_counts.values, color=colors)
-            ax2.set_ylabel("Count")
-            ax2.set_xticklabels(emotion_counts.index, rotation=45)
-            st.pyplot(fig2)
+            st.image(charts["frequency"])
 
         col3, col4 = st.columns(2)
 
         with col3:
             st.markdown("### 📈 Confidence Levels")
-            fig3 = None
-            if 'Confidence' in df.columns:
-                conf_vals = pd.to_numeric(df['Confidence'], errors='coerce').dropna()
-                if not conf_vals.empty:
-                    fig3, ax3 = plt.subplots(figsize=(5, 3))
-                    ax3.hist(conf_vals, bins=20, color='skyblue', edgecolor='white')
-                    ax3.set_xlabel("Confidence (%)")
-                    ax3.set_ylabel("Frequency")
-                    ax3.set_title("Confidence Distribution")
-                    st.pyplot(fig3)
-                else:
-                    st.warning("No valid confidence data available.")
+            if "confidence" in charts:
+                st.image(charts["confidence"])
+            elif analysis["conf_vals"] is not None:
+                st.warning("No valid confidence data available.")
             else:
                 st.warning("Confidence column not found.")
 
         with col4:
             st.markdown("### ⏱️ Emotion Timeline")
-            if 'Timestamp' in df.columns and not df['Timestamp'].isna().all():
-                try:
-                    timeline = df.groupby([pd.Grouper(key='Timestamp', freq='10S'), 'Emotion']).size().unstack(fill_value=0)
-                    st.line_chart(timeline)
-                except Exception as e:
-                    st.warning(f"Could not plot timeline: {e}")
-            else:
-                st.warning("No timestamp data available.")
+            render_timeline(source, analysis, key_prefix)
 
         st.markdown("---")
         st.markdown("### 📊 Summary Metrics")
@@ -91,75 +373,58 @@ def generate_full_analysis(csv_path, key_prefix=""):
             st.metric("🎭 Most Common", f"{emotion_counts.idxmax()}", f"{emotion_counts.max()} times")
 
         with col6:
-            st.metric("🧠 Unique Emotions", f"{df['Emotion'].nunique()}")
+            st.metric("🧠 Unique Emotions", f"{len(emotion_counts)}")
 
         with col7:
             st.metric("🔍 Total Detections", f"{len(df)}")
 
-        avg_conf, min_conf, max_conf = None, None, None
-        if 'Confidence' in df.columns and 'conf_vals' in locals() and not conf_vals.empty:
-            avg_conf = conf_vals.mean()
-            min_conf = conf_vals.min()
-            max_conf = conf_vals.max()
-            st.info(f"✅ **Avg Confidence:** {avg_conf:.2f}% | Min: {min_conf:.1f}% | Max: {max_conf:.1f}%")
+        avg_conf = analysis["avg_conf"]
+        if avg_conf is not None:
+            st.info(f"✅ **Avg Confidence:** {avg_conf:.2f}% | Min: {analysis['min_conf']:.1f}% | Max: {analysis['max_conf']:.1f}%")
 
-        if 'Timestamp' in df.columns and not df['Timestamp'].isna().all():
-            duration = df['Timestamp'].max() - df['Timestamp'].min()
-            st.info(f"🕒 **Time Span:** `{df['Timestamp'].min()}` → `{df['Timestamp'].max()}`\n🧭 **Duration:** `{duration}`")
+        if analysis["start"] is not None:
+            duration = analysis["end"] - analysis["start"]
+            st.info(f"🕒 **Time Span:** `{analysis['start']}` → `{analysis['end']}`\n🧭 **Duration:** `{duration}`")
 
         st.markdown("---")
         with st.expander("📄 Show Full Emotion Log (Raw Data)"):
             st.dataframe(df)
 
+        if snapshot_index is not None:
+            with st.expander("📸 Recent Snapshots"):
+                recent, seen = [], set()
+                for entry in reversed(snapshot_index.list()):
+                    if entry["file"] not in seen:
+                        seen.add(entry["file"])
+                        recent.append(entry)
+                    if len(recent) == 12:
+                        break
+
+                if recent:
+                    columns = st.columns(4)
+                    for idx, entry in enumerate(recent):
+                        with columns[idx % 4]:
+                            st.image(
+                                os.path.join(snapshot_index.snapshots_dir, entry["file"]),
+                                caption=f"{entry['emotion']} · {entry['timestamp']}"
+                            )
+                else:
+                    st.info("No snapshots saved yet.")
+
         with st.expander("📥 Download Log as CSV"):
             st.download_button(
                 label="Download CSV File",
-                data=df.to_csv(index=False).encode('utf-8'),
-                file_name=os.path.basename(csv_path),
+                data=analysis["csv"],
+                file_name=csv_name,
                 mime='text/csv',
                 key=f"{key_prefix}_csv"
             )
 
         # ============ PDF Export ============
-        fig_paths = []
-        for idx, fig in enumerate([fig1, fig2] + ([fig3] if fig3 else [])):
-            path = f"temp_plot_{idx}.png"
-            fig.savefig(path, bbox_inches='tight')
-            fig_paths.append(path)
-
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as tmpfile:
-            pdf = FPDF()
-            pdf.add_page()
-            pdf.set_font("Arial", "B", 16)
-            username = os.path.basename(csv_path).split('_')[0]
-            pdf.cell(0, 10, f"Emotion Report for {username}", ln=True)
+        username = os.path.basename(log_path).split('_')[0]
+        render_pdf_export(analysis, username, key_prefix)
 
-            pdf.set_font("Arial", "", 12)
-            pdf.multi_cell(0, 10, f"Total Detections: {len(df)}")
-            pdf.multi_cell(0, 10, f"Most Common Emotion: {emotion_counts.idxmax()}")
-            if avg_conf:
-                pdf.multi_cell(0, 10, f"Avg Confidence: {avg_conf:.2f}%")
-            if 'duration' in locals():
-                pdf.multi_cell(0, 10, f"Duration: {duration}")
-
-            for path in fig_paths:
-                pdf.image(path, w=170)
-                pdf.ln(3)
-
-            pdf.output(tmpfile.name)
-
-            with open(tmpfile.name, "rb") as pdf_file:
-                st.download_button(
-                    label="📥 Download Emotion Report (PDF)",
-                    data=pdf_file.read(),
-                    file_name=f"{username}_report.pdf",
-                    mime="application/pdf",
-                    key=f"{key_prefix}_pdf"
-                )
-
-        for path in fig_paths:
-            if os.path.exists(path):
-                os.remove(path)
+        render_cache_panel()
 
     except Exception as e:
         st.error(f"❌ Error loading or analyzing data: {e}")
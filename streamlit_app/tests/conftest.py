@@ -0,0 +1,10 @@
+import os
+import sys
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules are imported flat, as `streamlit run app.py` does from streamlit_app/
+sys.path.insert(0, APP_DIR)
+sys.path.insert(0, os.path.join(APP_DIR, "benchmarks"))
+# pyshared is normally pip-installed from requirements.txt; the checkout works too
+sys.path.append(os.path.join(os.path.dirname(APP_DIR), "pyshared"))
@@ -0,0 +1,112 @@
+"""DatabaseAuth caching, retry and pooling against the local stub user API"""
+import time
+import pytest
+
+pytest.importorskip("streamlit")
+requests = pytest.importorskip("requests")
+
+from database_auth import DatabaseAuth
+from stub_user_api import StubUserAPI
+
+KNOWN = "demo@example.com"
+UNKNOWN = "nobody@example.com"
+
+
+@pytest.fixture
+def stub():
+    server = StubUserAPI().start()
+    yield server
+    server.stop()
+
+
+def make_auth(url, **kwargs):
+    kwargs.setdefault("backoff", 0)
+    return DatabaseAuth(url, **kwargs)
+
+
+def test_known_user_is_cached(stub):
+    auth = make_auth(stub.url)
+    assert auth.validate_user(KNOWN)["name"] == "Demo User"
+    assert auth.validate_user(KNOWN)["name"] == "Demo User"
+    assert stub.requests == 1
+    assert auth.get_stats()["cache_hits"] == 1
+
+
+def test_cache_is_as_case_sensitive_as_the_api(stub):
+    auth = make_auth(stub.url)
+    assert auth.validate_user(KNOWN.upper()) is None
+    # The negative entry for one casing must not hide the real user
+    assert auth.validate_user(KNOWN)["name"] == "Demo User"
+    assert auth.validate_user(KNOWN.upper()) is None
+    assert stub.requests == 2
+
+
+def test_cached_user_expires_after_ttl(stub):
+    auth = make_auth(stub.url, cache_ttl=0.05)
+    auth.validate_user(KNOWN)
+    time.sleep(0.1)
+    auth.validate_user(KNOWN)
+    assert stub.requests == 2
+
+
+def test_unknown_user_is_cached_for_negative_ttl(stub):
+    auth = make_auth(stub.url, negative_ttl=0.05)
+    assert auth.validate_user(UNKNOWN) is None
+    assert auth.validate_user(UNKNOWN) is None
+    assert stub.requests == 1
+    time.sleep(0.1)
+    auth.validate_user(UNKNOWN)
+    assert stub.requests == 2
+
+
+def test_invalidate_forgets_cached_user(stub):
+    auth = make_auth(stub.url)
+    auth.validate_user(KNOWN)
+    auth.invalidate(KNOWN)
+    auth.validate_user(KNOWN)
+    assert stub.requests == 2
+
+
+def test_transient_503_is_retried():
+    stub = StubUserAPI(fail_first=2).start()
+    try:
+        auth = make_auth(stub.url, retries=2)
+        assert auth.validate_user(KNOWN)["name"] == "Demo User"
+        assert stub.requests == 3
+    finally:
+        stub.stop()
+
+
+def test_exhausted_retries_raise_and_are_not_cached():
+    stub = StubUserAPI(fail_first=2).start()
+    try:
+        auth = make_auth(stub.url, retries=1)
+        with pytest.raises(requests.exceptions.RequestException):
+            auth._fetch_user("POST", KNOWN)
+        # The API has recovered; the failure must not have been cached
+        assert auth._fetch_user("POST", KNOWN)["name"] == "Demo User"
+    finally:
+        stub.stop()
+
+
+def test_connection_errors_are_not_cached(stub):
+    url = stub.url
+    stub.stop()
+    auth = make_auth(url, retries=0, connect_timeout=0.5)
+    with pytest.raises(requests.exceptions.ConnectionError):
+        auth._fetch_user("POST", KNOWN)
+    assert auth.get_stats()["cached_users"] == 0
+
+
+def test_async_lookup_resolves_to_user(stub):
+    auth = make_auth(stub.url)
+    assert auth.validate_user_async(KNOWN).result(timeout=5)["email"] == KNOWN
+
+
+def test_lookups_reuse_one_keep_alive_connection(stub):
+    auth = make_auth(stub.url)
+    for _ in range(5):
+        auth.invalidate()
+        auth.get_user_by_email(KNOWN)
+    assert stub.requests == 5
+    assert len(stub.connections) == 1
@@ -0,0 +1,81 @@
+"""TFLite backends against DeepFace on the same face crops.
+
+Synthetic crops are used unless PARITY_FACES_DIR points at a folder of
+real face images. Tests needing DeepFace/TensorFlow skip when they are
+not installed.
+"""
+import os
+import cv2
+import numpy as np
+import pytest
+from emotion_backends import EMOTION_LABELS, load_emotion_backend, preprocess_face
+
+
+def synthetic_faces(count=24, seed=0):
+    """Smooth random crops of assorted sizes and aspect ratios"""
+    rng = np.random.default_rng(seed)
+    faces = []
+    for _ in range(count):
+        height, width = rng.integers(60, 240, size=2)
+        noise = rng.integers(0, 256, size=(height // 8 + 1, width // 8 + 1, 3), dtype=np.uint8)
+        faces.append(cv2.resize(noise, (int(width), int(height)), interpolation=cv2.INTER_CUBIC))
+    return faces
+
+
+def load_faces():
+    faces_dir = os.environ.get("PARITY_FACES_DIR")
+    if not faces_dir:
+        return synthetic_faces()
+    images = (cv2.imread(os.path.join(faces_dir, name)) for name in sorted(os.listdir(faces_dir)))
+    return [image for image in images if image is not None]
+
+
+def scores(backend, faces):
+    return np.array([
+        [backend.predict(face, is_face=True)[label] for label in EMOTION_LABELS] for face in faces
+    ])
+
+
+@pytest.mark.parametrize("shape", [(120, 90, 3), (90, 120, 3), (48, 48, 3), (200, 200)])
+def test_preprocess_face_shape_and_range(shape):
+    face = np.random.default_rng(1).integers(0, 256, size=shape, dtype=np.uint8)
+    tensor = preprocess_face(face)
+    assert tensor.shape == (1, 48, 48, 1)
+    assert tensor.dtype == np.float32
+    assert 0.0 <= tensor.min() and tensor.max() <= 1.0
+
+
+def test_preprocess_face_letterboxes_instead_of_stretching():
+    # A wide white crop fills the middle rows only; the padding is black
+    tensor = preprocess_face(np.full((50, 200, 3), 255, dtype=np.uint8))[0, :, :, 0]
+    assert tensor[0].max() == 0.0 and tensor[-1].max() == 0.0
+    assert tensor[24].min() > 0.9
+
+
+@pytest.fixture(scope="module")
+def faces():
+    return load_faces()
+
+
+@pytest.fixture(scope="module")
+def reference(faces):
+    pytest.importorskip("deepface")
+    backend = load_emotion_backend("deepface")
+    backend.load()
+    return scores(backend, faces)
+
+
+@pytest.mark.parametrize("name, min_agreement, max_drift", [
+    ("tflite", 1.0, 1.0),
+    ("tflite-int8", 0.9, None),
+])
+def test_tflite_matches_deepface(name, min_agreement, max_drift, faces, reference, tmp_path_factory):
+    candidate = load_emotion_backend(name, model_dir=str(tmp_path_factory.mktemp("models")))
+    candidate.load()
+    candidate_scores = scores(candidate, faces)
+
+    agreement = (reference.argmax(axis=1) == candidate_scores.argmax(axis=1)).mean()
+    assert agreement >= min_agreement
+    if max_drift is not None:
+        # Percentage points; the fp32 conversion should only differ by float rounding
+        assert np.abs(reference - candidate_scores).max() <= max_drift
@@ -0,0 +1,41 @@
+import numpy as np
+import pytest
+
+cv2 = pytest.importorskip("cv2")
+
+from frame_sources import ImageDirectorySource
+
+
+def write_image(path, value):
+    cv2.imwrite(str(path), np.full((10, 10, 3), value, dtype=np.uint8))
+
+
+def test_unreadable_images_are_skipped(tmp_path):
+    write_image(tmp_path / "a.png", 10)
+    (tmp_path / "b.png").write_bytes(b"not an image")
+    write_image(tmp_path / "c.png", 30)
+    source = ImageDirectorySource(str(tmp_path), size=None)
+    assert source.open()
+    values = []
+    while True:
+        ok, frame = source.read()
+        if not ok:
+            break
+        values.append(int(frame[0, 0, 0]))
+    assert values == [10, 30]
+
+
+def test_loop_replays_from_the_start(tmp_path):
+    write_image(tmp_path / "a.png", 10)
+    write_image(tmp_path / "b.png", 20)
+    source = ImageDirectorySource(str(tmp_path), loop=True, size=None)
+    source.open()
+    assert [int(source.read()[1][0, 0, 0]) for _ in range(5)] == [10, 20, 10, 20, 10]
+
+
+def test_loop_over_only_unreadable_images_stops(tmp_path):
+    (tmp_path / "a.jpg").write_bytes(b"broken")
+    (tmp_path / "b.jpg").write_bytes(b"broken")
+    source = ImageDirectorySource(str(tmp_path), loop=True)
+    assert source.open()
+    assert source.read() == (False, None)
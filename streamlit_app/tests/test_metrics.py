@@ -0,0 +1,75 @@
+import json
+import os
+
+from pyshared.metrics import MetricsRegistry, render_snapshots, retire_snapshot, write_snapshot
+
+
+def worker_registry(requests, queue_depth):
+    registry = MetricsRegistry()
+    registry.counter("requests_total", "Requests").inc(requests)
+    registry.histogram("op_seconds", "Op latency", buckets=(0.1, 1.0)).observe(0.05)
+    registry.add_collector(lambda: [("queue_depth", "Queued items", queue_depth)])
+    return registry
+
+
+def write_worker(directory, pid, registry):
+    with open(os.path.join(directory, f"{pid}.json"), "w") as file:
+        json.dump({**registry.export(), "pid": pid}, file)
+
+
+def test_histogram_renders_cumulative_buckets():
+    registry = MetricsRegistry()
+    latency = registry.histogram("op_seconds", "Op latency", buckets=(0.1, 1.0))
+    for seconds in (0.05, 0.5, 5.0):
+        latency.observe(seconds)
+    text = registry.render_prometheus()
+    assert 'op_seconds_bucket{le="0.1"} 1' in text
+    assert 'op_seconds_bucket{le="1.0"} 2' in text
+    assert 'op_seconds_bucket{le="+Inf"} 3' in text
+
+
+def test_failing_collector_is_logged_and_skipped(caplog):
+    registry = MetricsRegistry()
+
+    def broken():
+        raise ValueError("stats unavailable")
+
+    registry.add_collector(broken)
+    registry.add_collector(lambda: [("queue_depth", "Queued items", 3)])
+    text = registry.render_prometheus()
+    assert "queue_depth 3.0" in text
+    assert "stats unavailable" in caplog.text
+
+
+def test_snapshots_are_summed_and_gauges_labelled_by_pid(tmp_path):
+    write_worker(tmp_path, 101, worker_registry(3, 2))
+    text = render_snapshots(str(tmp_path), worker_registry(4, 5))
+    assert "requests_total 7" in text
+    assert 'op_seconds_count 2' in text
+    assert 'queue_depth{pid="101"} 2.0' in text
+    assert f'queue_depth{{pid="{os.getpid()}"}} 5.0' in text
+    assert text.count("# TYPE queue_depth gauge") == 1
+
+
+def test_retired_worker_keeps_its_counts_but_not_its_gauges(tmp_path):
+    write_worker(tmp_path, 101, worker_registry(3, 2))
+    write_worker(tmp_path, 102, worker_registry(1, 2))
+    retire_snapshot(str(tmp_path), 101)
+    retire_snapshot(str(tmp_path), 102)
+    assert sorted(os.listdir(tmp_path)) == [".lock", "retired.json"]
+
+    live = MetricsRegistry()
+    live.counter("requests_total", "Requests").inc(2)
+    text = render_snapshots(str(tmp_path), live)
+    assert "requests_total 6" in text
+    assert 'pid="101"' not in text
+
+
+def test_write_snapshot_replaces_previous_one(tmp_path):
+    registry = worker_registry(1, 0)
+    write_snapshot(str(tmp_path), registry)
+    registry.counter("requests_total").inc()
+    write_snapshot(str(tmp_path), registry)
+    with open(tmp_path / f"{os.getpid()}.json") as file:
+        data = json.load(file)
+    assert [m["value"] for m in data["metrics"] if m["name"] == "requests_total"] == [2]
@@ -0,0 +1,55 @@
+import os
+
+import numpy as np
+import pytest
+
+cv2 = pytest.importorskip("cv2")
+
+from snapshot_index import SnapshotIndex, dhash
+
+
+def write_snapshot(index, name, timestamp, image, emotion="happy"):
+    """What the snapshot sink does for one frame; returns False for a duplicate"""
+    if index.reserve(name, timestamp, emotion, 90.0, dhash(image)):
+        return False
+    with open(os.path.join(index.snapshots_dir, name), "wb") as f:
+        f.write(b"x" * 1000)
+    index.commit(name, 1000)
+    return True
+
+
+def scene(seed):
+    return np.random.default_rng(seed).integers(0, 255, (48, 48), dtype=np.uint8)
+
+
+def test_near_duplicate_points_at_existing_file(tmp_path):
+    index = SnapshotIndex(str(tmp_path))
+    frame = scene(1)
+    assert write_snapshot(index, "happy_2026-01-01_10-00-00-000.jpg", "2026-01-01 10:00:00", frame)
+    assert not write_snapshot(index, "happy_2026-01-01_10-00-05-000.jpg", "2026-01-01 10:00:05", frame)
+    stats = index.get_stats()
+    assert (stats["snapshots"], stats["entries"], stats["deduplicated"]) == (1, 2, 1)
+
+
+def test_same_name_is_indexed_and_counted_once(tmp_path):
+    index = SnapshotIndex(str(tmp_path))
+    name = "happy_2026-01-01_10-00-00.jpg"
+    assert write_snapshot(index, name, "2026-01-01 10:00:00", scene(1))
+    assert not write_snapshot(index, name, "2026-01-01 10:00:00", scene(2))
+    assert index.get_stats()["snapshots"] == 1
+    assert index.used_bytes == 1000
+
+
+def test_eviction_keeps_usage_within_quota(tmp_path):
+    index = SnapshotIndex(str(tmp_path), quota_mb=2500 / (1024 * 1024))
+    for i in range(4):
+        write_snapshot(index, f"happy_2026-01-01_10-00-0{i}.jpg", f"2026-01-01 10:00:0{i}", scene(i))
+    assert index.used_bytes == 2000
+    assert sorted(os.listdir(tmp_path)) == [
+        "happy_2026-01-01_10-00-02.jpg", "happy_2026-01-01_10-00-03.jpg", "index.json"]
+
+
+def test_rebuild_reads_millisecond_names(tmp_path):
+    (tmp_path / "sad_2026-01-01_10-00-00-123.jpg").write_bytes(b"x" * 10)
+    index = SnapshotIndex(str(tmp_path))
+    assert [e["timestamp"] for e in index.list()] == ["2026-01-01 10:00:00"]
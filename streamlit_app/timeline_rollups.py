@@ -0,0 +1,77 @@
+import numpy as np
+import pandas as pd
+
+# name -> (bucket width in seconds, SQL expression mapping a timestamp to its bucket, pandas freq).
+# Timestamps are stored as 'YYYY-MM-DD HH:MM:SS', so buckets are plain string prefixes.
+RESOLUTIONS = {
+    "10s": (10, "substr({col}, 1, 18) || '0'", "10s"),
+    "minute": (60, "substr({col}, 1, 16) || ':00'", "min"),
+    "hour": (3600, "substr({col}, 1, 13) || ':00:00'", "h"),
+    "day": (86400, "substr({col}, 1, 10) || ' 00:00:00'", "D"),
+}
+
+
+def rollup_table(resolution):
+    return f"rollup_{resolution}"
+
+
+def bucket_expression(resolution, column="timestamp"):
+    return RESOLUTIONS[resolution][1].format(col=column)
+
+
+def bucket_key(resolution, timestamp):
+    """Python twin of bucket_expression for a single timestamp string"""
+    if resolution == "10s":
+        return timestamp[:18] + "0"
+    if resolution == "minute":
+        return timestamp[:16] + ":00"
+    if resolution == "hour":
+        return timestamp[:13] + ":00:00"
+    return timestamp[:10] + " 00:00:00"
+
+
+def choose_resolution(start, end, point_budget=500):
+    """Finest resolution whose bucket count over [start, end] fits the point budget"""
+    span = max((pd.Timestamp(end) - pd.Timestamp(start)).total_seconds(), 1)
+    for name, (seconds, _, _) in RESOLUTIONS.items():
+        if span / seconds <= point_budget:
+            return name
+    return "day"
+
+
+def lttb_indices(values, threshold):
+    """Largest-Triangle-Three-Buckets: indices of `threshold` points that keep the shape"""
+    n = len(values)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    x = np.arange(n, dtype=float)
+    y = np.asarray(values, dtype=float)
+    bucket_size = (n - 2) / (threshold - 2)
+    selected = [0]
+    a = 0
+
+    for i in range(threshold - 2):
+        start = int(np.floor(i * bucket_size)) + 1
+        end = int(np.floor((i + 1) * bucket_size)) + 1
+        next_start = end
+        next_end = min(int(np.floor((i + 2) * bucket_size)) + 1, n)
+        avg_x = x[next_start:next_end].mean() if next_end > next_start else x[-1]
+        avg_y = y[next_start:next_end].mean() if next_end > next_start else y[-1]
+
+        areas = np.abs(
+            (x[a] - avg_x) * (y[start:end] - y[a])
+            - (x[a] - x[start:end]) * (avg_y - y[a])
+        )
+        a = start + int(np.argmax(areas))
+        selected.append(a)
+
+    selected.append(n - 1)
+    return np.array(selected)
+
+
+def downsample(timeline, point_budget):
+    """LTTB over the total count per bucket, keeping whole rows"""
+    if len(timeline) <= point_budget:
+        return timeline
+    return timeline.iloc[lttb_indices(timeline.sum(axis=1).values, point_budget)]